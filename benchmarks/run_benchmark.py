@@ -0,0 +1,130 @@
+"""Run the offline Explorer benchmark and compare it with the stored baseline."""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+from pathlib import Path
+
+# Allow running without installing the `explorer` package
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from explorer.benchmark import (  # noqa: E402
+    LIGHT_MODULES,
+    BenchmarkCase,
+    compare_to_baseline,
+    import_regressions,
+    measure_import,
+    run_benchmark,
+)
+
+BENCHMARKS_DIR = Path(__file__).resolve().parent
+
+
+def main() -> None:
+    """Run every benchmark case and report regressions against the baseline."""
+    parser = argparse.ArgumentParser(description="Offline Explorer benchmark")
+    parser.add_argument(
+        "--cases",
+        type=Path,
+        default=BENCHMARKS_DIR / "cases",
+        help="Directory with recorded benchmark cases",
+    )
+    parser.add_argument(
+        "--baseline",
+        type=Path,
+        default=None,
+        help=(
+            "Baseline results to compare against, by default baseline.json or "
+            "baseline_bounds.json with --act-on-bounds"
+        ),
+    )
+    parser.add_argument(
+        "--update-baseline",
+        action="store_true",
+        help="Overwrite the baseline with the current results",
+    )
+    parser.add_argument(
+        "--model-latency",
+        type=float,
+        default=0.0,
+        help="Simulated latency of every model call in seconds",
+    )
+    parser.add_argument(
+        "--device-latency",
+        type=float,
+        default=0.0,
+        help="Simulated latency of every hierarchy dump in seconds",
+    )
+    parser.add_argument(
+        "--query-latency",
+        type=float,
+        default=None,
+        help="Simulated latency of every app_current query, by default the dump's",
+    )
+    parser.add_argument(
+        "--act-on-bounds",
+        action="store_true",
+        help="Perform element actions by snapshot coordinates",
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.25,
+        help="Allowed relative latency growth before reporting a regression",
+    )
+    parser.add_argument(
+        "--max-import-ms",
+        type=float,
+        default=None,
+        help="Fail when a light module takes longer to import",
+    )
+    args = parser.parse_args()
+    if args.baseline is None:
+        name = "baseline_bounds.json" if args.act_on_bounds else "baseline.json"
+        args.baseline = BENCHMARKS_DIR / name
+
+    profiles = [measure_import(module) for module in LIGHT_MODULES]
+    for profile in profiles:
+        print(f"import {profile.module:<22} {profile.ms:>8.2f}ms")
+
+    cases = [BenchmarkCase.load(path) for path in sorted(args.cases.glob("*.json"))]
+    results = run_benchmark(
+        cases,
+        args.model_latency,
+        args.device_latency,
+        args.act_on_bounds,
+        args.query_latency,
+    )
+
+    for case, modes in results.items():
+        for mode, summary in modes.items():
+            print(
+                f"{case:<28} {mode:<8} steps={summary['steps']:<3} "
+                f"p50={summary['p50_ms']:>8.2f}ms p95={summary['p95_ms']:>8.2f}ms "
+                f"device={summary['device_calls']:<4} model={summary['model_calls']:<4} "
+                f"tokens={summary['tokens']}"
+            )
+
+    if args.update_baseline:
+        args.baseline.write_text(json.dumps(results, indent=2) + "\n", encoding="utf-8")
+        print(f"Baseline saved to {args.baseline}")
+        return
+
+    if not args.baseline.exists():
+        print(f"No baseline at {args.baseline}, run with --update-baseline")
+        return
+
+    baseline = json.loads(args.baseline.read_text(encoding="utf-8"))
+    regressions = compare_to_baseline(results, baseline, args.tolerance)
+    regressions += import_regressions(profiles, args.max_import_ms)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    if regressions:
+        sys.exit(1)
+    print("No regressions")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,19 +3,36 @@
 from __future__ import annotations
 
 import argparse
+import glob
 import json
+import logging
 import os
 import sys
+import time
+from collections.abc import Iterator
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
 from pathlib import Path
+from queue import Queue
+from typing import Any
 
 import httpx
+import uiautomator2
 from langchain_anthropic import ChatAnthropic
 from langchain_core.callbacks import get_usage_metadata_callback
 from langchain_core.language_models import BaseChatModel
 from langchain_openai import ChatOpenAI
 
+from explorer.budget import ResolutionBudget
+from explorer.checkpoint import FrameCheckpointer
+from explorer.metrics import JsonLinesExporter, MetricsRecorder
+from explorer.model_cascade import ModelCascade
+from explorer.model_gateway import ModelGateway
+from explorer.preflight import Preflight, StepHistory
 from explorer.scenario_explorer import ScenarioExplorer
 from explorer.scenario_parser import ScenarioParser
+from explorer.scheduler import historical_durations, lpt_order, shard
+from explorer.screenshots import ScreenshotPipeline
 
 # Allow running without installing the `explorer` package
 sys.path.append(str(Path(__file__).resolve().parents[1]))
@@ -27,45 +44,50 @@ COSTS: dict[str, dict[str, float]] = {
     "v3": {"input": 0.27, "output": 1.10},
 }
 
+# Substrings of provider model names reported in usage metadata
+MODEL_IDS: dict[str, str] = {
+    "haiku": "haiku",
+    "4.1-mini": "gpt-4.1-mini",
+    "v3": "deepseek",
+}
 
-def main() -> None:
-    """Run ScenarioExplorer with the provided scenario file."""
-    parser = argparse.ArgumentParser(
-        description="Run ScenarioExplorer using a selected model"
-    )
-    parser.add_argument(
-        "--token",
-        help="LLM API token",
-        default=None,
-    )
-    parser.add_argument(
-        "scenario_file",
-        type=Path,
-        help="Path to scenario text file",
-    )
-    parser.add_argument(
-        "--api-url",
-        dest="api_url",
-        help="Custom API URL",
-        default=None,
-    )
-    parser.add_argument(
-        "--model",
-        choices=["haiku", "4.1-mini", "v3"],
-        default="haiku",
-        help="Model to use: haiku (Anthropic), 4.1-mini (OpenAI) or v3 (Deepseek)",
-    )
-    args = parser.parse_args()
 
-    scenario_text = args.scenario_file.read_text(encoding="utf-8")
+class DevicePool:
+    """Connected devices handed out to one scenario at a time.
+
+    Scenarios are parsed concurrently, but a device only runs one scenario at
+    a time, so the number of devices bounds concurrent exploration.
+    """
+
+    def __init__(self, serials: list[str] | None) -> None:
+        self._devices = [uiautomator2.connect(serial) for serial in serials or [None]]
+        self._idle: Queue[uiautomator2.Device] = Queue()
+        for device in self._devices:
+            self._idle.put(device)
+
+    @contextmanager
+    def acquire(self) -> Iterator[uiautomator2.Device]:
+        device = self._idle.get()
+        try:
+            yield device
+        finally:
+            self._idle.put(device)
+
+    def close(self) -> None:
+        for device in self._devices:
+            device.stop_uiautomator()
+
+
+def create_model(name: str, token: str | None, api_url: str | None) -> BaseChatModel:
+    """Create the chat model client shared by all scenarios."""
 
     http_client_without_ssl_verification = httpx.Client(verify=False)
     model: BaseChatModel
-    if args.model == "haiku":
+    if name == "haiku":
         model = ChatAnthropic(
             model_name="claude-3-5-haiku-latest",
-            api_key=args.token or os.getenv("ANTHROPIC_API_KEY"),
-            base_url=args.api_url,
+            api_key=token or os.getenv("ANTHROPIC_API_KEY"),
+            base_url=api_url,
             temperature=0.0,
             max_tokens_to_sample=8000,
             timeout=None,
@@ -73,37 +95,236 @@ def main() -> None:
         )
         # noinspection PyProtectedMember
         model._client._client = http_client_without_ssl_verification
-    elif args.model == "4.1-mini":
+    elif name == "4.1-mini":
         model = ChatOpenAI(
             model="gpt-4.1-mini",
-            api_key=args.token or os.getenv("OPENAI_API_KEY"),
-            base_url=args.api_url,
+            api_key=token or os.getenv("OPENAI_API_KEY"),
+            base_url=api_url,
             temperature=0.0,
             http_client=http_client_without_ssl_verification,
         )
     else:  # v3
         model = ChatOpenAI(
             model="deepseek-0324",
-            api_key=args.token or os.getenv("DEEPSEEK_API_KEY"),
-            base_url=args.api_url or "https://api.deepseek.com",
+            api_key=token or os.getenv("DEEPSEEK_API_KEY"),
+            base_url=api_url or "https://api.deepseek.com",
             temperature=0.0,
             http_client=http_client_without_ssl_verification,
         )
+    return model
+
+
+def usage_cost(usage: dict[str, Any], model: str) -> dict[str, float]:
+    """Sum token usage over all models and price it.
+
+    Usage of a model named in :data:`MODEL_IDS` is priced as that model, any
+    other usage as ``model``.
+    """
+
+    input_tokens = output_tokens = 0
+    input_cost = output_cost = 0.0
+    for model_id, values in usage.items():
+        name = next(
+            (name for name, part in MODEL_IDS.items() if part in model_id), model
+        )
+        input_tokens += values.get("input_tokens", 0)
+        output_tokens += values.get("output_tokens", 0)
+        input_cost += values.get("input_tokens", 0) / 1_000_000 * COSTS[name]["input"]
+        output_cost += (
+            values.get("output_tokens", 0) / 1_000_000 * COSTS[name]["output"]
+        )
+    return {
+        "input_tokens": input_tokens,
+        "output_tokens": output_tokens,
+        "input_cost": input_cost,
+        "output_cost": output_cost,
+        "total_cost": input_cost + output_cost,
+    }
+
+
+def collect_scenarios(patterns: list[str], suffix: str = ".txt") -> list[Path]:
+    """Expand files, directories and glob patterns into scenario files."""
+
+    found: dict[Path, None] = {}
+    for pattern in patterns:
+        path = Path(pattern)
+        if path.is_dir():
+            matches = sorted(path.rglob(f"*{suffix}"))
+        elif path.is_file():
+            matches = [path]
+        else:
+            matches = sorted(
+                Path(match) for match in glob.glob(pattern, recursive=True)
+            )
+        for match in matches:
+            if match.is_file():
+                found[match.resolve()] = None
+    return list(found)
+
+
+def read_results(output: Path) -> list[dict[str, Any]]:
+    """Return the records of a batch results file.
+
+    A truncated last line left by an interrupted run is ignored.
+    """
+
+    if not output.exists():
+        return []
+    records = []
+    for line in output.read_text(encoding="utf-8").splitlines():
+        try:
+            records.append(json.loads(line))
+        except json.JSONDecodeError:
+            continue
+    return records
+
+
+def completed_scenarios(output: Path) -> set[str]:
+    """Return scenarios with a successful result in ``output``."""
+
+    return {
+        record["scenario"] for record in read_results(output) if not record.get("error")
+    }
+
+
+def parse_shard(value: str) -> tuple[int, int]:
+    """Parse ``INDEX/COUNT`` with a one-based index."""
+
+    index, _, count = value.partition("/")
+    try:
+        shard_index, shard_count = int(index), int(count)
+    except ValueError:
+        raise argparse.ArgumentTypeError("expected INDEX/COUNT, e.g. 1/4") from None
+    if not 1 <= shard_index <= shard_count:
+        raise argparse.ArgumentTypeError(f"shard {value} out of range")
+    return shard_index - 1, shard_count
+
+
+def run_scenario(
+    path: Path,
+    model: BaseChatModel | ModelCascade,
+    model_name: str,
+    pool: DevicePool,
+    metrics: MetricsRecorder,
+    checkpointer: FrameCheckpointer | None = None,
+    screenshots: ScreenshotPipeline | None = None,
+    preflight: Preflight | None = None,
+) -> dict[str, Any]:
+    """Parse and explore one scenario file on a pooled device.
+
+    With a ``checkpointer`` an interrupted run of the same file is resumed at
+    its first pending action without parsing the scenario again. With a
+    ``preflight`` invalid or too expensive scenarios are rejected before a
+    device is acquired.
+    """
 
+    record: dict[str, Any] = {"scenario": str(path), "model": model_name}
+    started = time.monotonic()
+    run_id = str(path) if checkpointer else None
+    with get_usage_metadata_callback() as cb:
+        try:
+            resumable = checkpointer is not None and checkpointer.unfinished(str(path))
+            if not resumable:
+                scenario = ScenarioParser(model).parse(path.read_text(encoding="utf-8"))
+                if preflight is not None:
+                    estimate = preflight.check(scenario.actions)
+                    record["estimate"] = {
+                        "model_calls": estimate.model_calls,
+                        "tokens": estimate.tokens,
+                        "duration": estimate.duration,
+                    }
+            with pool.acquire() as device:
+                explorer = ScenarioExplorer(
+                    model,
+                    metrics=metrics,
+                    device_factory=lambda: device,
+                    stop_device=False,
+                    checkpointer=checkpointer,
+                    screenshots=screenshots,
+                )
+                if resumable:
+                    trace = explorer.resume(str(path))
+                else:
+                    trace = explorer.explore(scenario.actions, run_id=run_id)
+            record["trace"] = [frame.to_dict() for frame in trace]
+        except Exception as error:  # noqa: BLE001 - reported per scenario
+            record["error"] = f"{type(error).__name__}: {error}"
+    record.update(usage_cost(cb.usage_metadata, model_name))
+    record["duration"] = time.monotonic() - started
+    return record
+
+
+def run_batch(
+    scenarios: list[Path],
+    output: Path,
+    model: BaseChatModel | ModelCascade,
+    model_name: str,
+    pool: DevicePool,
+    metrics: MetricsRecorder,
+    jobs: int,
+    checkpointer: FrameCheckpointer | None = None,
+    screenshots: ScreenshotPipeline | None = None,
+    preflight: Preflight | None = None,
+) -> None:
+    """Run ``scenarios`` concurrently and append one JSON line per result."""
+
+    totals = {"input_tokens": 0, "output_tokens": 0, "total_cost": 0.0}
+    with (
+        output.open("a", encoding="utf-8") as results,
+        ThreadPoolExecutor(max_workers=jobs) as executor,
+    ):
+        futures = [
+            executor.submit(
+                run_scenario,
+                path,
+                model,
+                model_name,
+                pool,
+                metrics,
+                checkpointer,
+                screenshots,
+                preflight,
+            )
+            for path in scenarios
+        ]
+        for future in as_completed(futures):
+            record = future.result()
+            results.write(json.dumps(record, ensure_ascii=False) + "\n")
+            results.flush()
+            for key in totals:
+                totals[key] += record[key]
+            status = record.get("error") or f"{len(record['trace'])} steps"
+            print(
+                f"{record['scenario']}: {status} "
+                f"tokens={record['input_tokens'] + record['output_tokens']} "
+                f"cost=${record['total_cost']:.4f}"
+            )
+
+    print(f"Results appended to {output}")
+    print(
+        f"Total tokens: input {totals['input_tokens']} "
+        f"output {totals['output_tokens']} cost: ${totals['total_cost']:.4f}"
+    )
+
+
+def run_single(
+    scenario_file: Path,
+    model: BaseChatModel | ModelCascade,
+    model_name: str,
+    metrics: MetricsRecorder,
+    screenshots: ScreenshotPipeline | None = None,
+) -> None:
+    """Run one scenario and write the formatted trace to the working directory."""
+
+    scenario_text = scenario_file.read_text(encoding="utf-8")
     parser = ScenarioParser(model)
-    explorer = ScenarioExplorer(model)
+    explorer = ScenarioExplorer(model, metrics=metrics, screenshots=screenshots)
     with get_usage_metadata_callback() as cb:
         scenario = parser.parse(scenario_text)
         result = explorer.explore(scenario.actions)
 
-    usage = cb.usage_metadata
-    input_tokens = sum(v.get("input_tokens", 0) for v in usage.values())
-    output_tokens = sum(v.get("output_tokens", 0) for v in usage.values())
-    cost_info = COSTS[args.model]
-    input_cost = input_tokens / 1_000_000 * cost_info["input"]
-    output_cost = output_tokens / 1_000_000 * cost_info["output"]
-    total_tokens = input_tokens + output_tokens
-    total_cost = input_cost + output_cost
+    cost = usage_cost(cb.usage_metadata, model_name)
+    input_tokens, output_tokens = cost["input_tokens"], cost["output_tokens"]
 
     output_path = Path.cwd() / "explore_result.json"
     output_path.write_text(
@@ -113,9 +334,231 @@ def main() -> None:
     print(f"Results saved to {output_path}")
 
     print("Token usage:")
-    print(f"  input tokens: {input_tokens} cost: ${input_cost:.4f}")
-    print(f"  output tokens: {output_tokens} cost: ${output_cost:.4f}")
-    print(f"  total tokens: {total_tokens} cost: ${total_cost:.4f}")
+    print(f"  input tokens: {input_tokens} cost: ${cost['input_cost']:.4f}")
+    print(f"  output tokens: {output_tokens} cost: ${cost['output_cost']:.4f}")
+    print(
+        f"  total tokens: {input_tokens + output_tokens} "
+        f"cost: ${cost['total_cost']:.4f}"
+    )
+
+
+def main() -> None:
+    """Run ScenarioExplorer with the provided scenario files."""
+    parser = argparse.ArgumentParser(
+        description="Run ScenarioExplorer using a selected model"
+    )
+    parser.add_argument(
+        "--token",
+        help="LLM API token",
+        default=None,
+    )
+    parser.add_argument(
+        "scenarios",
+        nargs="+",
+        help="Scenario text files, directories or glob patterns",
+    )
+    parser.add_argument(
+        "--api-url",
+        dest="api_url",
+        help="Custom API URL",
+        default=None,
+    )
+    parser.add_argument(
+        "--model",
+        choices=["haiku", "4.1-mini", "v3"],
+        default="haiku",
+        help="Model to use: haiku (Anthropic), 4.1-mini (OpenAI) or v3 (Deepseek)",
+    )
+    parser.add_argument(
+        "--cascade",
+        type=lambda value: value.split(","),
+        help=(
+            "Comma separated models tried cheapest first, e.g. 'v3,haiku'; "
+            "API keys are read from the environment"
+        ),
+        default=None,
+    )
+    parser.add_argument(
+        "--metrics",
+        type=Path,
+        help="Append per-step latency and token metrics to this JSON lines file",
+        default=None,
+    )
+    parser.add_argument(
+        "--output",
+        type=Path,
+        help="Append one JSON line per scenario to this file (batch mode)",
+        default=None,
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=4,
+        help="Number of scenarios processed concurrently in batch mode",
+    )
+    parser.add_argument(
+        "--serial",
+        action="append",
+        help="Device serial to run on, repeat to use several devices",
+        default=None,
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Skip scenarios that already have a successful result in --output",
+    )
+    parser.add_argument(
+        "--shard",
+        type=parse_shard,
+        help=(
+            "Run only shard INDEX/COUNT of the scenarios, split by durations "
+            "recorded in --output, e.g. 2/4"
+        ),
+        default=None,
+    )
+    parser.add_argument(
+        "--screenshots",
+        type=Path,
+        help="Store a WebP screenshot of every step's screen in this directory",
+        default=None,
+    )
+    parser.add_argument(
+        "--checkpoint",
+        type=Path,
+        help=(
+            "SQLite file checkpointing every completed step in batch mode; "
+            "interrupted scenarios continue at their first pending step"
+        ),
+        default=None,
+    )
+    parser.add_argument(
+        "--max-model-calls",
+        type=int,
+        help="Skip scenarios expected to need more model calls in batch mode",
+        default=None,
+    )
+    parser.add_argument(
+        "--max-tokens",
+        type=int,
+        help="Skip scenarios expected to use more tokens in batch mode",
+        default=None,
+    )
+    parser.add_argument(
+        "--max-time",
+        type=float,
+        help="Skip scenarios expected to run longer, in seconds, in batch mode",
+        default=None,
+    )
+    parser.add_argument(
+        "--requests-per-minute",
+        type=float,
+        help="Model request rate limit shared by all scenarios in batch mode",
+        default=None,
+    )
+    parser.add_argument(
+        "--tokens-per-minute",
+        type=float,
+        help="Model token rate limit shared by all scenarios in batch mode",
+        default=None,
+    )
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    for name in args.cascade or []:
+        if name not in COSTS:
+            parser.error(f"unknown cascade model {name!r}")
+    model_name = args.cascade[0] if args.cascade else args.model
+    metrics = MetricsRecorder([JsonLinesExporter(args.metrics)] if args.metrics else [])
+    screenshots = ScreenshotPipeline(args.screenshots) if args.screenshots else None
+
+    single = Path(args.scenarios[0])
+    if args.output is None and len(args.scenarios) == 1 and single.is_file():
+        model: BaseChatModel | ModelCascade
+        if args.cascade:
+            model = ModelCascade(
+                [create_model(name, None, None) for name in args.cascade],
+                names=args.cascade,
+            )
+        else:
+            model = create_model(args.model, args.token, args.api_url)
+        run_single(single, model, model_name, metrics, screenshots)
+        return
+
+    output = args.output or Path.cwd() / "explore_results.jsonl"
+    scenarios = collect_scenarios(args.scenarios)
+    # Longest scenarios first, so that no device runs one alone at the end.
+    history = read_results(output)
+    durations = historical_durations(history)
+    names = [str(path) for path in scenarios]
+    if args.shard:
+        index, count = args.shard
+        names = shard(names, durations, count, index)
+    scenarios = [Path(name) for name in lpt_order(names, durations)]
+    if args.resume:
+        completed = completed_scenarios(output)
+        scenarios = [path for path in scenarios if str(path) not in completed]
+    if not scenarios:
+        print("No scenarios to run")
+        return
+
+    gateways = {
+        name: ModelGateway(
+            model=(
+                create_model(name, None, None)
+                if args.cascade
+                else create_model(name, args.token, args.api_url)
+            ),
+            requests_per_minute=args.requests_per_minute,
+            tokens_per_minute=args.tokens_per_minute,
+            metrics=metrics,
+        )
+        for name in args.cascade or [args.model]
+    }
+    shared: BaseChatModel | ModelCascade = (
+        ModelCascade(list(gateways.values()), names=list(gateways))
+        if args.cascade
+        else gateways[args.model]
+    )
+    # Steps recorded in --output predict the cost of the new scenarios.
+    preflight = Preflight(
+        StepHistory.from_records(history),
+        ResolutionBudget(
+            max_model_calls=args.max_model_calls,
+            max_tokens=args.max_tokens,
+            max_wall_time=args.max_time,
+        ),
+    )
+    pool = DevicePool(args.serial)
+    checkpointer = FrameCheckpointer(args.checkpoint) if args.checkpoint else None
+    try:
+        run_batch(
+            scenarios,
+            output,
+            shared,
+            model_name,
+            pool,
+            metrics,
+            args.jobs,
+            checkpointer,
+            screenshots,
+            preflight,
+        )
+    finally:
+        pool.close()
+        if checkpointer is not None:
+            checkpointer.close()
+    for name, gateway in gateways.items():
+        stats = gateway.stats
+        print(
+            f"{name} requests: {stats.requests} coalesced: {stats.coalesced} "
+            f"queue wait mean: {stats.mean_wait:.2f}s max: {stats.max_wait:.2f}s"
+        )
+    if isinstance(shared, ModelCascade):
+        for name, tier in shared.stats().items():
+            print(
+                f"{name} resolutions: {tier['attempts']} "
+                f"success rate: {tier['success_rate']:.0%}"
+            )
 
 
 if __name__ == "__main__":
@@ -1,19 +1,31 @@
-"""Explorer public API."""
-
-from .element_navigator import ElementNavigator
-from .models import (
-    ActionFrame,
-    ActionInfo,
-    ActionType,
-    ElementInfo,
-    Error,
-    ExecutionStatus,
-    Scenario,
-    ScreenInfo,
-)
-from .scenario_explorer import ScenarioExplorer
-from .scenario_parser import ScenarioParser
-from .viewnode import ViewNode, parse_xml_to_tree, without_fields
+"""Explorer public API.
+
+Exported names are imported on first access, so that ``import explorer`` and
+light modules such as :mod:`explorer.models` or :mod:`explorer.viewnode` do
+not load LangChain, LangGraph or uiautomator2.
+"""
+
+from __future__ import annotations
+
+from importlib import import_module
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from .element_navigator import ElementNavigator
+    from .metrics import MetricsRecorder, StepMetrics
+    from .models import (
+        ActionFrame,
+        ActionInfo,
+        ActionType,
+        ElementInfo,
+        Error,
+        ExecutionStatus,
+        Scenario,
+        ScreenInfo,
+    )
+    from .scenario_explorer import ScenarioExplorer
+    from .scenario_parser import ScenarioParser
+    from .viewnode import ViewNode, parse_xml_to_tree, without_fields
 
 __all__ = [
     "ActionFrame",
@@ -25,9 +37,44 @@ __all__ = [
     "ScreenInfo",
     "Error",
     "ElementNavigator",
+    "MetricsRecorder",
+    "StepMetrics",
     "ScenarioExplorer",
     "ScenarioParser",
     "ViewNode",
     "parse_xml_to_tree",
     "without_fields",
 ]
+
+# Modules of the names in ``__all__``, imported on first access.
+_EXPORTS: dict[str, str] = {
+    "ActionFrame": ".models",
+    "ActionInfo": ".models",
+    "ActionType": ".models",
+    "ElementInfo": ".models",
+    "ExecutionStatus": ".models",
+    "Scenario": ".models",
+    "ScreenInfo": ".models",
+    "Error": ".models",
+    "ElementNavigator": ".element_navigator",
+    "MetricsRecorder": ".metrics",
+    "StepMetrics": ".metrics",
+    "ScenarioExplorer": ".scenario_explorer",
+    "ScenarioParser": ".scenario_parser",
+    "ViewNode": ".viewnode",
+    "parse_xml_to_tree": ".viewnode",
+    "without_fields": ".viewnode",
+}
+
+
+def __getattr__(name: str) -> Any:
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(import_module(module, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> list[str]:
+    return sorted({*globals(), *__all__})
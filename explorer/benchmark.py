@@ -0,0 +1,536 @@
+"""Offline benchmark harness with a replayed device and a scripted model.
+
+A :class:`BenchmarkCase` bundles a scenario with the hierarchy dumps recorded
+while it ran on a real device. :func:`run_case` drives
+:meth:`ScenarioExplorer.explore` and :meth:`ScenarioExplorer.run_trace` end to
+end against a :class:`ReplayDevice` and a :class:`ScriptedChatModel`, so the
+overhead of the navigator and the explorer can be measured without a device or
+an LLM.
+"""
+
+from __future__ import annotations
+
+import json
+import math
+import re
+import subprocess
+import sys
+import time
+from collections import Counter
+from dataclasses import asdict, dataclass, field, replace
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any, Callable, Iterable
+from xml.etree import ElementTree
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from uiautomator2 import XPathElementNotFoundError
+from uiautomator2.xpath import PageSource, XPath
+
+from explorer.metrics import MetricsRecorder, StepMetrics
+from explorer.models import ActionFrame, ActionInfo, ExecutionStatus
+from explorer.scenario_explorer import ScenarioExplorer
+
+# mypy: ignore-errors
+
+
+# Entry points that trace-inspection tools import without running scenarios,
+# and the dependencies they must not load.
+LIGHT_MODULES = ("explorer", "explorer.models", "explorer.viewnode", "explorer.metrics")
+HEAVY_MODULES = ("langchain", "langchain_core", "langgraph", "uiautomator2", "lxml")
+
+_IMPORT_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+__import__(sys.argv[1])
+elapsed = time.perf_counter() - start
+print(json.dumps({"ms": elapsed * 1000, "modules": sorted(sys.modules)}))
+"""
+
+EMPTY_HIERARCHY = "<?xml version='1.0' encoding='UTF-8' standalone='yes' ?><hierarchy rotation=\"0\" />"
+
+
+def estimate_tokens(text: str) -> int:
+    """Return a deterministic token estimate of roughly four characters per token."""
+
+    return len(text) // 4 + 1
+
+
+class ReplaySelector:
+    """XPath selector evaluated against the current replayed hierarchy."""
+
+    def __init__(self, device: "ReplayDevice", xpath: str) -> None:
+        self._device = device
+        self._xpath = xpath
+
+    def all(self) -> list[Any]:
+        self._device.calls["xpath.all"] += 1
+        self._device.simulate_dump()
+        source = PageSource(self._device.current_hierarchy)
+        return source.find_elements(XPath(self._xpath))
+
+    def _require(self) -> None:
+        source = PageSource(self._device.current_hierarchy)
+        if not source.find_elements(XPath(self._xpath)):
+            raise XPathElementNotFoundError(self._xpath)
+
+    def click(self) -> None:
+        self._device.calls["xpath.click"] += 1
+        self._device.simulate_dump()
+        self._require()
+        self._device.advance()
+
+    def swipe(self, direction: str, steps: int = 10) -> None:
+        self._device.calls["xpath.swipe"] += 1
+        self._device.simulate_dump()
+        self._require()
+        self._device.advance()
+
+
+class ReplayDevice:
+    """``uiautomator2.Device`` stand-in replaying recorded hierarchy dumps.
+
+    ``screens[k]`` is the hierarchy observed after ``k`` actions. Every click,
+    swipe, key press and text input moves to the next screen; the last screen
+    is kept once the recording is exhausted. ``latency`` is spent on every
+    hierarchy dump, including the implicit ones of xpath selectors, and
+    ``query_latency`` on every ``app_current`` query.
+    """
+
+    def __init__(
+        self,
+        screens: list[str],
+        size: tuple[int, int] = (1080, 1920),
+        latency: float = 0.0,
+        query_latency: float = 0.0,
+    ) -> None:
+        self.screens = screens or [EMPTY_HIERARCHY]
+        self.calls: Counter[str] = Counter()
+        self._size = size
+        self._latency = latency
+        self._query_latency = query_latency
+        self._actions = 0
+
+    @property
+    def current_hierarchy(self) -> str:
+        """Return the hierarchy of the screen currently shown."""
+
+        return self.screens[min(self._actions, len(self.screens) - 1)]
+
+    def advance(self) -> None:
+        """Register an action and move to the next recorded screen."""
+
+        self._actions += 1
+
+    def simulate_dump(self) -> None:
+        """Spend the configured hierarchy dump latency."""
+
+        if self._latency:
+            time.sleep(self._latency)
+
+    def dump_hierarchy(
+        self,
+        compressed: bool = False,
+        pretty: bool = False,
+        max_depth: int | None = None,
+    ) -> str:
+        self.calls["dump_hierarchy"] += 1
+        self.simulate_dump()
+        return self.current_hierarchy
+
+    def xpath(self, xpath: str) -> ReplaySelector:
+        return ReplaySelector(self, xpath)
+
+    def __call__(self, **kwargs: Any) -> Any:
+        """Return a ``uiautomator2`` style selector; replayed fields are focused."""
+
+        return SimpleNamespace(exists=True)
+
+    def app_current(self) -> dict[str, str]:
+        self.calls["app_current"] += 1
+        if self._query_latency:
+            time.sleep(self._query_latency)
+        root = ElementTree.fromstring(self.current_hierarchy).find("node")
+        package = root.attrib.get("package", "") if root is not None else ""
+        return {"package": package, "activity": ".ReplayActivity"}
+
+    def window_size(self) -> tuple[int, int]:
+        self.calls["window_size"] += 1
+        return self._size
+
+    def click(self, x: int, y: int) -> None:
+        self.calls["click"] += 1
+        self.advance()
+
+    def swipe(self, fx: int, fy: int, tx: int, ty: int, *args: Any) -> None:
+        self.calls["swipe"] += 1
+        self.advance()
+
+    def press(self, key: str) -> None:
+        self.calls["press"] += 1
+        self.advance()
+
+    def send_keys(self, text: str) -> None:
+        self.calls["send_keys"] += 1
+        self.advance()
+
+    def stop_uiautomator(self) -> None:
+        self.calls["stop_uiautomator"] += 1
+
+
+class RecordingDevice:
+    """Proxy around a real device that records hierarchy dumps for replay.
+
+    The recorded :attr:`screens` follow the :class:`ReplayDevice` layout:
+    the hierarchy seen after ``k`` actions is stored at index ``k``.
+    """
+
+    _ACTIONS = frozenset({"click", "swipe", "press", "send_keys"})
+
+    def __init__(self, device: Any) -> None:
+        self._device = device
+        self._actions = 0
+        self.screens: list[str] = []
+
+    def _record(self, hierarchy: str) -> None:
+        while len(self.screens) < self._actions:
+            self.screens.append(self.screens[-1] if self.screens else EMPTY_HIERARCHY)
+        if len(self.screens) == self._actions:
+            self.screens.append(hierarchy)
+        else:
+            self.screens[self._actions] = hierarchy
+
+    def dump_hierarchy(self, *args: Any, **kwargs: Any) -> str:
+        hierarchy = self._device.dump_hierarchy(*args, **kwargs)
+        self._record(hierarchy)
+        return hierarchy
+
+    def xpath(self, xpath: str) -> Any:
+        return _RecordingSelector(self, self._device.xpath(xpath))
+
+    def __getattr__(self, name: str) -> Any:
+        attr = getattr(self._device, name)
+        if name not in self._ACTIONS:
+            return attr
+
+        def action(*args: Any, **kwargs: Any) -> Any:
+            result = attr(*args, **kwargs)
+            self._actions += 1
+            return result
+
+        return action
+
+
+class _RecordingSelector:
+    def __init__(self, device: RecordingDevice, selector: Any) -> None:
+        self._device = device
+        self._selector = selector
+
+    def __getattr__(self, name: str) -> Any:
+        attr = getattr(self._selector, name)
+        if name not in ("click", "swipe"):
+            return attr
+
+        def action(*args: Any, **kwargs: Any) -> Any:
+            result = attr(*args, **kwargs)
+            self._device._actions += 1
+            return result
+
+        return action
+
+
+class ScriptedChatModel(BaseChatModel):
+    """Deterministic chat model answering with ``responder(prompt)``.
+
+    Every call sleeps for ``latency`` seconds and reports token usage
+    estimated by :func:`estimate_tokens`.
+    """
+
+    responder: Callable[[str], str]
+    latency: float = 0.0
+
+    @property
+    def _llm_type(self) -> str:
+        return "scripted"
+
+    def _generate(
+        self,
+        messages: list[BaseMessage],
+        stop: list[str] | None = None,
+        run_manager: Any = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        prompt = "\n".join(message.text() for message in messages)
+        if self.latency:
+            time.sleep(self.latency)
+        text = self.responder(prompt)
+        input_tokens = estimate_tokens(prompt)
+        output_tokens = estimate_tokens(text)
+        message = AIMessage(
+            content=text,
+            usage_metadata={
+                "input_tokens": input_tokens,
+                "output_tokens": output_tokens,
+                "total_tokens": input_tokens + output_tokens,
+            },
+        )
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+
+class ElementScript:
+    """Responder playing the navigator's side of the conversation.
+
+    ``elements`` maps element descriptions used in the scenario to the answer
+    fields (``xpath``, ``name``, ``screen`` and ``screen_description``).
+    """
+
+    def __init__(self, elements: dict[str, dict[str, str]]) -> None:
+        self._elements = elements
+
+    def _requested(self, prompt: str) -> dict[str, str] | None:
+        quoted = set(re.findall(r'"([^"\n]+)"', prompt))
+        matches = [name for name in self._elements if name in quoted]
+        if not matches:
+            return None
+        return self._elements[max(matches, key=len)]
+
+    def __call__(self, prompt: str) -> str:
+        element = self._requested(prompt)
+        if "another xpath" in prompt:
+            return element["xpath"] if element else "//*[@resource-id='missing']"
+        if "YES or NO" in prompt:
+            return "YES" if element else "NO"
+        answer = {
+            "screen": "",
+            "screen_description": "",
+            "name": "",
+            "xpath": "//*[@resource-id='missing']",
+        }
+        answer.update(element or {})
+        return "```json\n" + json.dumps(answer) + "\n```"
+
+
+@dataclass
+class BenchmarkCase:
+    """Scenario with the recorded screens and scripted element answers."""
+
+    name: str
+    actions: list[ActionInfo]
+    screens: list[str]
+    elements: dict[str, dict[str, str]] = field(default_factory=dict)
+
+    @classmethod
+    def load(cls, path: str | Path) -> "BenchmarkCase":
+        """Load a case from a JSON file."""
+
+        data = json.loads(Path(path).read_text(encoding="utf-8"))
+        return cls(
+            name=data.get("name", Path(path).stem),
+            actions=[ActionInfo.model_validate(action) for action in data["actions"]],
+            screens=data["screens"],
+            elements=data.get("elements", {}),
+        )
+
+    def save(self, path: str | Path) -> None:
+        """Write the case to a JSON file."""
+
+        data = {
+            "name": self.name,
+            "actions": [action.model_dump(mode="json") for action in self.actions],
+            "screens": self.screens,
+            "elements": self.elements,
+        }
+        Path(path).write_text(
+            json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8"
+        )
+
+
+@dataclass
+class RunSummary:
+    """Aggregated metrics of one explore or replay run."""
+
+    steps: int
+    broken: int
+    p50_ms: float
+    p95_ms: float
+    device_calls: int
+    model_calls: int
+    tokens: int
+
+
+def percentile(values: list[float], fraction: float) -> float:
+    """Return the nearest-rank percentile of ``values``."""
+
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(math.ceil(fraction * len(ordered)), 1)
+    return ordered[rank - 1]
+
+
+def summarize(trace: list[ActionFrame]) -> RunSummary:
+    """Summarise the step metrics collected in ``trace``."""
+
+    steps: list[StepMetrics] = [frame.metrics for frame in trace if frame.metrics]
+    latencies = [step.duration * 1000 for step in steps]
+    return RunSummary(
+        steps=len(steps),
+        broken=sum(frame.action.status is ExecutionStatus.BROKEN for frame in trace),
+        p50_ms=round(percentile(latencies, 0.5), 3),
+        p95_ms=round(percentile(latencies, 0.95), 3),
+        device_calls=sum(step.device_calls for step in steps),
+        model_calls=sum(step.model_calls for step in steps),
+        tokens=sum(step.total_tokens for step in steps),
+    )
+
+
+def run_case(
+    case: BenchmarkCase,
+    model_latency: float = 0.0,
+    device_latency: float = 0.0,
+    act_on_bounds: bool = False,
+    query_latency: float | None = None,
+) -> dict[str, RunSummary]:
+    """Explore ``case`` and replay the resulting trace, returning both summaries.
+
+    ``query_latency`` of ``app_current`` defaults to ``device_latency``: the
+    query runs ``dumpsys`` on the device, about as slow as a small dump.
+    """
+
+    model = ScriptedChatModel(
+        responder=ElementScript(case.elements), latency=model_latency
+    )
+
+    def run(
+        operation: Callable[[ScenarioExplorer], list[ActionFrame]],
+    ) -> list[ActionFrame]:
+        device = ReplayDevice(
+            case.screens,
+            latency=device_latency,
+            query_latency=(device_latency if query_latency is None else query_latency),
+        )
+        explorer = ScenarioExplorer(
+            model,
+            metrics=MetricsRecorder(),
+            device_factory=lambda: device,
+            input_delay=0,
+            act_on_bounds=act_on_bounds,
+        )
+        return operation(explorer)
+
+    actions = [action.model_copy(deep=True) for action in case.actions]
+    trace = run(lambda explorer: explorer.explore(actions))
+    replayed = run(
+        lambda explorer: explorer.run_trace(
+            [
+                ActionFrame(
+                    screen=replace(frame.screen) if frame.screen else None,
+                    action=frame.action.model_copy(deep=True),
+                    error=None,
+                )
+                for frame in trace
+            ]
+        )
+    )
+    return {"explore": summarize(trace), "replay": summarize(replayed)}
+
+
+def run_benchmark(
+    cases: Iterable[BenchmarkCase],
+    model_latency: float = 0.0,
+    device_latency: float = 0.0,
+    act_on_bounds: bool = False,
+    query_latency: float | None = None,
+) -> dict[str, dict[str, dict[str, Any]]]:
+    """Run every case and return ``{case: {"explore"|"replay": summary}}``."""
+
+    return {
+        case.name: {
+            mode: asdict(summary)
+            for mode, summary in run_case(
+                case, model_latency, device_latency, act_on_bounds, query_latency
+            ).items()
+        }
+        for case in cases
+    }
+
+
+def compare_to_baseline(
+    results: dict[str, dict[str, dict[str, Any]]],
+    baseline: dict[str, dict[str, dict[str, Any]]],
+    tolerance: float = 0.25,
+    slack_ms: float = 5.0,
+) -> list[str]:
+    """Return human readable regressions of ``results`` against ``baseline``.
+
+    Call and token counts are deterministic and may not grow at all; latency
+    percentiles may exceed the baseline by ``tolerance`` plus ``slack_ms``.
+    """
+
+    regressions: list[str] = []
+    for case, modes in results.items():
+        for mode, summary in modes.items():
+            expected = baseline.get(case, {}).get(mode)
+            if expected is None:
+                continue
+            for key in ("broken", "device_calls", "model_calls", "tokens"):
+                if summary[key] > expected[key]:
+                    regressions.append(
+                        f"{case}/{mode}: {key} {summary[key]} > {expected[key]}"
+                    )
+            for key in ("p50_ms", "p95_ms"):
+                limit = expected[key] * (1 + tolerance) + slack_ms
+                if summary[key] > limit:
+                    regressions.append(
+                        f"{case}/{mode}: {key} {summary[key]:.1f} > {limit:.1f}"
+                    )
+    return regressions
+
+
+@dataclass
+class ImportProfile:
+    """Cold import cost of one module measured in a fresh interpreter."""
+
+    module: str
+    ms: float
+    heavy_modules: list[str]
+
+
+def measure_import(module: str) -> ImportProfile:
+    """Import ``module`` in a new interpreter and report its cost."""
+
+    root = Path(__file__).resolve().parents[1]
+    output = subprocess.run(
+        [sys.executable, "-c", _IMPORT_PROBE, module],
+        cwd=root,
+        capture_output=True,
+        check=True,
+        text=True,
+    ).stdout
+    result = json.loads(output)
+    loaded = set(result["modules"])
+    return ImportProfile(
+        module=module,
+        ms=result["ms"],
+        heavy_modules=[name for name in HEAVY_MODULES if name in loaded],
+    )
+
+
+def import_regressions(
+    profiles: Iterable[ImportProfile], max_ms: float | None = None
+) -> list[str]:
+    """Return light modules that load heavy dependencies or exceed ``max_ms``."""
+
+    regressions: list[str] = []
+    for profile in profiles:
+        if profile.heavy_modules:
+            regressions.append(
+                f"import {profile.module}: loads {', '.join(profile.heavy_modules)}"
+            )
+        if max_ms is not None and profile.ms > max_ms:
+            regressions.append(
+                f"import {profile.module}: {profile.ms:.1f}ms > {max_ms:.1f}ms"
+            )
+    return regressions
@@ -0,0 +1,90 @@
+"""Resolution budgets bounding the work spent on locating elements."""
+
+from __future__ import annotations
+
+import time
+from dataclasses import dataclass
+
+
+@dataclass
+class ResolutionBudget:
+    """Limits for resolving elements within one step or one scenario.
+
+    ``None`` disables the corresponding limit. The retry settings only apply to
+    per-step budgets: a failed presence check waits ``backoff_initial`` seconds
+    (growing by ``backoff_factor`` up to ``backoff_max``) for the screen to
+    settle before the hierarchy is dumped again.
+    """
+
+    max_model_calls: int | None = None
+    max_tokens: int | None = None
+    max_wall_time: float | None = None
+    max_presence_attempts: int = 3
+    max_xpath_retries: int = 5
+    backoff_initial: float = 0.5
+    backoff_factor: float = 2.0
+    backoff_max: float = 8.0
+
+
+class BudgetExceeded(LookupError):
+    """Raised when element resolution runs out of its budget."""
+
+    def __init__(self, reason: str) -> None:
+        super().__init__(reason)
+        self.reason = reason
+
+
+class BudgetTracker:
+    """Account model calls, tokens and wall time against a budget.
+
+    Charges are propagated to ``parent`` so that per-step trackers also draw
+    from the scenario budget.
+    """
+
+    def __init__(
+        self,
+        budget: ResolutionBudget | None = None,
+        parent: BudgetTracker | None = None,
+        scope: str = "step",
+    ) -> None:
+        self.budget = budget or ResolutionBudget()
+        self.parent = parent
+        self.scope = scope
+        self.model_calls = 0
+        self.tokens = 0
+        self._started = time.perf_counter()
+
+    @property
+    def elapsed(self) -> float:
+        """Return seconds since the tracker was created."""
+
+        return time.perf_counter() - self._started
+
+    def exhausted(self) -> str | None:
+        """Return the reason the budget is used up, or ``None``."""
+
+        budget = self.budget
+        if budget.max_model_calls is not None and (
+            self.model_calls >= budget.max_model_calls
+        ):
+            return f"{self.scope} budget: {self.model_calls} model calls of {budget.max_model_calls}"
+        if budget.max_tokens is not None and self.tokens >= budget.max_tokens:
+            return f"{self.scope} budget: {self.tokens} tokens of {budget.max_tokens}"
+        if budget.max_wall_time is not None and self.elapsed >= budget.max_wall_time:
+            return f"{self.scope} budget: {self.elapsed:.1f}s of {budget.max_wall_time:.1f}s"
+        return self.parent.exhausted() if self.parent else None
+
+    def check(self) -> None:
+        """Raise :class:`BudgetExceeded` if this or a parent budget is used up."""
+
+        reason = self.exhausted()
+        if reason is not None:
+            raise BudgetExceeded(reason)
+
+    def charge(self, tokens: int) -> None:
+        """Account a model call that consumed ``tokens``."""
+
+        self.model_calls += 1
+        self.tokens += tokens
+        if self.parent is not None:
+            self.parent.charge(tokens)
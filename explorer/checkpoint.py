@@ -0,0 +1,140 @@
+"""SQLite checkpoints of scenario runs for resuming after a crash.
+
+Every frame is written in its own transaction as soon as its step completes,
+so a run interrupted by a dead process, device or model connection restarts
+at the first pending action with the xpaths of all earlier steps intact.
+"""
+
+from __future__ import annotations
+
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+from explorer.models import ActionFrame
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id TEXT PRIMARY KEY,
+    created REAL NOT NULL,
+    updated REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS run_frames (
+    run_id TEXT NOT NULL REFERENCES runs(id),
+    position INTEGER NOT NULL,
+    status TEXT NOT NULL,
+    frame TEXT NOT NULL,
+    PRIMARY KEY (run_id, position)
+);
+"""
+
+
+class FrameCheckpointer:
+    """Persist the frames of scenario runs keyed by a caller chosen run id.
+
+    The checkpointer may be shared between threads; statements are serialised
+    by an internal lock.
+    """
+
+    def __init__(self, path: str | Path = ":memory:") -> None:
+        self._connection = sqlite3.connect(str(path), check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._connection:
+            if str(path) != ":memory:":
+                self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.executescript(_SCHEMA)
+
+    def close(self) -> None:
+        self._connection.close()
+
+    def __enter__(self) -> FrameCheckpointer:
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+    def start(self, run_id: str, frames: list[ActionFrame]) -> None:
+        """Store all ``frames`` of a new run, replacing an earlier one."""
+
+        now = time.time()
+        with self._lock, self._connection:
+            self._connection.execute(
+                "DELETE FROM run_frames WHERE run_id = ?", (run_id,)
+            )
+            self._connection.execute(
+                "INSERT OR REPLACE INTO runs (id, created, updated) VALUES (?, ?, ?)",
+                (run_id, now, now),
+            )
+            self._connection.executemany(
+                "INSERT INTO run_frames (run_id, position, status, frame) "
+                "VALUES (?, ?, ?, ?)",
+                [
+                    (run_id, position, frame.action.status.value, _dump(frame))
+                    for position, frame in enumerate(frames)
+                ],
+            )
+
+    def save(self, run_id: str, position: int, frame: ActionFrame) -> None:
+        """Store the completed ``frame`` at ``position`` of a started run."""
+
+        with self._lock, self._connection:
+            updated = self._connection.execute(
+                "UPDATE run_frames SET status = ?, frame = ? "
+                "WHERE run_id = ? AND position = ?",
+                (frame.action.status.value, _dump(frame), run_id, position),
+            ).rowcount
+            if not updated:
+                raise KeyError(f"no frame {position} in run {run_id!r}")
+            self._connection.execute(
+                "UPDATE runs SET updated = ? WHERE id = ?", (time.time(), run_id)
+            )
+
+    def load(self, run_id: str) -> list[ActionFrame] | None:
+        """Return the frames of ``run_id``, or ``None`` for an unknown run."""
+
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT frame FROM run_frames WHERE run_id = ? ORDER BY position",
+                (run_id,),
+            ).fetchall()
+        if not rows:
+            return None
+        return [ActionFrame.from_dict(json.loads(frame)) for (frame,) in rows]
+
+    def unfinished(self, run_id: str) -> bool:
+        """Return whether ``run_id`` is known and has steps left."""
+
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT 1 FROM run_frames WHERE run_id = ? AND status != 'executed'",
+                (run_id,),
+            ).fetchone()
+        return row is not None
+
+    def runs(self, unfinished: bool = False) -> list[str]:
+        """Return run ids, oldest first; optionally only runs with steps left."""
+
+        query = "SELECT id FROM runs"
+        if unfinished:
+            query += (
+                " WHERE EXISTS (SELECT 1 FROM run_frames WHERE run_id = runs.id"
+                " AND status != 'executed')"
+            )
+        with self._lock:
+            rows = self._connection.execute(query + " ORDER BY created").fetchall()
+        return [run_id for (run_id,) in rows]
+
+    def delete(self, run_id: str) -> None:
+        """Forget ``run_id``."""
+
+        with self._lock, self._connection:
+            self._connection.execute(
+                "DELETE FROM run_frames WHERE run_id = ?", (run_id,)
+            )
+            self._connection.execute("DELETE FROM runs WHERE id = ?", (run_id,))
+
+
+def _dump(frame: ActionFrame) -> str:
+    return json.dumps(frame.to_dict(), ensure_ascii=False)
@@ -1,24 +1,38 @@
 from __future__ import annotations
 
 import logging
-from typing import Annotated, Any, TypedDict
+import operator
+import threading
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from functools import reduce
+from typing import TYPE_CHECKING, Annotated, Any, TypedDict
 
 from langchain.output_parsers import ResponseSchema, StructuredOutputParser
+from langchain_core.exceptions import OutputParserException
 from langchain_core.language_models import BaseChatModel
-from langchain_core.messages import AnyMessage
+from langchain_core.messages import AIMessage, AnyMessage, HumanMessage
 from langchain_core.prompts import PromptTemplate
 from langgraph.constants import END, START
 from langgraph.graph import StateGraph, add_messages
 from langgraph.types import RetryPolicy
-from uiautomator2 import Device
-from uiautomator2.xpath import XPathError
 
+from explorer.budget import BudgetExceeded, BudgetTracker, ResolutionBudget
+from explorer.hierarchy_dump import DumpStrategy
+from explorer.hierarchy_snapshot import HierarchySnapshot
+from explorer.metrics import MetricsRecorder, token_usage
+from explorer.model_cascade import CascadeTier, ModelCascade
+from explorer.prompt_cache import PromptCache, cached_messages
+from explorer.scroll_search import ScrollSearch
+from explorer.streaming import IncrementalJsonFields
 from explorer.viewnode import ViewNode, parse_xml_to_tree, without_fields
 
-# mypy: ignore-errors
+if TYPE_CHECKING:
+    from uiautomator2 import Device
 
+    from explorer.trace_store import TraceRepository
 
-logging.basicConfig(level=logging.INFO)
+# mypy: ignore-errors
 
 
 class AgentState(TypedDict):
@@ -26,12 +40,23 @@ class AgentState(TypedDict):
     element_request: str
     element: dict[str, object]
     messages: Annotated[list[AnyMessage], add_messages]
+    rejected_xpaths: list[tuple[str, int]]
 
 
 class ElementNotFoundException(LookupError):
     hierarchy: str
 
 
+@dataclass
+class _PendingOutput:
+    """Rest of a streamed answer consumed by a background thread."""
+
+    future: Future
+    parser: IncrementalJsonFields
+    chunks: list[Any] = field(default_factory=list)
+    cancelled: threading.Event = field(default_factory=threading.Event)
+
+
 class ElementNavigator:
     screen_name_schema = ResponseSchema(
         name="screen",
@@ -59,51 +84,110 @@ class ElementNavigator:
         "being displayed (names, dates, exchange rates, prices, specific weather, etc.)!!!",
     )
 
+    confidence_schema = ResponseSchema(
+        name="confidence",
+        description="Estimate how confident you are that the xpath matches exactly "
+        "the target element, as a number from 0 to 1",
+    )
+
+    # Rejected xpaths repeated in every retry prompt and candidates listed
+    # for an ambiguous xpath, keeping the retry prompt size constant.
+    max_rejected_in_prompt = 5
+    max_candidates_in_prompt = 5
+
     logger = logging.getLogger(__name__)
 
-    def __init__(self, model: BaseChatModel, device: Device):
-        self._device = device
+    def __init__(
+        self,
+        model: BaseChatModel | ModelCascade,
+        device: Device,
+        metrics: MetricsRecorder | None = None,
+        budget: ResolutionBudget | None = None,
+        scenario_budget: BudgetTracker | None = None,
+        prompt_cache: PromptCache | None = None,
+        dump_strategy: DumpStrategy | None = None,
+        known_elements: TraceRepository | None = None,
+        scroll_search: ScrollSearch | None = None,
+        stream_output: bool = False,
+    ):
+        self._metrics = metrics or MetricsRecorder()
+        self._device = self._metrics.instrument(device)
+        self._cascade = model if isinstance(model, ModelCascade) else None
         self._model = model
+        self._tiers = self._initial_tiers()
+        self._tier = 0
+        self._budget = budget or ResolutionBudget()
+        self._scenario_budget = scenario_budget
+        self._tracker = BudgetTracker(self._budget, scenario_budget)
+        self._presence_attempts = 0
+        self._xpath_retries = 0
+        self._rejected_hierarchy: str | None = None
+        self._prompt_cache = prompt_cache
+        self._element_info_kwargs: dict[str, Any] = {}
+        self.dump_strategy = dump_strategy or DumpStrategy()
+        self._known_elements = known_elements
+        self._scroll_search = scroll_search
+        self._scrolled = False
+        self._stream_output = stream_output
+        self._pending: _PendingOutput | None = None
+        self._validated_xpath: str | None = None
 
         self.full_hierarchy = ""
 
-        tasks = "1. " + self.screen_name_schema.description
-        tasks += "\n2. " + self.screen_description_schema.description
-        tasks += "\n3. " + self.element_name_schema.description
-        tasks += "\n4. " + self.xpath_schema.description
-
-        response_schemas = [
-            self.screen_name_schema,
-            self.screen_description_schema,
-            self.element_name_schema,
-            self.xpath_schema,
-        ]
+        # Fields needed to act come first, so that a streamed answer can be
+        # validated and acted upon before the descriptive fields are complete.
+        response_schemas = [self.xpath_schema, self.element_name_schema]
+        if self._cascade is not None:
+            # Low confidence answers of cheap models escalate to the next tier.
+            response_schemas.append(self.confidence_schema)
+        self._early_fields = tuple(schema.name for schema in response_schemas)
+        response_schemas += [self.screen_name_schema, self.screen_description_schema]
+        tasks = "\n".join(
+            f"{index}. {schema.description}"
+            for index, schema in enumerate(response_schemas, 1)
+        )
         self._output_parser = StructuredOutputParser.from_response_schemas(
             response_schemas
         )
 
+        # Prompts keep everything that only depends on the screen in front and
+        # the requested element at the very end, so that repeated lookups on one
+        # screen share a byte-identical prefix for provider prompt caching.
         self._return_element_info_prompt_template = PromptTemplate.from_template(
             """
 Here is the hierarchy of UI-elements of the android application screen. 
-Analyze this hierarchy and complete the following tasks with target element = "{screen_element}":
+Analyze this hierarchy and complete the following tasks for the target element given at the end:
 """
             + tasks
             + """
 
+{format_instructions}
+
 Elements hierarchy:
 {hierarchy}
 
-{format_instructions}
+Target element: "{screen_element}"
 """
         )
 
         self._find_view_prompt_template = PromptTemplate.from_template(
             """
-Here is the hierarchy of elements of the android application screen, answer with one word YES or NO. 
-There is something similar or related to "{screen_element}" on the screen?
+Here is the hierarchy of elements of the android application screen, answer the question at the end with one word YES or NO.
 
 Elements hierarchy:
-{hierarchy}"""
+{hierarchy}
+
+There is something similar or related to "{screen_element}" on the screen?"""
+        )
+
+        self._another_xpath_prompt_template = PromptTemplate.from_template(
+            """
+These xpaths were checked against the screen hierarchy above and rejected, \
+a valid xpath must match exactly one element:
+{rejected}
+{candidates}
+Come up with another xpath for the target element "{screen_element}". \
+Return only the xpath string in the response!!!"""
         )
 
         graph_builder = StateGraph(AgentState)
@@ -111,10 +195,18 @@ Elements hierarchy:
         graph_builder.add_node(
             "find_element",
             self._find_element,
-            retry=RetryPolicy(max_attempts=3, retry_on=(LookupError,)),
+            retry_policy=RetryPolicy(
+                max_attempts=self._budget.max_presence_attempts,
+                initial_interval=self._budget.backoff_initial,
+                backoff_factor=self._budget.backoff_factor,
+                max_interval=self._budget.backoff_max,
+                jitter=False,
+                retry_on=self._is_presence_failure,
+            ),
         )
         graph_builder.add_node("get_element_info", self._get_element_info)
         graph_builder.add_node("find_another_xpath", self._find_another_xpath)
+        graph_builder.add_node("escalate_model", self._escalate_model)
 
         graph_builder.add_edge(START, "find_element")
         graph_builder.add_edge("find_element", "get_element_info")
@@ -124,69 +216,408 @@ Elements hierarchy:
         graph_builder.add_conditional_edges(
             "find_another_xpath", self._only_one_element_with_this_xpath
         )
+        graph_builder.add_edge("escalate_model", "get_element_info")
 
         self._graph = graph_builder.compile()
 
-    def _find_element(self, state: AgentState) -> AgentState:
-        self.full_hierarchy = self._device.dump_hierarchy(max_depth=100)
-        state["hierarchy"] = parse_xml_to_tree(self.full_hierarchy)
+    @staticmethod
+    def _is_presence_failure(error: Exception) -> bool:
+        return isinstance(error, LookupError) and not isinstance(error, BudgetExceeded)
+
+    def _build_prompt(
+        self, template: PromptTemplate, values: dict[str, Any]
+    ) -> tuple[list[AnyMessage], dict[str, Any]]:
+        if self._prompt_cache is None:
+            return template.invoke(values).to_messages(), {}
+        return cached_messages(template, values, "screen_element", self._prompt_cache)
+
+    def _initial_tiers(self) -> list[CascadeTier]:
+        if self._cascade is None:
+            return [CascadeTier("model", self._model)]
+        return self._cascade.tiers()
+
+    def _can_escalate(self) -> bool:
+        return self._cascade is not None and self._tier + 1 < len(self._tiers)
+
+    def _escalate(self, record: bool = True) -> bool:
+        """Record a failure of the current tier and move on to the next one.
+
+        Without ``record`` the caller records the outcome of the tier later.
+        """
+
+        if not self._can_escalate():
+            return False
+        if record:
+            self._cascade.record(self._tiers[self._tier], False)
+        self._tier += 1
+        self.logger.info("Escalating to %s", self._tiers[self._tier].name)
+        return True
+
+    def _escalate_model(self, state: AgentState) -> AgentState:
+        self._escalate()
+        return state
 
-        request = self._find_view_prompt_template.invoke(
-            {
-                "screen_element": state["element_request"],
-                "hierarchy": state["hierarchy"],
-            }
-        )
-        response = self._model.invoke(request)
+    def _is_low_confidence(self, element: dict[str, Any]) -> bool:
+        if self._cascade is None:
+            return False
+        try:
+            confidence = float(element.get("confidence", 1.0))
+        except (TypeError, ValueError):
+            return False
+        return confidence < self._cascade.min_confidence
+
+    def _invoke_model(self, request: Any, purpose: str, **kwargs: Any) -> Any:
+        self._tracker.check()
+        tier = self._tiers[self._tier]
+        with self._metrics.span("model.invoke", purpose=purpose) as span:
+            if self._cascade is not None:
+                span.attributes["tier"] = tier.name
+            response = tier.model.invoke(request, **kwargs)
+            self._metrics.record_usage(response, span)
+        self._tracker.charge(sum(token_usage(response)))
+        return response
 
-        if response.text().strip().lower() == "yes":
-            self.logger.info("'%s' presented", state["element_request"])
-            return state
-        else:
-            self.logger.warning(state)
+    def _find_element(self, state: AgentState) -> AgentState:
+        self._presence_attempts += 1
+        if self._presence_attempts > 1:
+            self._metrics.count_retry("presence")
+        self._tracker.check()
+
+        # The retry policy has already waited for the screen to settle, an
+        # unchanged hierarchy would only get the same answer from the model.
+        # The dump is forced: a change too small for the screenshot hash may
+        # be the one the element appeared with.
+        if self._presence_attempts > 1:
+            self.dump_strategy.invalidate(force=True)
+        self.full_hierarchy = self.dump_strategy.dump(self._device)
+        if self.full_hierarchy == self._rejected_hierarchy:
+            self.logger.info(
+                "'%s' screen unchanged, skipping presence check",
+                state["element_request"],
+            )
             raise LookupError()
+        if self._is_present(state):
+            return state
+
+        if self._scroll_search is not None and not self._scrolled:
+            self._scrolled = True
+            if self._scroll_to(state["element_request"]) and self._is_present(state):
+                return state
+
+        self._rejected_hierarchy = self.full_hierarchy
+        self.logger.info("'%s' not presented", state["element_request"])
+        self.logger.debug("Hierarchy:\n%s", state["hierarchy"])
+        raise LookupError()
+
+    def _is_present(self, state: AgentState) -> bool:
+        """Ask the model whether the element is in ``full_hierarchy``."""
+
+        with self._metrics.span("parse.hierarchy"):
+            state["hierarchy"] = parse_xml_to_tree(self.full_hierarchy)
+
+        with self._metrics.span("prompt.build", purpose="find_view"):
+            request, kwargs = self._build_prompt(
+                self._find_view_prompt_template,
+                {
+                    "hierarchy": state["hierarchy"],
+                    "screen_element": state["element_request"],
+                },
+            )
+        # A NO of a cheaper tier is confirmed by the next one: a false negative
+        # would break the step, a false positive only costs the element prompt.
+        declined: list[CascadeTier] = []
+        while True:
+            response = self._invoke_model(request, "find_view", **kwargs)
+            answer = response.text().strip().lower()
+            if answer == "yes":
+                break
+            tier = self._tiers[self._tier]
+            if not self._escalate(record=False):
+                break
+            declined.append(tier)
+
+        if answer == "yes":
+            # The tiers answering NO missed the element. When all tiers answer
+            # NO, they agree and none of them is charged with a failure.
+            for tier in declined:
+                self._cascade.record(tier, False)
+            self.logger.info("'%s' presented", state["element_request"])
+        return answer == "yes"
+
+    def _scroll_to(self, request: str) -> bool:
+        """Scroll containers until a likely match for ``request`` is visible.
+
+        ``full_hierarchy`` is updated to the screen left after scrolling.
+        """
+
+        from uiautomator2.utils import swipe_in_bounds
+
+        def swipe(bounds: tuple[int, int, int, int], direction: str) -> None:
+            swipe_in_bounds(self._device, list(bounds), direction)
+
+        def dump() -> str:
+            # A short scroll may move the content less than a hash cell.
+            self.dump_strategy.invalidate(force=True)
+            return self.dump_strategy.dump(self._device)
+
+        with self._metrics.span("scroll.search"):
+            match, self.full_hierarchy = self._scroll_search.search(
+                request, self.full_hierarchy, swipe, dump
+            )
+        self.logger.info(
+            "'%s' %s after scrolling", request, "found" if match else "not found"
+        )
+        return match is not None
 
     def _get_element_info(self, state: AgentState) -> AgentState:
-        state["messages"] = self._return_element_info_prompt_template.invoke(
-            {
-                "screen_element": state["element_request"],
-                "hierarchy": without_fields(state["hierarchy"], ["bounds"]),
-                "format_instructions": self._output_parser.get_format_instructions(),
-            }
-        ).to_messages()  # type: ignore[assignment]
-        response = self._model.invoke(state["messages"])
+        with self._metrics.span("prompt.build", purpose="element_info"):
+            state["messages"], self._element_info_kwargs = self._build_prompt(
+                self._return_element_info_prompt_template,
+                {
+                    "format_instructions": self._output_parser.get_format_instructions(),
+                    "hierarchy": without_fields(state["hierarchy"], ["bounds"]),
+                    "screen_element": state["element_request"],
+                },
+            )  # type: ignore[assignment]
+        while True:
+            try:
+                if self._stream_output:
+                    element, response = self._stream_element_info(state["messages"])
+                else:
+                    response = self._invoke_model(
+                        state["messages"], "element_info", **self._element_info_kwargs
+                    )
+                    with self._metrics.span("parse.output"):
+                        element = self._output_parser.parse(response.text())
+            except OutputParserException:
+                if self._escalate():
+                    continue
+                raise
+            if not (self._is_low_confidence(element) and self._escalate()):
+                break
         state["messages"].append(response)  # type: ignore[arg-type]
-        state["element"] = self._output_parser.parse(response.text())
+        state["element"] = element
         return state
 
+    def _stream_element_info(
+        self, messages: list[AnyMessage]
+    ) -> tuple[dict[str, Any], AIMessage]:
+        """Stream the element info until the fields needed to act are complete.
+
+        The xpath is validated against the local hierarchy right away. The rest
+        of the answer is consumed in the background and collected by
+        :meth:`complete_element_info`.
+        """
+
+        # An escalated tier replaces the answer of the previous one.
+        self.complete_element_info(cancel=True)
+        self._tracker.check()
+        tier = self._tiers[self._tier]
+        parser = IncrementalJsonFields()
+        chunks: list[Any] = []
+        with self._metrics.span(
+            "model.invoke", purpose="element_info", streaming=True
+        ) as span:
+            if self._cascade is not None:
+                span.attributes["tier"] = tier.name
+            stream = iter(tier.model.stream(messages, **self._element_info_kwargs))
+            for chunk in stream:
+                chunks.append(chunk)
+                parser.feed(chunk.text())
+                if all(name in parser.fields for name in self._early_fields):
+                    break
+            else:
+                stream = None
+
+        if stream is None:
+            response = reduce(operator.add, chunks) if chunks else AIMessage("")
+            self._metrics.record_usage(response, span)
+            self._tracker.charge(sum(token_usage(response)))
+            with self._metrics.span("parse.output"):
+                element = self._output_parser.parse(parser.text)
+        else:
+            self._pending = self._finish_in_background(stream, parser, chunks)
+            element = dict(parser.fields)
+
+        xpath = str(element["xpath"])
+        if HierarchySnapshot(self.full_hierarchy).count(xpath) == 1:
+            self._validated_xpath = xpath
+        return element, AIMessage(parser.text)
+
+    @staticmethod
+    def _finish_in_background(
+        stream: Any, parser: IncrementalJsonFields, chunks: list[Any]
+    ) -> _PendingOutput:
+        pending = _PendingOutput(Future(), parser, chunks)
+
+        def consume() -> None:
+            try:
+                for chunk in stream:
+                    # A received chunk may carry the usage of the answer.
+                    chunks.append(chunk)
+                    if pending.cancelled.is_set():
+                        break
+                    parser.feed(chunk.text())
+            except BaseException as error:
+                pending.future.set_exception(error)
+            else:
+                pending.future.set_result(None)
+            finally:
+                close = getattr(stream, "close", None)
+                if close is not None:
+                    close()
+
+        threading.Thread(target=consume, daemon=True).start()
+        return pending
+
+    def complete_element_info(self, cancel: bool = False) -> dict[str, Any]:
+        """Wait for a streamed answer and return the fields it completed.
+
+        With ``cancel`` the stream is closed at the next chunk. Token usage of
+        the whole answer is recorded for the current step. Without a pending
+        answer an empty dictionary is returned.
+        """
+
+        pending, self._pending = self._pending, None
+        if pending is None:
+            return {}
+        if cancel:
+            pending.cancelled.set()
+        try:
+            with self._metrics.span("wait.stream"):
+                pending.future.result()
+        except Exception:
+            self.logger.warning("Streaming element info failed", exc_info=True)
+        if pending.chunks:
+            response = reduce(operator.add, pending.chunks)
+            self._metrics.record_usage(response)
+            self._tracker.charge(sum(token_usage(response)))
+        return dict(pending.parser.fields)
+
     def _find_another_xpath(self, state: AgentState) -> AgentState:
-        state["messages"].append(
-            "Come up with another xpath, this one doesn't work. "
-            "Return only the xpath string in the response!!!"
-        )  # type: ignore[arg-type]
-        response = self._model.invoke(state["messages"])
-        state["messages"].append(response)  # type: ignore[arg-type]
-        state["element"]["xpath"] = response.text()
+        self._xpath_retries += 1
+        if self._xpath_retries > self._budget.max_xpath_retries:
+            raise BudgetExceeded(
+                f"step budget: {self._budget.max_xpath_retries} xpath retries"
+            )
+        self._metrics.count_retry("xpath")
+
+        xpath = str(state["element"]["xpath"])
+        snapshot = HierarchySnapshot(self.full_hierarchy)
+        rejected = [*state.get("rejected_xpaths", []), (xpath, snapshot.count(xpath))]
+        state["rejected_xpaths"] = rejected
+
+        # The conversation is never extended: every retry re-sends the last
+        # element prompt and answer plus a bounded summary, so its cost stays
+        # flat. Earlier pairs are answers of cheaper cascade tiers.
+        with self._metrics.span("prompt.build", purpose="another_xpath"):
+            retry_prompt = self._another_xpath_prompt_template.format(
+                rejected="\n".join(
+                    f"- {rejected_xpath} (matches: {count})"
+                    for rejected_xpath, count in rejected[
+                        -self.max_rejected_in_prompt :
+                    ]
+                ),
+                candidates=self._candidates_hint(snapshot, xpath),
+                screen_element=state["element_request"],
+            )
+        response = self._invoke_model(
+            [*state["messages"][-2:], HumanMessage(retry_prompt)],
+            "another_xpath",
+            **self._element_info_kwargs,
+        )
+        state["element"]["xpath"] = response.text().strip().strip("`").strip()
         return state
 
+    def _candidates_hint(self, snapshot: HierarchySnapshot, xpath: str) -> str:
+        candidates = snapshot.describe(xpath, self.max_candidates_in_prompt)
+        if len(candidates) < 2:
+            return ""
+        lines = "\n".join(f"- {candidate}" for candidate in candidates)
+        return f"The last xpath matched these candidates:\n{lines}\n"
+
     def _only_one_element_with_this_xpath(self, state: AgentState) -> str:
         xpath = state["element"]["xpath"]
-        try:
-            elements = len(self._device.xpath(xpath).all())
-        except XPathError:
-            elements = 0
+        if xpath == self._validated_xpath:
+            # Already matched exactly one node of the hierarchy while streaming.
+            elements = 1
+        else:
+            # The hierarchy the model answered on, no further device dump.
+            elements = HierarchySnapshot(self.full_hierarchy).count(xpath)
 
         if elements == 1:
-            self.logger.info(f"'Single element with xpath = {xpath}")
+            self.logger.info("Single element with xpath = %s", xpath)
+            if self._cascade is not None:
+                self._cascade.record(self._tiers[self._tier], True)
             return END
+        elif self._can_escalate():
+            return "escalate_model"
         else:
-            self.logger.info(f"Retry: {elements} with xpath = {xpath}")
+            self.logger.info("Retry: %d elements with xpath = %s", elements, xpath)
             return "find_another_xpath"
 
-    def find_element_info(self, request: str) -> dict[str, Any]:
-        """Return details about the requested element in a JSON-friendly format."""
+    def _known_element_info(self, request: str) -> dict[str, Any] | None:
+        """Resolve ``request`` by an xpath that worked for it in stored traces.
+
+        A known xpath is only used when it matches exactly one node of the
+        current hierarchy, otherwise the model resolves the element.
+        """
+
+        if self._known_elements is None:
+            return None
+        with self._metrics.span("trace_store.lookup"):
+            known = self._known_elements.known_elements(request)
+        if not known:
+            return None
+
+        self.full_hierarchy = self.dump_strategy.dump(self._device)
+        snapshot = HierarchySnapshot(self.full_hierarchy)
+        for record in known:
+            if snapshot.count(record.xpath) != 1:
+                continue
+            self.logger.info("'%s' resolved from trace store", request)
+            with self._metrics.span("parse.hierarchy"):
+                hierarchy = parse_xml_to_tree(self.full_hierarchy)
+            return {
+                "element_request": request,
+                "hierarchy": [node.to_dict() for node in hierarchy],
+                "element": {
+                    "screen": record.screen or "",
+                    "screen_description": record.screen_description or "",
+                    "name": record.element,
+                    "xpath": record.xpath,
+                },
+            }
+        return None
 
-        result = self._graph.invoke({"element_request": request})
+    def find_element_info(self, request: str) -> dict[str, Any]:
+        """Return details about the requested element in a JSON-friendly format.
+
+        Raises :class:`LookupError` when the element is not on the screen and
+        :class:`BudgetExceeded` when the resolution budget runs out. With
+        ``stream_output`` the screen fields may still be streaming; they are
+        returned by :meth:`complete_element_info`.
+        """
+
+        # Tokens still streaming for the previous step are charged to its
+        # budget, before the tracker of this step is created.
+        self.complete_element_info(cancel=True)
+        self._presence_attempts = 0
+        self._xpath_retries = 0
+        self._rejected_hierarchy = None
+        self._scrolled = False
+        self._tracker = BudgetTracker(self._budget, self._scenario_budget)
+        self._tiers = self._initial_tiers()
+        self._tier = 0
+        self._validated_xpath = None
+        known = self._known_element_info(request)
+        if known is not None:
+            return known
+        try:
+            result = self._graph.invoke({"element_request": request})
+        except BaseException:
+            self.complete_element_info(cancel=True)
+            raise
         info = {k: v for k, v in result.items() if k != "messages"}
         info["hierarchy"] = [node.to_dict() for node in info.get("hierarchy", [])]
         return info
@@ -0,0 +1,213 @@
+"""Hierarchy dump settings, reuse of recent dumps and dump-cost profiling."""
+
+from __future__ import annotations
+
+import time
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, Callable, cast
+from xml.etree import ElementTree
+
+if TYPE_CHECKING:
+    from explorer.screen_hash import ScreenChangeDetector
+
+# Attributes marking nodes an action or a prompt may target.
+_INTERACTIVE = ("clickable", "long-clickable", "checkable", "scrollable", "focusable")
+_LABELS = ("text", "content-desc")
+
+
+@dataclass
+class DumpProfile:
+    """Accumulated dump cost of one screen."""
+
+    screen: str
+    dumps: int = 0
+    reused: int = 0
+    total_bytes: int = 0
+    total_seconds: float = 0.0
+    max_bytes: int = 0
+    max_seconds: float = 0.0
+    depth: int | None = None
+
+    @property
+    def mean_seconds(self) -> float:
+        return self.total_seconds / self.dumps if self.dumps else 0.0
+
+    @property
+    def mean_bytes(self) -> float:
+        return self.total_bytes / self.dumps if self.dumps else 0.0
+
+
+def relevant_depth(xml: str) -> int:
+    """Return the depth of the deepest visible interactive or labelled node.
+
+    Top level nodes have depth ``1``; ``0`` is returned for unparsable or empty
+    hierarchies.
+    """
+
+    try:
+        root = ElementTree.fromstring(xml)
+    except ElementTree.ParseError:
+        return 0
+
+    deepest = 0
+    stack = [(node, 1) for node in root.findall("node")]
+    while stack:
+        node, depth = stack.pop()
+        attrib = node.attrib
+        if attrib.get("visible-to-user", "true") != "true":
+            continue
+        if any(attrib.get(key) == "true" for key in _INTERACTIVE) or any(
+            attrib.get(key) for key in _LABELS
+        ):
+            deepest = max(deepest, depth)
+        stack.extend((child, depth + 1) for child in node.findall("node"))
+    return deepest
+
+
+class DumpStrategy:
+    """Decide how hierarchies are dumped and when a recent dump is reused.
+
+    The defaults reproduce a plain ``dump_hierarchy(max_depth=100)``.
+    ``compressed`` asks uiautomator to skip layout-only views. With
+    ``adaptive_depth`` every activity is first dumped at ``max_depth`` and then
+    at the depth of its deepest interactive or labelled node plus
+    ``depth_margin``; a dump that reaches the margin widens the depth again.
+    A dump younger than ``reuse_ttl`` seconds is returned without a device call
+    until :meth:`invalidate` is called, which the explorer does after every
+    action. With a ``change_detector`` the last dump is also reused, after an
+    invalidation too, while a screenshot hash shows the screen unchanged,
+    unless it is invalidated with ``force``; :attr:`last_hash` is the hash of
+    the screen the last dump was taken on.
+
+    A strategy serves one device at a time, ``profiles`` accumulate the size
+    and duration of dumps per screen.
+    """
+
+    def __init__(
+        self,
+        compressed: bool = False,
+        max_depth: int = 100,
+        adaptive_depth: bool = False,
+        depth_margin: int = 2,
+        reuse_ttl: float = 0.0,
+        change_detector: ScreenChangeDetector | None = None,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.compressed = compressed
+        self.max_depth = max_depth
+        self.adaptive_depth = adaptive_depth
+        self.depth_margin = depth_margin
+        self.reuse_ttl = reuse_ttl
+        self.change_detector = change_detector
+        self.last_hash: str | None = None
+        self.profiles: dict[str, DumpProfile] = {}
+        self._clock = clock
+        self._depths: dict[str, int] = {}
+        self._recent: tuple[float, str, str] | None = None
+        self._last: tuple[str, str] | None = None
+
+    def invalidate(self, force: bool = False) -> None:
+        """Forget the recent dump, e.g. after an action changed the screen.
+
+        With ``force`` the next dump is taken even if the screenshot hash is
+        unchanged, for changes too small for the hash.
+        """
+
+        self._recent = None
+        if force:
+            self._last = None
+
+    def dump(self, device: Any) -> str:
+        """Return the current hierarchy of ``device``."""
+
+        now = self._clock()
+        if self._recent is not None and now - self._recent[0] < self.reuse_ttl:
+            _, screen, xml = self._recent
+            self._profile(screen).reused += 1
+            return xml
+
+        if self.change_detector is not None:
+            image_hash = self.change_detector.capture(device)
+            if self._last is not None and self.change_detector.same(
+                self.last_hash, image_hash
+            ):
+                screen, xml = self._last
+                self._profile(screen).reused += 1
+                self._recent = (now, screen, xml)
+                return xml
+            self.last_hash = image_hash
+
+        activity = self._activity(device) if self.adaptive_depth else None
+        depth = (
+            self._depths.get(activity, self.max_depth) if activity else self.max_depth
+        )
+        kwargs: dict[str, Any] = {"max_depth": depth}
+        if self.compressed:
+            kwargs["compressed"] = True
+
+        start = self._clock()
+        xml = cast(str, device.dump_hierarchy(**kwargs))
+        elapsed = self._clock() - start
+
+        screen = activity or self._package(xml)
+        if self.adaptive_depth:
+            self._learn_depth(screen, depth, xml)
+
+        profile = self._profile(screen)
+        size = len(xml.encode("utf-8"))
+        profile.dumps += 1
+        profile.total_bytes += size
+        profile.total_seconds += elapsed
+        profile.max_bytes = max(profile.max_bytes, size)
+        profile.max_seconds = max(profile.max_seconds, elapsed)
+        profile.depth = depth
+
+        self._recent = (self._clock(), screen, xml)
+        self._last = (screen, xml)
+        return xml
+
+    def most_expensive(self, limit: int = 10) -> list[DumpProfile]:
+        """Return screens ordered by the total time spent dumping them."""
+
+        return sorted(
+            self.profiles.values(), key=lambda profile: -profile.total_seconds
+        )[:limit]
+
+    def _learn_depth(self, screen: str, depth: int, xml: str) -> None:
+        deepest = relevant_depth(xml)
+        if deepest == 0:
+            return
+        if screen in self._depths and deepest + self.depth_margin > depth:
+            # Relevant nodes reach the cut off, deeper ones may be missing.
+            del self._depths[screen]
+            return
+        self._depths[screen] = min(self.max_depth, deepest + self.depth_margin)
+
+    def _profile(self, screen: str) -> DumpProfile:
+        profile = self.profiles.get(screen)
+        if profile is None:
+            profile = self.profiles[screen] = DumpProfile(screen)
+        return profile
+
+    @staticmethod
+    def _activity(device: Any) -> str | None:
+        from uiautomator2.exceptions import (  # type: ignore[import-untyped]
+            DeviceError,
+        )
+
+        try:
+            current = device.app_current()
+        except DeviceError:
+            return None
+        return f"{current['package']}/{current['activity']}"
+
+    @staticmethod
+    def _package(xml: str) -> str:
+        start = xml.find('package="')
+        quote = '"'
+        if start < 0:
+            start, quote = xml.find("package='"), "'"
+        if start < 0:
+            return "unknown"
+        start += len("package=") + 1
+        return xml[start : xml.find(quote, start)]
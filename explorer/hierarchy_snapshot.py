@@ -0,0 +1,74 @@
+"""Local evaluation of xpaths against an already dumped hierarchy."""
+
+from __future__ import annotations
+
+from functools import cached_property
+from typing import Any, cast
+
+
+class HierarchySnapshot:
+    """Hierarchy dump queried locally instead of through device RPCs.
+
+    XPaths follow ``uiautomator2`` semantics: node classes are used as tag
+    names, so ``//android.widget.Button[@text='OK']`` matches as on a device.
+    """
+
+    def __init__(self, xml: str) -> None:
+        self.xml = xml
+
+    @cached_property
+    def _source(self) -> Any:
+        from uiautomator2.xpath import PageSource  # type: ignore[import-untyped]
+
+        return PageSource(self.xml)
+
+    def find(self, xpath: str) -> list[Any]:
+        """Return ``uiautomator2`` elements matching ``xpath``.
+
+        Invalid xpaths and unparsable hierarchies match nothing.
+        """
+
+        from lxml.etree import LxmlError  # type: ignore[import-untyped]
+        from uiautomator2.xpath import XPath, XPathError
+
+        if not self.xml:
+            return []
+        try:
+            return cast(list[Any], self._source.find_elements(XPath(xpath)))
+        except (XPathError, LxmlError):
+            return []
+
+    def count(self, xpath: str) -> int:
+        """Return the number of nodes matching ``xpath``."""
+
+        return len(self.find(xpath))
+
+    def bounds(self, xpath: str) -> tuple[int, int, int, int] | None:
+        """Return ``(left, top, right, bottom)`` of the single node matching ``xpath``.
+
+        ``None`` is returned when the xpath is ambiguous, matches nothing or the
+        node has empty bounds.
+        """
+
+        elements = self.find(xpath)
+        if len(elements) != 1:
+            return None
+        left, top, right, bottom = elements[0].bounds
+        if right <= left or bottom <= top:
+            return None
+        return left, top, right, bottom
+
+    def describe(self, xpath: str, limit: int = 5) -> list[str]:
+        """Return one line per matching node with its path and key attributes."""
+
+        lines = []
+        for element in self.find(xpath)[:limit]:
+            attributes = {
+                key: element.attrib[key]
+                for key in ("resource-id", "text", "content-desc", "bounds")
+                if element.attrib.get(key)
+            }
+            path = element.elem.getroottree().getpath(element.elem)
+            details = " ".join(f"{key}={value!r}" for key, value in attributes.items())
+            lines.append(f"{path} {details}".rstrip())
+        return lines
@@ -0,0 +1,100 @@
+"""Hierarchy XML kept as subtrees shared between dumps."""
+
+from __future__ import annotations
+
+import re
+import threading
+import weakref
+from dataclasses import dataclass
+
+# A tag, an unterminated tag at the end of the text, or the text in between.
+_TOKEN = re.compile(r"<[^>]*>?|[^<]+")
+
+
+def _opens(token: str) -> bool:
+    return (
+        token.startswith("<")
+        and token.endswith(">")
+        and not token.endswith("/>")
+        and token[1:2] not in ("/", "?", "!")
+    )
+
+
+@dataclass(frozen=True, slots=True, weakref_slot=True, eq=False)
+class XmlSubtree:
+    """An element of a hierarchy: its opening tag, children and closing tag.
+
+    Self-closing tags and the text between tags are subtrees without children
+    and closing tag. Subtrees returned by a :class:`SubtreeInterner` are
+    shared between hierarchies.
+    """
+
+    head: str
+    children: tuple[XmlSubtree, ...] = ()
+    tail: str = ""
+
+    def __str__(self) -> str:
+        parts: list[str] = []
+        stack: list[XmlSubtree | str] = [self]
+        while stack:
+            item = stack.pop()
+            if isinstance(item, str):
+                parts.append(item)
+                continue
+            parts.append(item.head)
+            stack.append(item.tail)
+            stack.extend(reversed(item.children))
+        return "".join(parts)
+
+
+class SubtreeInterner:
+    """Store structurally identical subtrees of hierarchy XML once.
+
+    A subtree is keyed by its tags and the identities of its children, which
+    are interned first, so equal keys mean equal subtrees. Consecutive dumps
+    differing in one leaf, e.g. the status bar clock, then share everything
+    but the path from the root to that leaf. Entries are weak: a subtree is
+    dropped once no split hierarchy references it.
+    """
+
+    def __init__(self) -> None:
+        self._subtrees: weakref.WeakValueDictionary[tuple[object, ...], XmlSubtree] = (
+            weakref.WeakValueDictionary()
+        )
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._subtrees)
+
+    def split(self, xml: str) -> XmlSubtree:
+        """Return ``xml`` as interned subtrees; ``str()`` of it equals ``xml``.
+
+        Text that is not well-formed is split as far as its tags allow.
+        """
+
+        stack: list[tuple[str, list[XmlSubtree]]] = [("", [])]
+        with self._lock:
+            for token in _TOKEN.findall(xml):
+                if token.startswith("</") and len(stack) > 1:
+                    head, children = stack.pop()
+                    stack[-1][1].append(self._intern(head, children, token))
+                elif _opens(token):
+                    stack.append((token, []))
+                else:
+                    stack[-1][1].append(self._intern(token, [], ""))
+            while len(stack) > 1:
+                head, children = stack.pop()
+                stack[-1][1].append(self._intern(head, children, ""))
+            return self._intern("", stack[0][1], "")
+
+    def _intern(self, head: str, children: list[XmlSubtree], tail: str) -> XmlSubtree:
+        key = (head, tail, *map(id, children))
+        subtree = self._subtrees.get(key)
+        if subtree is None:
+            subtree = XmlSubtree(head, tuple(children), tail)
+            self._subtrees[key] = subtree
+        return subtree
+
+
+# Shared by all screens, so that frames of all runs in a process share subtrees.
+SHARED_SUBTREES = SubtreeInterner()
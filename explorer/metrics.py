@@ -0,0 +1,244 @@
+"""Per-step latency and token instrumentation for Explorer."""
+
+from __future__ import annotations
+
+import json
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Iterable, Iterator, Protocol
+
+
+@dataclass
+class Span:
+    """Timed section of work such as a device RPC or a model call."""
+
+    name: str
+    start: float
+    duration: float = 0.0
+    attributes: dict[str, Any] = field(default_factory=dict)
+
+
+@dataclass
+class StepMetrics:
+    """Aggregated measurements of a single scenario step."""
+
+    duration: float = 0.0
+    device_calls: int = 0
+    model_calls: int = 0
+    input_tokens: int = 0
+    output_tokens: int = 0
+    presence_retries: int = 0
+    xpath_retries: int = 0
+    spans: list[Span] = field(default_factory=list)
+    attributes: dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def total_tokens(self) -> int:
+        """Return the sum of input and output tokens."""
+
+        return self.input_tokens + self.output_tokens
+
+    def time_in(self, name: str) -> float:
+        """Return the total duration of spans named ``name`` or nested under it."""
+
+        prefix = name + "."
+        return sum(
+            span.duration
+            for span in self.spans
+            if span.name == name or span.name.startswith(prefix)
+        )
+
+    def to_dict(self) -> dict[str, Any]:
+        """Return a JSON serialisable representation of the metrics."""
+
+        return asdict(self)
+
+
+def token_usage(response: Any) -> tuple[int, int]:
+    """Return input and output tokens reported by a chat model ``response``."""
+
+    usage = getattr(response, "usage_metadata", None) or {}
+    return int(usage.get("input_tokens", 0)), int(usage.get("output_tokens", 0))
+
+
+class MetricsExporter(Protocol):
+    """Receiver of finished spans and steps."""
+
+    def export_span(self, span: Span) -> None: ...
+
+    def export_step(self, metrics: StepMetrics) -> None: ...
+
+
+class JsonLinesExporter:
+    """Append every finished step as a JSON line to ``path``."""
+
+    def __init__(self, path: str | Path) -> None:
+        self._path = Path(path)
+        self._lock = threading.Lock()
+
+    def export_span(self, span: Span) -> None:
+        """Spans are written as part of their step."""
+
+    def export_step(self, metrics: StepMetrics) -> None:
+        line = json.dumps(metrics.to_dict(), ensure_ascii=False, default=str)
+        with self._lock, self._path.open("a", encoding="utf-8") as file:
+            file.write(line + "\n")
+
+
+class OpenTelemetryCallbackExporter:
+    """Forward spans to ``callback`` using OpenTelemetry field names.
+
+    The callback receives a dictionary with ``name``, ``start_time_unix_nano``,
+    ``end_time_unix_nano`` and ``attributes`` keys, which maps directly onto
+    ``tracer.start_span(...)``/``span.end(...)`` of an OpenTelemetry SDK.
+    """
+
+    def __init__(self, callback: Callable[[dict[str, Any]], None]) -> None:
+        self._callback = callback
+
+    def export_span(self, span: Span) -> None:
+        start = int(span.start * 1_000_000_000)
+        self._callback(
+            {
+                "name": span.name,
+                "start_time_unix_nano": start,
+                "end_time_unix_nano": start + int(span.duration * 1_000_000_000),
+                "attributes": dict(span.attributes),
+            }
+        )
+
+    def export_step(self, metrics: StepMetrics) -> None:
+        """Steps have no OpenTelemetry counterpart; their spans are exported."""
+
+
+class MetricsRecorder:
+    """Collect spans, token usage and retry counts for scenario steps.
+
+    Spans recorded between :meth:`start_step` and :meth:`finish_step` are
+    aggregated into a :class:`StepMetrics`. Spans outside of a step are only
+    forwarded to the exporters.
+    """
+
+    def __init__(self, exporters: Iterable[MetricsExporter] = ()) -> None:
+        self._exporters = list(exporters)
+        self._local = threading.local()
+
+    @property
+    def current_step(self) -> StepMetrics | None:
+        """Return metrics of the step in progress on this thread."""
+
+        return getattr(self._local, "step", None)
+
+    def start_step(self, **attributes: Any) -> StepMetrics:
+        """Begin collecting metrics for a new step."""
+
+        step = StepMetrics(attributes=attributes)
+        self._local.step = step
+        self._local.step_start = time.perf_counter()
+        return step
+
+    def finish_step(self) -> StepMetrics | None:
+        """Close the current step and hand it over to the exporters."""
+
+        step = self.current_step
+        if step is None:
+            return None
+        step.duration = time.perf_counter() - self._local.step_start
+        self._local.step = None
+        for exporter in self._exporters:
+            exporter.export_step(step)
+        return step
+
+    @contextmanager
+    def span(self, name: str, **attributes: Any) -> Iterator[Span]:
+        """Time the enclosed block as a span called ``name``.
+
+        Span names starting with ``device.`` and ``model.`` are counted as
+        device RPCs and model calls respectively.
+        """
+
+        span = Span(name=name, start=time.time(), attributes=attributes)
+        started = time.perf_counter()
+        try:
+            yield span
+        finally:
+            span.duration = time.perf_counter() - started
+            step = self.current_step
+            if step is not None:
+                step.spans.append(span)
+                if name.startswith("device."):
+                    step.device_calls += 1
+                elif name.startswith("model."):
+                    step.model_calls += 1
+            for exporter in self._exporters:
+                exporter.export_span(span)
+
+    def record_usage(self, response: Any, span: Span | None = None) -> None:
+        """Add token usage reported by a chat model ``response``."""
+
+        input_tokens, output_tokens = token_usage(response)
+        if span is not None:
+            span.attributes["input_tokens"] = input_tokens
+            span.attributes["output_tokens"] = output_tokens
+        step = self.current_step
+        if step is not None:
+            step.input_tokens += input_tokens
+            step.output_tokens += output_tokens
+
+    def count_retry(self, kind: str) -> None:
+        """Increment the ``presence`` or ``xpath`` retry counter of the step."""
+
+        step = self.current_step
+        if step is None:
+            return
+        if kind == "presence":
+            step.presence_retries += 1
+        else:
+            step.xpath_retries += 1
+
+    def instrument(self, device: Any) -> Any:
+        """Return ``device`` wrapped so that every RPC is recorded as a span."""
+
+        if isinstance(device, InstrumentedDevice) and device._metrics is self:
+            return device
+        return InstrumentedDevice(device, self)
+
+
+class InstrumentedDevice:
+    """Proxy timing every method call of the wrapped device as a span."""
+
+    _UNTIMED = frozenset({"xpath"})
+
+    def __init__(self, target: Any, metrics: MetricsRecorder, prefix: str = "device"):
+        self._target = target
+        self._metrics = metrics
+        self._prefix = prefix
+
+    def __call__(self, *args: Any, **kwargs: Any) -> Any:
+        return InstrumentedDevice(
+            self._target(*args, **kwargs), self._metrics, self._prefix
+        )
+
+    def __getattr__(self, name: str) -> Any:
+        attr = getattr(self._target, name)
+        if not callable(attr):
+            return attr
+        span_name = f"{self._prefix}.{name}"
+
+        if name in self._UNTIMED:
+
+            def untimed(*args: Any, **kwargs: Any) -> Any:
+                return InstrumentedDevice(
+                    attr(*args, **kwargs), self._metrics, span_name
+                )
+
+            return untimed
+
+        def timed(*args: Any, **kwargs: Any) -> Any:
+            with self._metrics.span(span_name):
+                return attr(*args, **kwargs)
+
+        return timed
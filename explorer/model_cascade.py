@@ -0,0 +1,94 @@
+"""Ordered chat models tried cheapest first, escalating on failures."""
+
+from __future__ import annotations
+
+import threading
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Sequence
+
+if TYPE_CHECKING:
+    from langchain_core.language_models import BaseChatModel
+
+
+@dataclass
+class CascadeTier:
+    """One model of a cascade with its resolution outcomes."""
+
+    name: str
+    model: BaseChatModel
+    attempts: int = 0
+    successes: int = 0
+
+    @property
+    def success_rate(self) -> float:
+        return self.successes / self.attempts if self.attempts else 1.0
+
+
+class ModelCascade:
+    """Chat models ordered from cheapest to most capable.
+
+    Callers start with the first tier of :meth:`tiers` and escalate to the
+    next one when an answer fails local validation, does not parse or reports
+    a confidence below ``min_confidence``; every outcome is reported through
+    :meth:`record`. With ``reorder`` a tier whose success rate drops below
+    ``min_success_rate`` after ``min_attempts`` is moved behind the reliable
+    tiers, so that steps stop paying for a model that rarely helps.
+
+    A cascade may be shared between concurrent navigators.
+    """
+
+    def __init__(
+        self,
+        models: Sequence[BaseChatModel],
+        names: Sequence[str] | None = None,
+        min_confidence: float = 0.7,
+        reorder: bool = True,
+        min_attempts: int = 20,
+        min_success_rate: float = 0.25,
+    ) -> None:
+        if not models:
+            raise ValueError("a cascade needs at least one model")
+        names = names or [
+            f"{index}:{getattr(model, '_llm_type', type(model).__name__)}"
+            for index, model in enumerate(models)
+        ]
+        self._tiers = [CascadeTier(name, model) for name, model in zip(names, models)]
+        self.min_confidence = min_confidence
+        self.reorder = reorder
+        self.min_attempts = min_attempts
+        self.min_success_rate = min_success_rate
+        self._lock = threading.Lock()
+
+    def tiers(self) -> list[CascadeTier]:
+        """Return tiers in the order they should be tried."""
+
+        with self._lock:
+            if not self.reorder:
+                return list(self._tiers)
+            return sorted(self._tiers, key=self._is_unreliable)
+
+    def record(self, tier: CascadeTier, success: bool) -> None:
+        """Count one resolution attempt of ``tier``."""
+
+        with self._lock:
+            tier.attempts += 1
+            tier.successes += success
+
+    def stats(self) -> dict[str, dict[str, float]]:
+        """Return attempts, successes and success rate per tier name."""
+
+        with self._lock:
+            return {
+                tier.name: {
+                    "attempts": tier.attempts,
+                    "successes": tier.successes,
+                    "success_rate": tier.success_rate,
+                }
+                for tier in self._tiers
+            }
+
+    def _is_unreliable(self, tier: CascadeTier) -> bool:
+        return (
+            tier.attempts >= self.min_attempts
+            and tier.success_rate < self.min_success_rate
+        )
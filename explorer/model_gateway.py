@@ -0,0 +1,238 @@
+"""Chat model wrapper shared by concurrent explorers.
+
+:class:`ModelGateway` coalesces identical in-flight prompts, enforces request
+and token rate limits with token buckets and serves waiting callers in arrival
+order.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from contextlib import nullcontext
+from dataclasses import dataclass, replace
+from typing import Any, Callable
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from pydantic import PrivateAttr
+
+from explorer.metrics import MetricsRecorder
+
+# mypy: ignore-errors
+
+
+class TokenBucket:
+    """Token bucket refilled continuously at ``rate`` per second."""
+
+    def __init__(
+        self, rate: float, capacity: float, clock: Callable[[], float]
+    ) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self._clock = clock
+        self._tokens = capacity
+        self._updated = clock()
+
+    def _refill(self) -> None:
+        now = self._clock()
+        self._tokens = min(
+            self.capacity, self._tokens + (now - self._updated) * self.rate
+        )
+        self._updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Return seconds until ``amount`` can be taken, ``0`` if it can now."""
+
+        self._refill()
+        amount = min(amount, self.capacity)
+        return max(0.0, (amount - self._tokens) / self.rate)
+
+    def take(self, amount: float) -> None:
+        """Take ``amount``; the bucket may go negative to repay an estimate."""
+
+        self._refill()
+        self._tokens -= amount
+
+
+@dataclass
+class GatewayStats:
+    """Counters of a :class:`ModelGateway`."""
+
+    requests: int = 0
+    coalesced: int = 0
+    queued: int = 0
+    total_wait: float = 0.0
+    max_wait: float = 0.0
+
+    @property
+    def mean_wait(self) -> float:
+        return self.total_wait / self.requests if self.requests else 0.0
+
+
+def estimate_prompt_tokens(messages: list[BaseMessage]) -> int:
+    """Roughly estimate prompt tokens as four characters per token."""
+
+    return max(1, sum(len(message.text()) for message in messages) // 4)
+
+
+class ModelGateway(BaseChatModel):
+    """Share one chat ``model`` between concurrent callers.
+
+    Identical prompts already in flight are not sent again: the first caller
+    makes the request and the others receive a copy of its answer without
+    ``usage_metadata``, so tokens are only accounted once. Requests wait for
+    ``requests_per_minute`` and ``tokens_per_minute`` token buckets, which
+    hold ``burst_seconds`` worth of capacity, and are admitted strictly in
+    arrival order. Prompt tokens are estimated up front and corrected by the
+    reported usage.
+
+    Time spent waiting is recorded in :attr:`stats` and, when ``metrics`` is
+    given, as ``queue.model`` spans of the caller's step.
+    """
+
+    model: BaseChatModel
+    requests_per_minute: float | None = None
+    tokens_per_minute: float | None = None
+    burst_seconds: float = 60.0
+    metrics: MetricsRecorder | None = None
+    clock: Callable[[], float] = time.monotonic
+
+    _lock: threading.Condition = PrivateAttr(default_factory=threading.Condition)
+    _inflight: dict[str, Future] = PrivateAttr(default_factory=dict)
+    _queue: deque = PrivateAttr(default_factory=deque)
+    _requests: TokenBucket | None = PrivateAttr(default=None)
+    _tokens: TokenBucket | None = PrivateAttr(default=None)
+    _stats: GatewayStats = PrivateAttr(default_factory=GatewayStats)
+
+    def model_post_init(self, context: Any) -> None:
+        super().model_post_init(context)
+        if self.requests_per_minute:
+            self._requests = self._bucket(self.requests_per_minute)
+        if self.tokens_per_minute:
+            self._tokens = self._bucket(self.tokens_per_minute)
+
+    def _bucket(self, per_minute: float) -> TokenBucket:
+        rate = per_minute / 60
+        return TokenBucket(rate, max(1.0, rate * self.burst_seconds), self.clock)
+
+    @property
+    def _llm_type(self) -> str:
+        return "gateway"
+
+    @property
+    def stats(self) -> GatewayStats:
+        """Return a snapshot of the gateway counters."""
+
+        with self._lock:
+            return replace(self._stats, queued=len(self._queue))
+
+    def _generate(
+        self,
+        messages: list[BaseMessage],
+        stop: list[str] | None = None,
+        run_manager: Any = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        key = self._key(messages, stop, kwargs)
+        with self._lock:
+            pending = self._inflight.get(key)
+            if pending is None:
+                pending = self._inflight[key] = Future()
+                leader = True
+            else:
+                self._stats.coalesced += 1
+                leader = False
+
+        if not leader:
+            return _without_usage(pending.result())
+
+        try:
+            estimate = estimate_prompt_tokens(messages)
+            with self.metrics.span("queue.model") if self.metrics else nullcontext():
+                self._admit(estimate)
+            result = self.model._generate(messages, stop=stop, **kwargs)
+            self._settle(result, estimate)
+        except BaseException as error:
+            pending.set_exception(error)
+            raise
+        else:
+            pending.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._inflight[key]
+
+    def _admit(self, estimate: int) -> None:
+        """Block until this caller is first in line and the buckets allow it."""
+
+        ticket = object()
+        start = self.clock()
+        with self._lock:
+            self._queue.append(ticket)
+            while True:
+                wait = 0.0
+                if self._queue[0] is ticket:
+                    wait = self._wait_time(estimate)
+                    if wait == 0.0:
+                        break
+                self._lock.wait(timeout=wait or None)
+            self._queue.popleft()
+            if self._requests is not None:
+                self._requests.take(1)
+            if self._tokens is not None:
+                self._tokens.take(estimate)
+            waited = self.clock() - start
+            self._stats.requests += 1
+            self._stats.total_wait += waited
+            self._stats.max_wait = max(self._stats.max_wait, waited)
+            self._lock.notify_all()
+
+    def _wait_time(self, estimate: int) -> float:
+        wait = 0.0
+        if self._requests is not None:
+            wait = max(wait, self._requests.wait_time(1))
+        if self._tokens is not None:
+            wait = max(wait, self._tokens.wait_time(estimate))
+        return wait
+
+    def _settle(self, result: ChatResult, estimate: int) -> None:
+        """Charge the token bucket with the difference to the reported usage."""
+
+        if self._tokens is None or not result.generations:
+            return
+        usage = getattr(result.generations[0].message, "usage_metadata", None)
+        if not usage:
+            return
+        with self._lock:
+            self._tokens.take(usage.get("total_tokens", 0) - estimate)
+
+    @staticmethod
+    def _key(
+        messages: list[BaseMessage], stop: list[str] | None, kwargs: dict[str, Any]
+    ) -> str:
+        payload = json.dumps(
+            [
+                [message.model_dump(exclude={"id"}) for message in messages],
+                stop,
+                kwargs,
+            ],
+            sort_keys=True,
+            default=str,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _without_usage(result: ChatResult) -> ChatResult:
+    generations = []
+    for generation in result.generations:
+        message = generation.message.model_copy(update={"usage_metadata": None})
+        generations.append(
+            ChatGeneration(message=message, generation_info=generation.generation_info)
+        )
+    return ChatResult(generations=generations, llm_output=result.llm_output)
@@ -2,13 +2,38 @@ from __future__ import annotations
 
 from dataclasses import asdict, dataclass
 from enum import Enum
-from typing import List, Optional
+from typing import Any, List, Optional
 
 from pydantic import BaseModel, Field
 
+from explorer.hierarchy_subtrees import SHARED_SUBTREES
+from explorer.metrics import Span, StepMetrics
+
 # mypy: ignore-errors
 
 
+# Keys accepted by ``press_key`` actions.
+VALID_KEYS: set[str] = {
+    "home",
+    "back",
+    "left",
+    "right",
+    "up",
+    "down",
+    "center",
+    "menu",
+    "search",
+    "enter",
+    "delete",
+    "recent",
+    "volume_up",
+    "volume_down",
+    "volume_mute",
+    "camera",
+    "power",
+}
+
+
 class ActionType(str, Enum):
     CLICK = "click"
     TEXT_INPUT = "text_input"
@@ -65,14 +90,48 @@ class Scenario(BaseModel):
     )
 
 
+class ScenarioSegments(BaseModel):
+    """Actions of several parts of one scenario, parsed in a single request."""
+
+    segments: List[Scenario] = Field(
+        description="Actions of every segment, one entry per segment in order"
+    )
+
+
+class _SharedHierarchy:
+    """Keep a hierarchy as subtrees shared with the other screens.
+
+    The XML is split by :data:`SHARED_SUBTREES` when it is set and joined again
+    on every read.
+    """
+
+    def __set_name__(self, owner: type, name: str) -> None:
+        self._attribute = f"_{name}"
+
+    def __get__(self, screen: Any, owner: Any = None) -> str:
+        if screen is None:
+            # No default value for the dataclass field.
+            raise AttributeError(self._attribute)
+        return str(getattr(screen, self._attribute))
+
+    def __set__(self, screen: Any, hierarchy: str) -> None:
+        setattr(screen, self._attribute, SHARED_SUBTREES.split(hierarchy))
+
+
 @dataclass
 class ScreenInfo:
-    """Description of the current screen."""
+    """Description of the current screen.
+
+    ``hierarchy`` is stored as subtrees shared between screens, so the frames
+    of a long trace hold the parts of a screen that did not change once.
+    """
 
     name: str
     description: str
-    hierarchy: str
+    hierarchy: str = _SharedHierarchy()
     image: Optional[str] = None
+    fingerprint: Optional[str] = None
+    image_hash: Optional[str] = None
 
 
 @dataclass
@@ -90,6 +149,7 @@ class ActionFrame:
     screen: Optional[ScreenInfo]
     action: ActionInfo
     error: Optional[Error]
+    metrics: Optional[StepMetrics] = None
 
     def to_dict(self) -> dict[str, object]:
         """Return a JSON serialisable representation of the frame."""
@@ -98,4 +158,20 @@ class ActionFrame:
             "screen": asdict(self.screen) if self.screen else None,
             "action": self.action.model_dump(),
             "error": asdict(self.error) if self.error else None,
+            "metrics": self.metrics.to_dict() if self.metrics else None,
         }
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> ActionFrame:
+        """Restore a frame from the :meth:`to_dict` representation."""
+
+        metrics = data.get("metrics")
+        if metrics:
+            spans = [Span(**span) for span in metrics.get("spans", [])]
+            metrics = StepMetrics(**{**metrics, "spans": spans})
+        return cls(
+            screen=ScreenInfo(**data["screen"]) if data.get("screen") else None,
+            action=ActionInfo.model_validate(data["action"]),
+            error=Error(**data["error"]) if data.get("error") else None,
+            metrics=metrics or None,
+        )
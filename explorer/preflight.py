@@ -0,0 +1,238 @@
+"""Static validation and cost estimation of scenarios before they run."""
+
+from __future__ import annotations
+
+import statistics
+from dataclasses import dataclass, field
+from typing import Any, Iterable, Sequence
+
+from explorer.budget import BudgetExceeded, ResolutionBudget
+from explorer.models import VALID_KEYS, ActionFrame, ActionInfo, ActionType
+
+SWIPE_DIRECTIONS = frozenset({"up", "down", "left", "right"})
+_ELEMENT_ACTIONS = {ActionType.CLICK, ActionType.TEXT_INPUT, ActionType.SWIPE_ELEMENT}
+
+
+@dataclass
+class ScenarioIssue:
+    """A scenario step that cannot be executed as written."""
+
+    index: int
+    message: str
+
+
+class InvalidScenario(ValueError):
+    """Raised when a scenario has steps that cannot be executed."""
+
+    def __init__(self, issues: list[ScenarioIssue]) -> None:
+        super().__init__(
+            "; ".join(f"step {issue.index}: {issue.message}" for issue in issues)
+        )
+        self.issues = issues
+
+
+def validate_scenario(actions: Sequence[ActionInfo]) -> list[ScenarioIssue]:
+    """Return the steps of ``actions`` that would fail on any device."""
+
+    issues: list[ScenarioIssue] = []
+    for index, action in enumerate(actions):
+        if action.type in _ELEMENT_ACTIONS:
+            if action.element is None or not action.element.description.strip():
+                issues.append(
+                    ScenarioIssue(index, f"{action.type.value} needs an element")
+                )
+        if action.type is ActionType.PRESS_KEY and action.data not in VALID_KEYS:
+            issues.append(ScenarioIssue(index, f"unknown key {action.data!r}"))
+        if (
+            action.type in {ActionType.SWIPE_SCREEN, ActionType.SWIPE_ELEMENT}
+            and action.data not in SWIPE_DIRECTIONS
+        ):
+            issues.append(
+                ScenarioIssue(index, f"invalid swipe direction {action.data!r}")
+            )
+    return issues
+
+
+@dataclass
+class StepEstimate:
+    """Expected model calls, tokens and seconds of one step."""
+
+    model_calls: float = 0.0
+    tokens: float = 0.0
+    duration: float = 0.0
+    hit_rate: float = 1.0
+
+
+@dataclass
+class _Sample:
+    model_calls: int
+    tokens: int
+    duration: float
+
+
+class StepHistory:
+    """Step costs of past runs by element description and action type.
+
+    An element step without model calls was resolved from a cache, e.g. the
+    trace store or a replayed prefix. The share of such steps is the hit rate
+    of a description; a step is expected to cost a median hit with that
+    probability and a median miss otherwise. Descriptions without history
+    use the statistics of their action type, then of all element steps, then
+    ``default``.
+    """
+
+    def __init__(self, default: StepEstimate | None = None) -> None:
+        self.default = default or StepEstimate(
+            model_calls=1.0, tokens=5000.0, duration=5.0, hit_rate=0.0
+        )
+        self._by_description: dict[str, list[_Sample]] = {}
+        self._by_type: dict[ActionType, list[_Sample]] = {}
+
+    @classmethod
+    def from_traces(
+        cls, traces: Iterable[Iterable[ActionFrame | dict[str, Any]]]
+    ) -> StepHistory:
+        """Learn from traces of frames or :meth:`ActionFrame.to_dict` dicts."""
+
+        history = cls()
+        for trace in traces:
+            for frame in trace:
+                history.add(frame)
+        return history
+
+    @classmethod
+    def from_records(cls, records: Iterable[dict[str, Any]]) -> StepHistory:
+        """Learn from batch results carrying a ``trace``."""
+
+        return cls.from_traces(record.get("trace") or [] for record in records)
+
+    def add(self, frame: ActionFrame | dict[str, Any]) -> None:
+        """Record the metrics of an executed ``frame``."""
+
+        if isinstance(frame, ActionFrame):
+            frame = {
+                "action": frame.action.model_dump(mode="json"),
+                "metrics": frame.metrics.to_dict() if frame.metrics else None,
+            }
+        action, metrics = frame["action"], frame.get("metrics")
+        if action.get("status") != "executed" or not metrics:
+            return
+        sample = _Sample(
+            model_calls=metrics.get("model_calls", 0),
+            tokens=metrics.get("input_tokens", 0) + metrics.get("output_tokens", 0),
+            duration=metrics.get("duration", 0.0),
+        )
+        action_type = ActionType(action["type"])
+        self._by_type.setdefault(action_type, []).append(sample)
+        if action.get("element"):
+            description = action["element"]["description"]
+            self._by_description.setdefault(description, []).append(sample)
+
+    def _samples(self, action: ActionInfo) -> list[_Sample]:
+        if action.element is not None:
+            samples = self._by_description.get(action.element.description)
+            if samples:
+                return samples
+        samples = self._by_type.get(action.type)
+        if samples or action.type not in _ELEMENT_ACTIONS:
+            return samples or []
+        return [
+            sample
+            for action_type in _ELEMENT_ACTIONS
+            for sample in self._by_type.get(action_type, [])
+        ]
+
+    def estimate(self, action: ActionInfo) -> StepEstimate:
+        """Return the expected cost of ``action``."""
+
+        samples = self._samples(action)
+        if not samples:
+            if action.type in _ELEMENT_ACTIONS:
+                return StepEstimate(**vars(self.default))
+            return StepEstimate()
+        hits = [sample for sample in samples if sample.model_calls == 0]
+        misses = [sample for sample in samples if sample.model_calls > 0]
+        hit_rate = len(hits) / len(samples)
+        estimate = StepEstimate(hit_rate=hit_rate)
+        if hits:
+            estimate.duration += hit_rate * statistics.median(s.duration for s in hits)
+        if misses:
+            miss_rate = 1 - hit_rate
+            estimate.model_calls = miss_rate * statistics.median(
+                s.model_calls for s in misses
+            )
+            estimate.tokens = miss_rate * statistics.median(s.tokens for s in misses)
+            estimate.duration += miss_rate * statistics.median(
+                s.duration for s in misses
+            )
+        return estimate
+
+
+@dataclass
+class ScenarioEstimate:
+    """Validation issues and expected cost of a scenario."""
+
+    steps: list[StepEstimate] = field(default_factory=list)
+    issues: list[ScenarioIssue] = field(default_factory=list)
+
+    @property
+    def model_calls(self) -> float:
+        return sum(step.model_calls for step in self.steps)
+
+    @property
+    def tokens(self) -> float:
+        return sum(step.tokens for step in self.steps)
+
+    @property
+    def duration(self) -> float:
+        return sum(step.duration for step in self.steps)
+
+    def exceeds(self, budget: ResolutionBudget) -> str | None:
+        """Return why the estimate does not fit ``budget``, or ``None``."""
+
+        if budget.max_model_calls is not None and (
+            self.model_calls > budget.max_model_calls
+        ):
+            return f"estimated {self.model_calls:.1f} model calls of {budget.max_model_calls}"
+        if budget.max_tokens is not None and self.tokens > budget.max_tokens:
+            return f"estimated {self.tokens:.0f} tokens of {budget.max_tokens}"
+        if budget.max_wall_time is not None and self.duration > budget.max_wall_time:
+            return f"estimated {self.duration:.1f}s of {budget.max_wall_time:.1f}s"
+        return None
+
+
+class Preflight:
+    """Check scenarios against static rules and a budget before running them.
+
+    ``budget`` is compared with the estimate of the whole scenario; the retry
+    settings of :class:`ResolutionBudget` are not used.
+    """
+
+    def __init__(
+        self,
+        history: StepHistory | None = None,
+        budget: ResolutionBudget | None = None,
+    ) -> None:
+        self.history = history or StepHistory()
+        self.budget = budget
+
+    def estimate(self, actions: Sequence[ActionInfo]) -> ScenarioEstimate:
+        return ScenarioEstimate(
+            steps=[self.history.estimate(action) for action in actions],
+            issues=validate_scenario(actions),
+        )
+
+    def check(self, actions: Sequence[ActionInfo]) -> ScenarioEstimate:
+        """Return the estimate of ``actions`` if they are valid and affordable.
+
+        Raises :class:`InvalidScenario` or :class:`BudgetExceeded`.
+        """
+
+        estimate = self.estimate(actions)
+        if estimate.issues:
+            raise InvalidScenario(estimate.issues)
+        if self.budget is not None:
+            reason = estimate.exceeds(self.budget)
+            if reason is not None:
+                raise BudgetExceeded(f"preflight: {reason}")
+        return estimate
@@ -0,0 +1,59 @@
+"""Provider prompt caching for prompts with a stable prefix."""
+
+from __future__ import annotations
+
+import hashlib
+from enum import Enum
+from typing import Any
+
+from langchain_core.messages import BaseMessage, HumanMessage
+from langchain_core.prompts import PromptTemplate
+
+_MARKER = "\x00request\x00"
+
+
+class PromptCache(str, Enum):
+    """Provider specific prompt caching hints.
+
+    ``anthropic`` marks the stable prefix with an ephemeral ``cache_control``
+    block. OpenAI caches identical prefixes automatically, ``openai`` adds a
+    ``prompt_cache_key`` derived from the prefix so that requests sharing it
+    are routed to the same cache.
+    """
+
+    ANTHROPIC = "anthropic"
+    OPENAI = "openai"
+
+
+def split_prompt(
+    template: PromptTemplate, values: dict[str, Any], request_variable: str
+) -> tuple[str, str]:
+    """Render ``template`` and split it before ``request_variable``.
+
+    The template must reference ``request_variable`` once, after all other
+    variables, so that the returned prefix only depends on the other values.
+    """
+
+    text = template.format(**{**values, request_variable: _MARKER})
+    prefix, tail = text.split(_MARKER, 1)
+    return prefix, str(values[request_variable]) + tail
+
+
+def cached_messages(
+    template: PromptTemplate,
+    values: dict[str, Any],
+    request_variable: str,
+    cache: PromptCache,
+) -> tuple[list[BaseMessage], dict[str, Any]]:
+    """Return messages and model invoke kwargs opting into ``cache``."""
+
+    prefix, request = split_prompt(template, values, request_variable)
+    prefix_block: dict[str, Any] = {"type": "text", "text": prefix}
+    kwargs: dict[str, Any] = {}
+    if cache is PromptCache.ANTHROPIC:
+        prefix_block["cache_control"] = {"type": "ephemeral"}
+    else:
+        key = hashlib.sha256(prefix.encode("utf-8")).hexdigest()[:32]
+        kwargs["extra_body"] = {"prompt_cache_key": key}
+    message = HumanMessage(content=[prefix_block, {"type": "text", "text": request}])
+    return [message], kwargs
@@ -1,14 +1,22 @@
 from __future__ import annotations
 
-from time import sleep
-from typing import TypedDict, cast
+from dataclasses import replace
+from time import monotonic, sleep
+from typing import TYPE_CHECKING, Callable, TypedDict, cast
 
 import uiautomator2
-from langchain_core.language_models import BaseChatModel
 from uiautomator2 import XPathElementNotFoundError
+from uiautomator2.exceptions import DeviceError
+from uiautomator2.utils import swipe_in_bounds
 
+from explorer.budget import BudgetExceeded, BudgetTracker, ResolutionBudget
 from explorer.element_navigator import ElementNavigator
+from explorer.hierarchy_dump import DumpStrategy
+from explorer.hierarchy_snapshot import HierarchySnapshot
+from explorer.metrics import MetricsRecorder
+from explorer.model_cascade import ModelCascade
 from explorer.models import (
+    VALID_KEYS,
     ActionFrame,
     ActionInfo,
     ActionType,
@@ -17,29 +25,21 @@ from explorer.models import (
     Scenario,
     ScreenInfo,
 )
+from explorer.prompt_cache import PromptCache
+from explorer.screen_graph import ScreenGraph, Transition, screen_layout
+from explorer.scroll_search import ScrollSearch
 
-# mypy: ignore-errors
+if TYPE_CHECKING:
+    from concurrent.futures import Future
+
+    from langchain_core.language_models import BaseChatModel
 
+    from explorer.checkpoint import FrameCheckpointer
+    from explorer.preflight import Preflight
+    from explorer.screenshots import ScreenshotPipeline
+    from explorer.trace_store import TraceRepository
 
-VALID_KEYS: set[str] = {
-    "home",
-    "back",
-    "left",
-    "right",
-    "up",
-    "down",
-    "center",
-    "menu",
-    "search",
-    "enter",
-    "delete",
-    "recent",
-    "volume_up",
-    "volume_down",
-    "volume_mute",
-    "camera",
-    "power",
-}
+# mypy: ignore-errors
 
 
 class ExplorerState(TypedDict, total=False):
@@ -47,18 +47,311 @@ class ExplorerState(TypedDict, total=False):
 
     user_scenario: Scenario
     trace: list[ActionFrame]
+    run_id: str
+    skip_executed: bool
 
 
 class ScenarioExplorer:
     """High level scenario execution engine."""
 
-    def __init__(self, model: BaseChatModel) -> None:
+    def __init__(
+        self,
+        model: BaseChatModel | ModelCascade,
+        metrics: MetricsRecorder | None = None,
+        device_factory: Callable[[], uiautomator2.Device] | None = None,
+        input_delay: float = 3,
+        budget: ResolutionBudget | None = None,
+        scenario_budget: ResolutionBudget | None = None,
+        prompt_cache: PromptCache | None = None,
+        act_on_bounds: bool = False,
+        stop_device: bool = True,
+        dump_strategy: DumpStrategy | None = None,
+        known_elements: TraceRepository | None = None,
+        scroll_search: ScrollSearch | None = None,
+        stream_output: bool = False,
+        checkpointer: FrameCheckpointer | None = None,
+        screenshots: ScreenshotPipeline | None = None,
+        screen_graph: ScreenGraph | None = None,
+        preflight: Preflight | None = None,
+    ) -> None:
+        """Create an explorer.
+
+        ``device_factory`` replaces :func:`uiautomator2.connect`, e.g. with a
+        replayed device, and ``input_delay`` is the pause in seconds between
+        focusing a text field and typing into it. ``budget`` limits the
+        resolution of every single element and ``scenario_budget`` the
+        resolution of all elements of one scenario run. ``prompt_cache``
+        opts the element navigator into provider prompt caching.
+
+        With ``act_on_bounds`` element actions are performed by coordinates
+        taken from the hierarchy the element was resolved on instead of
+        querying the device by xpath, which costs another hierarchy dump.
+        Replayed actions reuse the recorded bounds while the foreground
+        activity matches the recorded screen fingerprint.
+
+        ``stop_device=False`` keeps the uiautomator session running after a run,
+        so that a device shared by ``device_factory`` serves further scenarios.
+        ``dump_strategy`` configures hierarchy dumps and collects their cost per
+        screen in its ``profiles``; with its ``change_detector`` the pause after
+        focusing a text field ends as soon as the screen stops changing.
+        ``known_elements`` lets the navigator try xpaths that resolved the same
+        element description in stored traces before asking the model.
+        ``scroll_search`` scrolls the screen for an element the model did not
+        find before the step is marked broken.
+        With ``stream_output`` an element is acted upon as soon as its xpath has
+        streamed in; the screen name and description are filled in afterwards.
+        ``checkpointer`` stores every completed frame of runs started with a
+        ``run_id``, see :meth:`resume`. ``screenshots`` captures the screen
+        before every step and stores it in the background; ``ScreenInfo.image``
+        is set to the stored file name once the run is over.
+
+        With a ``screen_graph`` the longest scenario prefix matching recorded
+        transitions is replayed with their xpaths instead of being resolved.
+        Before every transition the device has to show its recorded source
+        screen; when it does not, or a replayed element is missing, the
+        remaining steps are resolved as usual. See also :meth:`navigate_to`.
+
+        ``preflight`` validates and estimates every new scenario before the
+        device is connected; :meth:`explore` raises its errors.
+        """
+
         self._model = model
+        self._metrics = metrics or MetricsRecorder()
+        self._device_factory = device_factory
+        self._input_delay = input_delay
+        self._budget = budget
+        self._scenario_budget = scenario_budget
+        self._prompt_cache = prompt_cache
+        self._act_on_bounds = act_on_bounds
+        self._stop_device = stop_device
+        self._dump_strategy = dump_strategy or DumpStrategy()
+        self._known_elements = known_elements
+        self._scroll_search = scroll_search
+        self._stream_output = stream_output
+        self._checkpointer = checkpointer
+        self._screenshots = screenshots
+        self._screen_graph = screen_graph
+        self._preflight = preflight
+        self._step_image: Future[str | None] | None = None
+        self._shown_fingerprint: str | None = None
+        self._detector_image: object = None
+
+    @staticmethod
+    def _fingerprint(device: uiautomator2.Device) -> str | None:
+        """Return the foreground ``package/activity`` of ``device``."""
+
+        try:
+            current = device.app_current()
+        except DeviceError:
+            return None
+        return f"{current['package']}/{current['activity']}"
+
+    def _apply_shortcuts(
+        self, trace: list[ActionFrame]
+    ) -> dict[int, Transition | None]:
+        """Mark the prefix of ``trace`` known from the screen graph as executed.
+
+        Returns the indices of the marked frames, mapped to the transition for
+        the first frame of every transition and to ``None`` for the others.
+        """
+
+        shortcuts: dict[int, Transition | None] = {}
+        if self._screen_graph is None:
+            return shortcuts
+        transitions = self._screen_graph.match_prefix([frame.action for frame in trace])
+        index = 0
+        for transition in transitions:
+            for offset, recorded in enumerate(transition.actions):
+                frame = trace[index]
+                if recorded.element is not None:
+                    frame.action.element.name = recorded.element.name
+                    frame.action.element.xpath = recorded.element.xpath
+                frame.action.status = ExecutionStatus.EXECUTED
+                shortcuts[index] = transition if offset == 0 else None
+                index += 1
+        return shortcuts
 
     @staticmethod
-    def _perform_action(device: uiautomator2.Device, action: ActionInfo) -> None:
-        """Execute ``action`` on ``device`` without using the language model."""
+    def _abandon_shortcuts(
+        trace: list[ActionFrame], shortcuts: dict[int, Transition | None], index: int
+    ) -> None:
+        """Mark the shortcut frames from ``index`` on to be resolved as usual."""
+
+        for later in sorted(shortcuts):
+            if later >= index:
+                trace[later].action.status = ExecutionStatus.PENDING
+                trace[later].screen = None
+        shortcuts.clear()
+
+    def _observe_source(
+        self, device: uiautomator2.Device, transition: Transition
+    ) -> ScreenInfo | None:
+        """Return the screen shown if it is the source of ``transition``.
+
+        The foreground activity has to equal the recorded fingerprint and the
+        hierarchy the recorded :func:`screen_layout`, where the recorded screen
+        has them; a screen with neither cannot be verified.
+        """
+
+        recorded = cast(ScreenGraph, self._screen_graph).screens[transition.source]
+        fingerprint = None
+        if recorded.fingerprint is not None:
+            fingerprint = self._fingerprint(device)
+            if fingerprint != recorded.fingerprint:
+                return None
+        layout = screen_layout(recorded.hierarchy)
+        if layout is None and fingerprint is None:
+            return None
+        hierarchy = self._dump_strategy.dump(device)
+        if layout is not None and layout != screen_layout(hierarchy):
+            return None
+        return ScreenInfo(
+            name=recorded.name,
+            description=recorded.description,
+            hierarchy=hierarchy,
+            fingerprint=fingerprint,
+            image_hash=self._dump_strategy.last_hash,
+        )
+
+    def _snapshot_bounds(
+        self, device: uiautomator2.Device, frame: ActionFrame, replay: bool
+    ) -> tuple[int, int, int, int] | None:
+        """Return bounds of the frame element in the frame's screen hierarchy."""
+
+        action = frame.action
+        if not self._act_on_bounds or frame.screen is None or action.element is None:
+            return None
+        if replay:
+            # Confirmed by the on-track check after the previous action.
+            shown, self._shown_fingerprint = self._shown_fingerprint, None
+            if frame.screen.fingerprint is None or frame.screen.fingerprint != (
+                shown or self._fingerprint(device)
+            ):
+                return None
+        detector = self._dump_strategy.change_detector
+        if replay and detector is not None and frame.screen.image_hash is not None:
+            # Same activity is not enough: the recorded layout must be shown.
+            if not detector.same(detector.capture(device), frame.screen.image_hash):
+                return None
+        snapshot = HierarchySnapshot(frame.screen.hierarchy)
+        return snapshot.bounds(cast(str, action.element.xpath))
+
+    def _replay_on_track(
+        self, device: uiautomator2.Device, trace: list[ActionFrame], index: int
+    ) -> bool:
+        """Return whether the device reached the screen recorded after ``index``.
 
+        The foreground activity is polled for up to ``input_delay`` seconds
+        against the fingerprint of the next replayed frame, if it has one. A
+        match is kept for the bounds check of that frame.
+        """
+
+        following = trace[index + 1] if index + 1 < len(trace) else None
+        if (
+            following is None
+            or following.action.status is not ExecutionStatus.EXECUTED
+            or following.screen is None
+            or following.screen.fingerprint is None
+        ):
+            return True
+        deadline = monotonic() + self._input_delay
+        while True:
+            if self._fingerprint(device) == following.screen.fingerprint:
+                self._shown_fingerprint = following.screen.fingerprint
+                return True
+            if monotonic() >= deadline:
+                return False
+            with self._metrics.span("sleep"):
+                sleep(0.25)
+
+    def _perform_by_bounds(
+        self,
+        device: uiautomator2.Device,
+        action: ActionInfo,
+        bounds: tuple[int, int, int, int],
+    ) -> bool:
+        """Perform an element action by coordinates.
+
+        Returns ``False`` when the post-action check fails and the action has to
+        be performed through the xpath selector.
+        """
+
+        if action.type is ActionType.SWIPE_ELEMENT:
+            swipe_in_bounds(device, list(bounds), cast(str, action.data))
+            return True
+
+        left, top, right, bottom = bounds
+        device.click((left + right) // 2, (top + bottom) // 2)
+        if action.type is not ActionType.TEXT_INPUT:
+            return True
+
+        self._settle(device)
+        with self._metrics.span("device.focused"):
+            focused = device(focused=True).exists
+        if not focused:
+            return False
+        if action.data:
+            device.send_keys(action.data)
+        return True
+
+    def _settle(self, device: uiautomator2.Device) -> None:
+        """Wait up to ``input_delay`` for the screen to stop changing."""
+
+        detector = self._dump_strategy.change_detector
+        with self._metrics.span("sleep"):
+            if detector is None:
+                sleep(self._input_delay)
+            else:
+                detector.wait_settled(device, self._input_delay)
+
+    def _start_screenshot(self, device: uiautomator2.Device) -> None:
+        """Schedule the screenshot of the step starting on ``device``.
+
+        With a change detector it is deferred until the step's first action,
+        so that a screenshot the detector takes meanwhile is stored instead.
+        """
+
+        self._step_image = None
+        detector = self._dump_strategy.change_detector
+        if detector is not None:
+            self._detector_image = detector.last_image
+        elif self._screenshots is not None:
+            self._step_image = self._screenshots.submit(device)
+
+    def _take_screenshot(
+        self, device: uiautomator2.Device
+    ) -> Future[str | None] | None:
+        """Return the screenshot of the current step, scheduling it if needed."""
+
+        if self._screenshots is None or self._step_image is not None:
+            return self._step_image
+        detector = self._dump_strategy.change_detector
+        image = None
+        if detector is not None and detector.last_image is not self._detector_image:
+            image = detector.last_image
+        self._step_image = self._screenshots.submit(device, image)
+        return self._step_image
+
+    def _perform_action(
+        self,
+        device: uiautomator2.Device,
+        action: ActionInfo,
+        bounds: tuple[int, int, int, int] | None = None,
+    ) -> None:
+        """Execute ``action`` on ``device`` without using the language model.
+
+        Element actions use ``bounds`` when given and fall back to the xpath
+        selector if the coordinate action cannot be confirmed.
+        """
+
+        if self._screenshots is not None:
+            # The screenshot of the step must show the screen before the action.
+            self._take_screenshot(device)
+            self._screenshots.wait_captured()
+        # Any dump or fingerprint taken before the action is outdated. Typed
+        # text may be too small a change for the screenshot hash.
+        self._dump_strategy.invalidate(force=action.type is ActionType.TEXT_INPUT)
+        self._shown_fingerprint = None
         if action.type is ActionType.PRESS_KEY:
             key = cast(str, action.data)
             device.press(key)
@@ -82,6 +375,10 @@ class ScenarioExplorer:
             return
 
         assert action.element is not None
+        if bounds is not None and self._perform_by_bounds(device, action, bounds):
+            action.status = ExecutionStatus.EXECUTED
+            return
+
         selector = device.xpath(cast(str, action.element.xpath))
 
         if action.type is ActionType.SWIPE_ELEMENT:
@@ -91,7 +388,7 @@ class ScenarioExplorer:
 
         if action.type is ActionType.TEXT_INPUT:
             selector.click()
-            sleep(3)
+            self._settle(device)
             if action.data:
                 device.send_keys(action.data)
         else:
@@ -99,36 +396,170 @@ class ScenarioExplorer:
         action.status = ExecutionStatus.EXECUTED
 
     def _explore(self, state: ExplorerState) -> ExplorerState:
-        device = uiautomator2.connect()
-        element_navigator = ElementNavigator(self._model, device)
+        with self._metrics.span("device.connect"):
+            connect = self._device_factory or uiautomator2.connect
+            device = self._metrics.instrument(connect())
+        scenario_budget = (
+            BudgetTracker(self._scenario_budget, scope="scenario")
+            if self._scenario_budget
+            else None
+        )
+        element_navigator = ElementNavigator(
+            self._model,
+            device,
+            metrics=self._metrics,
+            budget=self._budget,
+            scenario_budget=scenario_budget,
+            prompt_cache=self._prompt_cache,
+            dump_strategy=self._dump_strategy,
+            known_elements=self._known_elements,
+            scroll_search=self._scroll_search,
+            stream_output=self._stream_output,
+        )
+        self._dump_strategy.invalidate()
+        self._shown_fingerprint = None
+        images: list[tuple[int, ActionFrame, Future[str | None]]] = []
+        shortcuts: dict[int, Transition | None] = {}
 
-        if not state.get("trace"):
+        if state.get("trace") is None:
             state["trace"] = [
                 ActionFrame(screen=None, action=action, error=None)
                 for action in cast(Scenario, state["user_scenario"]).actions
             ]
+            shortcuts = self._apply_shortcuts(state["trace"])
+            if state.get("run_id") is not None:
+                self._checkpointer.start(state["run_id"], state["trace"])
 
-        for frame in state["trace"]:
-            action = frame.action
+        for index, frame in enumerate(state["trace"]):
+            if (
+                state.get("skip_executed")
+                and frame.action.status is ExecutionStatus.EXECUTED
+            ):
+                continue
+            self._metrics.start_step(index=index, action=frame.action.type.value)
+            # Taken before the step, i.e. of the screen it is resolved on.
+            self._start_screenshot(device)
+            try:
+                action = frame.action
 
-            if action.status is ExecutionStatus.EXECUTED:
-                try:
+                transition = shortcuts.get(index)
+                if transition is not None:
+                    observed = self._observe_source(device, transition)
+                    if observed is None:
+                        # The recorded path no longer applies, resolve the rest.
+                        self._abandon_shortcuts(state["trace"], shortcuts, index)
+                    else:
+                        frame.screen = observed
+
+                if action.status is ExecutionStatus.EXECUTED:
+                    bounds = self._snapshot_bounds(device, frame, replay=True)
+                    try:
+                        self._perform_action(device, action, bounds)
+                    except XPathElementNotFoundError:
+                        if index not in shortcuts:
+                            frame.error = Error(
+                                type="XPathElementNotFoundError", message=None
+                            )
+                            frame.screen = ScreenInfo(
+                                name="",
+                                description="",
+                                hierarchy=element_navigator.full_hierarchy,
+                            )
+                            action.status = ExecutionStatus.BROKEN
+                            break
+                        # The recorded path no longer applies, resolve the rest.
+                        self._abandon_shortcuts(state["trace"], shortcuts, index)
+                    else:
+                        if bounds is not None and not self._replay_on_track(
+                            device, state["trace"], index
+                        ):
+                            # A coordinate action went astray: resolve the
+                            # rest of the trace on the screen actually shown.
+                            for later in state["trace"][index + 1 :]:
+                                if later.action.status is ExecutionStatus.EXECUTED:
+                                    later.action.status = ExecutionStatus.PENDING
+                                    later.screen = None
+                            shortcuts.clear()
+                        continue
+
+                if action.type is ActionType.PRESS_KEY:
+                    key = cast(str, action.data)
+                    if key not in VALID_KEYS:
+                        frame.error = Error(type="InvalidKeyError", message=None)
+                        frame.screen = ScreenInfo(
+                            name="",
+                            description="",
+                            hierarchy=element_navigator.full_hierarchy,
+                        )
+                        action.status = ExecutionStatus.BROKEN
+                        break
+                    frame.screen = ScreenInfo(
+                        name="",
+                        description="",
+                        hierarchy=element_navigator.full_hierarchy,
+                    )
                     self._perform_action(device, action)
-                except XPathElementNotFoundError:
-                    frame.error = Error(type="XPathElementNotFoundError", message=None)
+                    continue
+
+                if action.type is ActionType.SWIPE_SCREEN:
                     frame.screen = ScreenInfo(
                         name="",
                         description="",
                         hierarchy=element_navigator.full_hierarchy,
                     )
-                    action.status = ExecutionStatus.BROKEN
-                    break
-                continue
+                    self._perform_action(device, action)
+                    continue
 
-            if action.type is ActionType.PRESS_KEY:
-                key = cast(str, action.data)
-                if key not in VALID_KEYS:
-                    frame.error = Error(type="InvalidKeyError", message=None)
+                try:
+                    assert action.element is not None
+                    info = cast(
+                        dict[str, object],
+                        element_navigator.find_element_info(action.element.description),
+                    )
+                    element_dict = cast(dict[str, object], info.get("element", {}))
+                    screen = ScreenInfo(
+                        name=cast(str, element_dict.get("screen", "")),
+                        description=cast(
+                            str, element_dict.get("screen_description", "")
+                        ),
+                        hierarchy=element_navigator.full_hierarchy,
+                        fingerprint=(
+                            self._fingerprint(device) if self._act_on_bounds else None
+                        ),
+                        image_hash=self._dump_strategy.last_hash,
+                    )
+                    frame.screen = screen
+                    action.element.name = cast(str | None, element_dict.get("name"))
+                    action.element.xpath = cast(str | None, element_dict.get("xpath"))
+                    try:
+                        self._perform_action(
+                            device,
+                            action,
+                            self._snapshot_bounds(device, frame, replay=False),
+                        )
+                    except XPathElementNotFoundError:
+                        if self._stream_output:
+                            element_navigator.complete_element_info(cancel=True)
+                        frame.error = Error(
+                            type="XPathElementNotFoundError", message=None
+                        )
+                        frame.screen = ScreenInfo(
+                            name="",
+                            description="",
+                            hierarchy=element_navigator.full_hierarchy,
+                        )
+                        action.status = ExecutionStatus.BROKEN
+                        break
+                    if self._stream_output:
+                        rest = element_navigator.complete_element_info()
+                        screen.name = cast(str, rest.get("screen", screen.name))
+                        screen.description = cast(
+                            str, rest.get("screen_description", screen.description)
+                        )
+                except BudgetExceeded as error:
+                    frame.error = Error(
+                        type="BudgetExceededError", message=error.reason
+                    )
                     frame.screen = ScreenInfo(
                         name="",
                         description="",
@@ -136,42 +567,8 @@ class ScenarioExplorer:
                     )
                     action.status = ExecutionStatus.BROKEN
                     break
-                frame.screen = ScreenInfo(
-                    name="",
-                    description="",
-                    hierarchy=element_navigator.full_hierarchy,
-                )
-                self._perform_action(device, action)
-                continue
-
-            if action.type is ActionType.SWIPE_SCREEN:
-                frame.screen = ScreenInfo(
-                    name="",
-                    description="",
-                    hierarchy=element_navigator.full_hierarchy,
-                )
-                self._perform_action(device, action)
-                continue
-
-            try:
-                assert action.element is not None
-                info = cast(
-                    dict[str, object],
-                    element_navigator.find_element_info(action.element.description),
-                )
-                element_dict = cast(dict[str, object], info.get("element", {}))
-                screen = ScreenInfo(
-                    name=cast(str, element_dict.get("screen", "")),
-                    description=cast(str, element_dict.get("screen_description", "")),
-                    hierarchy=element_navigator.full_hierarchy,
-                )
-                frame.screen = screen
-                action.element.name = cast(str | None, element_dict.get("name"))
-                action.element.xpath = cast(str | None, element_dict.get("xpath"))
-                try:
-                    self._perform_action(device, action)
-                except XPathElementNotFoundError:
-                    frame.error = Error(type="XPathElementNotFoundError", message=None)
+                except LookupError:
+                    frame.error = Error(type="ElementNotFoundError", message=None)
                     frame.screen = ScreenInfo(
                         name="",
                         description="",
@@ -179,23 +576,102 @@ class ScenarioExplorer:
                     )
                     action.status = ExecutionStatus.BROKEN
                     break
-            except LookupError:
-                frame.error = Error(type="ElementNotFoundError", message=None)
-                frame.screen = ScreenInfo(
-                    name="",
-                    description="",
-                    hierarchy=element_navigator.full_hierarchy,
-                )
-                action.status = ExecutionStatus.BROKEN
-                break
 
-        device.stop_uiautomator()
+            finally:
+                frame.metrics = self._metrics.finish_step()
+                if state.get("run_id") is not None:
+                    self._checkpointer.save(state["run_id"], index, frame)
+                image = self._take_screenshot(device)
+                if (
+                    image is not None
+                    and frame.screen is not None
+                    and frame.screen.image is None
+                ):
+                    images.append((index, frame, image))
+
+        for index, frame, future in images:
+            frame.screen.image = future.result()
+            if state.get("run_id") is not None:
+                self._checkpointer.save(state["run_id"], index, frame)
+
+        if self._stop_device:
+            device.stop_uiautomator()
         return state
 
-    def explore(self, scenario: list[ActionInfo]) -> list[ActionFrame]:
-        """Execute a prepared scenario."""
+    def explore(
+        self, scenario: list[ActionInfo], run_id: str | None = None
+    ) -> list[ActionFrame]:
+        """Execute a prepared scenario.
+
+        With a ``run_id`` every completed frame is checkpointed; an unfinished
+        run already known to the checkpointer is resumed instead of started
+        again.
+        """
 
         state = cast(ExplorerState, {"user_scenario": Scenario(actions=scenario)})
+        if run_id is not None:
+            if self._checkpointer is None:
+                raise ValueError("run_id requires a checkpointer")
+            if self._checkpointer.unfinished(run_id):
+                return self.resume(run_id)
+            state["run_id"] = run_id
+        if self._preflight is not None:
+            self._preflight.check(scenario)
+        result = self._explore(state)
+        return result["trace"]
+
+    def navigate_to(self, screen: str, source: str | None = None) -> list[ActionFrame]:
+        """Replay the shortest recorded path to ``screen`` without the model.
+
+        ``screen`` and ``source`` are screen names in any case or fingerprints;
+        ``source`` is the screen the device is on, by default the screen
+        recorded traces most often start on. Raises :class:`LookupError` when
+        no path is known.
+        """
+
+        if self._screen_graph is None:
+            raise ValueError("navigation requires a screen graph")
+        graph = self._screen_graph
+        source = graph.node(source) if source else graph.start
+        path = graph.path(source, graph.node(screen)) if source else None
+        if path is None:
+            raise LookupError(f"no known path to screen {screen!r}")
+        if not path:
+            return []
+        trace = []
+        for transition in path:
+            for offset, action in enumerate(transition.actions):
+                recorded = self._screen_graph.screens[transition.source]
+                trace.append(
+                    ActionFrame(
+                        screen=replace(recorded) if offset == 0 else None,
+                        action=action.model_copy(deep=True),
+                        error=None,
+                    )
+                )
+        return self.run_trace(trace)
+
+    def resume(self, run_id: str, replay: bool = False) -> list[ActionFrame]:
+        """Continue the checkpointed run ``run_id`` at its first pending action.
+
+        Executed frames keep their resolved xpaths and are skipped, or with
+        ``replay`` performed again without the model to bring a restarted app
+        back to the screen the run stopped on. Broken frames are retried.
+        """
+
+        if self._checkpointer is None:
+            raise ValueError("resuming requires a checkpointer")
+        trace = self._checkpointer.load(run_id)
+        if trace is None:
+            raise KeyError(f"unknown run {run_id!r}")
+        for frame in trace:
+            if frame.action.status is ExecutionStatus.BROKEN:
+                frame.action.status = ExecutionStatus.PENDING
+                frame.error = None
+        state = cast(
+            ExplorerState,
+            {"trace": trace, "run_id": run_id, "skip_executed": not replay},
+        )
         result = self._explore(state)
         return result["trace"]
 
@@ -1,38 +1,146 @@
 from __future__ import annotations
 
+from itertools import groupby
 from pathlib import Path
-from typing import cast
+from typing import TYPE_CHECKING, Any, cast
 
-from langchain_core.language_models import BaseChatModel
+from langchain_core.exceptions import OutputParserException
 from langchain_core.output_parsers import PydanticOutputParser
 from langchain_core.prompts import PromptTemplate
 
-from explorer.models import Scenario
+from explorer.model_cascade import ModelCascade
+from explorer.models import ActionInfo, Scenario, ScenarioSegments
+from explorer.prompt_cache import PromptCache, cached_messages
+from explorer.scenario_rules import parse_line, scenario_lines
 from explorer.utils import get_file_content
 
+if TYPE_CHECKING:
+    from langchain_core.language_models import BaseChatModel
+
 # mypy: ignore-errors
 
 
 class ScenarioParser:
     """Parse a textual request into a :class:`Scenario`."""
 
-    def __init__(self, model: BaseChatModel) -> None:
+    def __init__(
+        self,
+        model: BaseChatModel | ModelCascade,
+        prompt_cache: PromptCache | None = None,
+        rules: bool = True,
+    ) -> None:
+        """Create a parser.
+
+        With a :class:`ModelCascade` the scenario is parsed by the first tier
+        whose answer parses. Simple imperative lines such as ``press back`` are
+        parsed locally and the remaining lines are sent to the model together
+        in one request; without ``rules`` the whole scenario goes to the model.
+        """
+
         self._model = model
+        self._prompt_cache = prompt_cache
+        self._rules = rules
         self._parser = PydanticOutputParser(pydantic_object=Scenario)
-        prompt_path = (
-            Path(__file__).parent / "prompts" / "extract_step_by_step_scenario.md"
+        self._segments_parser = PydanticOutputParser(pydantic_object=ScenarioSegments)
+        prompts = Path(__file__).parent / "prompts"
+        template_str = get_file_content(
+            str(prompts / "extract_step_by_step_scenario.md")
         )
-        template_str = get_file_content(str(prompt_path))
         self._prompt_template = PromptTemplate.from_template(template_str)
+        segments_str = get_file_content(str(prompts / "extract_scenario_segments.md"))
+        self._segments_template = PromptTemplate.from_template(segments_str)
 
     def parse(self, request: str) -> Scenario:
         """Return a scenario parsed from ``request``."""
-        prompt = self._prompt_template.invoke(
-            {
-                "scenario": request,
-                "format_instructions": self._parser.get_format_instructions(),
-            }
+
+        if self._rules:
+            lines = scenario_lines(request)
+            parsed = [parse_line(line) for line in lines]
+            if lines and all(actions is not None for actions in parsed):
+                return Scenario(actions=[a for actions in parsed for a in actions])
+            if any(actions is not None for actions in parsed):
+                scenario = self._parse_segments(lines, parsed)
+                if scenario is not None:
+                    return scenario
+
+        values = {
+            "format_instructions": self._parser.get_format_instructions(),
+            "scenario": request,
+        }
+        return cast(
+            Scenario,
+            self._ask(self._prompt_template, values, "scenario", self._parser),
         )
-        response = self._model.invoke(prompt)
-        scenario = cast(Scenario, self._parser.parse(response.text()))
-        return scenario
+
+    def _parse_segments(
+        self, lines: list[str], parsed: list[list[ActionInfo] | None]
+    ) -> Scenario | None:
+        """Ask the model for the runs of lines the rules did not parse.
+
+        Returns ``None`` when the answer does not have one entry per segment.
+        """
+
+        runs = [
+            (missing, [line for line, _ in group])
+            for missing, group in groupby(
+                zip(lines, parsed), key=lambda item: item[1] is None
+            )
+        ]
+        segments = [run for missing, run in runs if missing]
+        text = "\n\n".join(
+            f"Segment {index}:\n" + "\n".join(segment)
+            for index, segment in enumerate(segments, 1)
+        )
+        values = {
+            "format_instructions": self._segments_parser.get_format_instructions(),
+            "segments": text,
+        }
+        answer = cast(
+            ScenarioSegments,
+            self._ask(
+                self._segments_template, values, "segments", self._segments_parser
+            ),
+        )
+        if len(answer.segments) != len(segments):
+            return None
+
+        actions: list[ActionInfo] = []
+        answers = iter(answer.segments)
+        known = iter(line for line in parsed if line is not None)
+        for missing, run in runs:
+            if missing:
+                actions.extend(next(answers).actions)
+            else:
+                for _ in run:
+                    actions.extend(next(known))
+        return Scenario(actions=actions)
+
+    def _ask(
+        self,
+        template: PromptTemplate,
+        values: dict[str, Any],
+        request_variable: str,
+        parser: PydanticOutputParser,
+    ) -> Any:
+        if self._prompt_cache is None:
+            prompt, kwargs = template.invoke(values), {}
+        else:
+            prompt, kwargs = cached_messages(
+                template, values, request_variable, self._prompt_cache
+            )
+        if not isinstance(self._model, ModelCascade):
+            response = self._model.invoke(prompt, **kwargs)
+            return parser.parse(response.text())
+
+        tiers = self._model.tiers()
+        for tier in tiers:
+            response = tier.model.invoke(prompt, **kwargs)
+            try:
+                result = parser.parse(response.text())
+            except OutputParserException:
+                self._model.record(tier, False)
+                if tier is tiers[-1]:
+                    raise
+                continue
+            self._model.record(tier, True)
+            return result
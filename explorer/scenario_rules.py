@@ -0,0 +1,129 @@
+"""Deterministic parsing of simple imperative scenario lines."""
+
+from __future__ import annotations
+
+import re
+
+from explorer.models import (
+    VALID_KEYS,
+    ActionInfo,
+    ActionType,
+    ElementInfo,
+    ExecutionStatus,
+)
+
+_MARKER = re.compile(r"^\s*(?:[-*•]|\d+[.)])\s*")
+_DIRECTION = r"(?P<direction>up|down|left|right)"
+_ELEMENT = r"(?:the\s+)?(?P<element>.+?)"
+_QUOTED = r"['\"“‘](?P<text>.*?)['\"”’]"
+_QUOTED_TEXT = re.compile(_QUOTED)
+# Quotes, punctuation, conjunctions, repeat counts, menu paths or trailing
+# clauses such as "to save" in an element hint at a compound step.
+_COMPOUND = re.compile(
+    r"['\"“”‘’,;:.!?>→»|]"
+    r"|\b(?:and|then|if|until|while|or|to|so|when|once|twice|thrice|times?)\b"
+    r"|\b(?:before|after|unless|because)\b|\b\d+\s*x\b",
+    re.I,
+)
+# Sentence punctuation left inside a line separates several steps.
+_SENTENCES = re.compile(r"[.!?;:](?:\s|$)")
+
+# Keys also named by buttons on screen, e.g. "menu", need the word "key".
+_SYSTEM_KEYS = {
+    "home",
+    "back",
+    "recent",
+    "enter",
+    "power",
+    "volume_up",
+    "volume_down",
+    "volume_mute",
+}
+_KEY = re.compile(
+    r"(?:press|hit)\s+(?:the\s+)?(?P<key>[a-z_ ]+?)(?:\s+(?P<word>key|button))?",
+    re.I,
+)
+_GO = re.compile(r"go\s+(?P<key>back|home)", re.I)
+_SWIPE = (
+    re.compile(rf"swipe\s+{_DIRECTION}(?:\s+(?:on|in|inside)\s+{_ELEMENT})?", re.I),
+    re.compile(rf"swipe\s+{_ELEMENT}\s+{_DIRECTION}", re.I),
+)
+_TEXT_INPUT = (
+    re.compile(
+        rf"(?:type|enter|input|write)\s+{_QUOTED}\s+(?:in|into|to)\s+{_ELEMENT}", re.I
+    ),
+    re.compile(rf"(?:fill|set)\s+{_ELEMENT}\s+(?:with|to)\s+{_QUOTED}", re.I),
+)
+_CLICK = re.compile(rf"(?:click|tap|press|select)\s+(?:on\s+)?{_ELEMENT}", re.I)
+
+
+def scenario_lines(text: str) -> list[str]:
+    """Return non-empty lines of ``text`` without list markers."""
+
+    lines = (_MARKER.sub("", line).strip() for line in text.splitlines())
+    return [line for line in lines if line]
+
+
+def _key(match: re.Match[str]) -> str | None:
+    key = "_".join(match["key"].lower().split())
+    if key not in VALID_KEYS:
+        return None
+    if key not in _SYSTEM_KEYS and match.groupdict().get("word") != "key":
+        return None
+    return key
+
+
+def _element(description: str | None) -> ElementInfo | None:
+    if not description or _COMPOUND.search(description):
+        return None
+    return ElementInfo(name=None, description=description, xpath=None)
+
+
+def _action(
+    element: ElementInfo | None, data: str | None, action_type: ActionType
+) -> ActionInfo:
+    return ActionInfo(
+        element=element, data=data, type=action_type, status=ExecutionStatus.PENDING
+    )
+
+
+def parse_line(line: str) -> list[ActionInfo] | None:
+    """Return the actions of a simple imperative ``line``, ``None`` otherwise.
+
+    Swipes are recognised only with the verb ``swipe``, since scrolling
+    directions are ambiguous, and typed text must be quoted. Lines of several
+    sentences are left to the model.
+    """
+
+    line = line.strip().rstrip(".!")
+    if _SENTENCES.search(_QUOTED_TEXT.sub("", line)):
+        return None
+    for pattern in (_KEY, _GO):
+        match = pattern.fullmatch(line)
+        if match and (key := _key(match)):
+            return [_action(None, key, ActionType.PRESS_KEY)]
+
+    for pattern in _SWIPE:
+        match = pattern.fullmatch(line)
+        if match is None:
+            continue
+        direction = match["direction"].lower()
+        if match["element"] is None or match["element"].lower() == "screen":
+            return [_action(None, direction, ActionType.SWIPE_SCREEN)]
+        element = _element(match["element"])
+        if element is not None:
+            return [_action(element, direction, ActionType.SWIPE_ELEMENT)]
+
+    for pattern in _TEXT_INPUT:
+        match = pattern.fullmatch(line)
+        if match is None:
+            continue
+        element = _element(match["element"])
+        if element is not None:
+            return [_action(element, match["text"], ActionType.TEXT_INPUT)]
+
+    match = _CLICK.fullmatch(line)
+    element = _element(match["element"]) if match else None
+    if element is not None:
+        return [_action(element, None, ActionType.CLICK)]
+    return None
@@ -0,0 +1,272 @@
+"""Scenario scheduling: shared prefixes and duration-aware ordering.
+
+:class:`PrefixScheduler` runs scenarios sharing leading steps so that shared
+prefixes resolve once. :func:`lpt_order` and :func:`shard` use historical
+durations to keep devices and CI machines equally busy.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import statistics
+import subprocess
+from dataclasses import dataclass, field, replace
+from typing import TYPE_CHECKING, Any, Callable, Iterable, Protocol, Sequence
+
+from explorer.models import ActionFrame, ActionInfo, ExecutionStatus
+from explorer.screen_graph import action_signature
+
+if TYPE_CHECKING:
+    from explorer.scenario_explorer import ScenarioExplorer
+
+Signature = tuple[str, str | None, str | None]
+
+
+@dataclass
+class TrieNode:
+    """Scenarios continuing after one action prefix."""
+
+    children: dict[Signature, TrieNode] = field(default_factory=dict)
+    ends: list[str] = field(default_factory=list)
+
+    @property
+    def is_branch(self) -> bool:
+        """Return whether scenarios diverge or one of them ends here."""
+
+        return len(self.children) > 1 or bool(self.ends and self.children)
+
+
+class BranchSnapshots(Protocol):
+    """Device state saved at branch points of the scenario trie."""
+
+    def save(self, key: str) -> None: ...
+
+    def restore(self, key: str) -> bool: ...
+
+
+class EmulatorSnapshots:
+    """Branch snapshots kept as Android emulator snapshots.
+
+    Saving and loading run ``adb emu avd snapshot``; :meth:`restore` returns
+    ``False`` when the command fails, e.g. on a physical device.
+    """
+
+    def __init__(
+        self,
+        serial: str | None = None,
+        prefix: str = "explorer-",
+        run: Callable[..., subprocess.CompletedProcess[str]] = subprocess.run,
+    ) -> None:
+        self._serial = serial
+        self._prefix = prefix
+        self._run = run
+        self._saved: set[str] = set()
+
+    def _snapshot(self, command: str, key: str) -> bool:
+        adb = ["adb"] + (["-s", self._serial] if self._serial else [])
+        result = self._run(
+            adb + ["emu", "avd", "snapshot", command, self._prefix + key],
+            capture_output=True,
+            text=True,
+        )
+        return result.returncode == 0 and "KO" not in result.stdout
+
+    def save(self, key: str) -> None:
+        if self._snapshot("save", key):
+            self._saved.add(key)
+
+    def restore(self, key: str) -> bool:
+        return key in self._saved and self._snapshot("load", key)
+
+
+def prefix_key(signatures: Sequence[Signature]) -> str:
+    """Return a stable name for an action prefix."""
+
+    payload = json.dumps(list(signatures)).encode("utf-8")
+    return hashlib.sha256(payload).hexdigest()[:16]
+
+
+class PrefixScheduler:
+    """Order scenarios by a trie of their actions and reuse shared prefixes.
+
+    Scenarios run in depth-first order of the trie, so scenarios sharing
+    leading steps run back to back. Resolved steps are kept per prefix: a
+    later scenario replays the longest known prefix with its xpaths instead
+    of asking the model again. With ``snapshots`` the device state is saved at
+    every branch point of the trie and restored instead of replaying the
+    prefix. ``reset`` is called before a scenario that does not start from a
+    restored snapshot, e.g. to restart the app.
+
+    The explorer should be created with ``stop_device=False``, since a
+    scenario is run in segments between branch points.
+    """
+
+    def __init__(
+        self,
+        explorer: ScenarioExplorer,
+        reset: Callable[[], None] | None = None,
+        snapshots: BranchSnapshots | None = None,
+    ) -> None:
+        self._explorer = explorer
+        self._reset = reset
+        self._snapshots = snapshots
+        self._resolved: dict[tuple[Signature, ...], list[ActionFrame]] = {}
+
+    @staticmethod
+    def build_trie(scenarios: dict[str, list[ActionInfo]]) -> TrieNode:
+        root = TrieNode()
+        for name, actions in scenarios.items():
+            node = root
+            for action in actions:
+                node = node.children.setdefault(action_signature(action), TrieNode())
+            node.ends.append(name)
+        return root
+
+    @classmethod
+    def order(cls, scenarios: dict[str, list[ActionInfo]]) -> list[str]:
+        """Return scenario names in depth-first order of their trie."""
+
+        names: list[str] = []
+        stack = [cls.build_trie(scenarios)]
+        while stack:
+            node = stack.pop()
+            names.extend(node.ends)
+            stack.extend(reversed(list(node.children.values())))
+        return names
+
+    def run(
+        self, scenarios: dict[str, list[ActionInfo]]
+    ) -> dict[str, list[ActionFrame]]:
+        """Run all ``scenarios`` and return their traces by name."""
+
+        root = self.build_trie(scenarios)
+        traces = {}
+        for name in self.order(scenarios):
+            traces[name] = self._run_one(root, scenarios[name])
+        return traces
+
+    def _run_one(self, root: TrieNode, actions: list[ActionInfo]) -> list[ActionFrame]:
+        if not actions:
+            return []
+        signatures = [action_signature(action) for action in actions]
+        branches = []
+        node = root
+        for depth, signature in enumerate(signatures, 1):
+            node = node.children[signature]
+            if node.is_branch and depth < len(signatures):
+                branches.append(depth)
+
+        known = 0
+        for depth in range(len(signatures), 0, -1):
+            if tuple(signatures[:depth]) in self._resolved:
+                known = depth
+                break
+        trace = [
+            _replayable(frame)
+            for frame in self._resolved.get(tuple(signatures[:known]), [])
+        ] + [
+            ActionFrame(screen=None, action=action.model_copy(deep=True), error=None)
+            for action in actions[known:]
+        ]
+
+        start = 0
+        if self._snapshots is not None:
+            for depth in reversed(branches):
+                if depth <= known and self._snapshots.restore(
+                    prefix_key(signatures[:depth])
+                ):
+                    start = depth
+                    break
+        if start == 0 and self._reset is not None:
+            self._reset()
+
+        bounds = [depth for depth in branches if depth > start] + [len(trace)]
+        for end in bounds:
+            self._explorer.run_trace(trace[start:end])
+            if any(
+                frame.action.status is not ExecutionStatus.EXECUTED
+                for frame in trace[start:end]
+            ):
+                break
+            self._resolved.setdefault(tuple(signatures[:end]), trace[:end])
+            if self._snapshots is not None and end in branches:
+                self._snapshots.save(prefix_key(signatures[:end]))
+            start = end
+        return trace
+
+
+def _replayable(frame: ActionFrame) -> ActionFrame:
+    return ActionFrame(
+        screen=replace(frame.screen) if frame.screen else None,
+        action=frame.action.model_copy(deep=True),
+        error=None,
+    )
+
+
+def trace_duration(trace: Iterable[ActionFrame | dict[str, Any]]) -> float:
+    """Return the summed step durations recorded in ``trace``."""
+
+    total = 0.0
+    for frame in trace:
+        if isinstance(frame, ActionFrame):
+            total += frame.metrics.duration if frame.metrics else 0.0
+        else:
+            total += (frame.get("metrics") or {}).get("duration", 0.0)
+    return total
+
+
+def historical_durations(records: Iterable[dict[str, Any]]) -> dict[str, float]:
+    """Return the median duration in seconds per scenario of past runs.
+
+    ``records`` are batch results with a ``scenario`` name and either a
+    ``duration`` or a ``trace`` of frames in :meth:`ActionFrame.to_dict` format.
+    """
+
+    runs: dict[str, list[float]] = {}
+    for record in records:
+        duration = record.get("duration")
+        if duration is None:
+            duration = trace_duration(record.get("trace") or [])
+        if duration > 0:
+            runs.setdefault(record["scenario"], []).append(duration)
+    return {name: statistics.median(values) for name, values in runs.items()}
+
+
+def _estimates(names: Iterable[str], durations: dict[str, float]) -> dict[str, float]:
+    # Scenarios without history are assumed to take a typical time.
+    default = statistics.median(durations.values()) if durations else 1.0
+    return {name: durations.get(name, default) for name in names}
+
+
+def lpt_order(names: Iterable[str], durations: dict[str, float]) -> list[str]:
+    """Return ``names`` longest expected duration first.
+
+    Started in this order on a shared pool of devices, the longest scenarios
+    do not end up running alone at the end of a suite.
+    """
+
+    estimates = _estimates(names, durations)
+    return sorted(estimates, key=lambda name: (-estimates[name], name))
+
+
+def shard(
+    names: Iterable[str], durations: dict[str, float], count: int, index: int
+) -> list[str]:
+    """Return the scenarios of shard ``index`` out of ``count``.
+
+    Scenarios are assigned longest first to the shard with the least expected
+    work. Ties are broken by name and shard index, so every machine computes
+    the same split from the same history.
+    """
+
+    if not 0 <= index < count:
+        raise ValueError(f"shard index {index} out of range for {count} shards")
+    estimates = _estimates(names, durations)
+    loads = [0.0] * count
+    shards: list[list[str]] = [[] for _ in range(count)]
+    for name in sorted(estimates, key=lambda name: (-estimates[name], name)):
+        target = min(range(count), key=lambda shard: (loads[shard], shard))
+        loads[target] += estimates[name]
+        shards[target].append(name)
+    return shards[index]
@@ -0,0 +1,214 @@
+"""Screen transition graph built from recorded traces."""
+
+from __future__ import annotations
+
+import heapq
+from collections import Counter
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, Iterable
+from xml.etree import ElementTree
+
+from explorer.models import ActionFrame, ActionInfo, ExecutionStatus, ScreenInfo
+from explorer.trace_minimizer import IGNORED_PACKAGES
+
+if TYPE_CHECKING:
+    from explorer.trace_store import TraceRepository
+
+
+def _normalized(name: str) -> str:
+    return " ".join(name.lower().split())
+
+
+def screen_key(screen: ScreenInfo | str | None) -> str | None:
+    """Return the graph node of ``screen``: its name, else its fingerprint.
+
+    A string is taken as a screen name and normalized the same way.
+    """
+
+    if screen is None:
+        return None
+    if isinstance(screen, str):
+        return _normalized(screen) or None
+    return _normalized(screen.name) or screen.fingerprint or None
+
+
+def screen_layout(hierarchy: str) -> frozenset[tuple[str, str]] | None:
+    """Return the classes and resource ids of the app nodes of ``hierarchy``.
+
+    Texts, bounds and the number of repeated nodes are left out, so a screen
+    keeps its layout while its content changes, e.g. a list is scrolled.
+    ``None`` is returned for unparsable hierarchies and those without nodes.
+    """
+
+    try:
+        root = ElementTree.fromstring(hierarchy)
+    except ElementTree.ParseError:
+        return None
+    layout = frozenset(
+        (node.attrib.get("class", ""), node.attrib.get("resource-id", ""))
+        for node in root.iter("node")
+        if node.attrib.get("package") not in IGNORED_PACKAGES
+    )
+    return layout or None
+
+
+def action_signature(action: ActionInfo) -> tuple[str, str | None, str | None]:
+    """Return what a scenario says about ``action``, without resolved xpaths."""
+
+    description = action.element.description if action.element else None
+    return action.type.value, description, action.data
+
+
+@dataclass
+class Transition:
+    """Executed actions leading from one screen to another."""
+
+    source: str
+    target: str
+    actions: list[ActionInfo]
+    seen: int = 1
+
+
+class ScreenGraph:
+    """Directed graph of screens connected by executed actions.
+
+    A trace contributes an edge between every two consecutive frames on named
+    screens, labelled with the actions executed in between, e.g. a key press
+    followed by a click. Only executed actions with a resolved xpath are used,
+    so a path can be replayed without the language model.
+    """
+
+    def __init__(self) -> None:
+        self.screens: dict[str, ScreenInfo] = {}
+        self._edges: dict[str, dict[tuple[Any, ...], Transition]] = {}
+        self._starts: Counter[str] = Counter()
+
+    @classmethod
+    def from_traces(cls, traces: Iterable[list[ActionFrame]]) -> ScreenGraph:
+        graph = cls()
+        for trace in traces:
+            graph.add_trace(trace)
+        return graph
+
+    @classmethod
+    def from_repository(
+        cls, repository: TraceRepository, **filters: Any
+    ) -> ScreenGraph:
+        """Build a graph from stored traces with a frame matching ``filters``."""
+
+        trace_ids = dict.fromkeys(
+            record.trace_id for record in repository.query(**filters)
+        )
+        return cls.from_traces(
+            [ActionFrame.from_dict(frame) for frame in repository.frames(trace_id)]
+            for trace_id in trace_ids
+        )
+
+    def add_trace(self, trace: list[ActionFrame]) -> None:
+        """Add the transitions recorded in ``trace``."""
+
+        source: str | None = None
+        actions: list[ActionInfo] = []
+        for frame in trace:
+            key = screen_key(frame.screen)
+            if frame.screen is not None and key is not None:
+                self.screens.setdefault(key, frame.screen)
+                if source is None:
+                    self._starts[key] += 1
+                elif actions:
+                    self._add(source, key, actions)
+                source, actions = key, []
+            if frame.action.status is not ExecutionStatus.EXECUTED:
+                break
+            if frame.action.element is not None and not frame.action.element.xpath:
+                source, actions = None, []
+                continue
+            if source is not None:
+                actions.append(frame.action)
+
+    def _add(self, source: str, target: str, actions: list[ActionInfo]) -> None:
+        if source == target:
+            return
+        edges = self._edges.setdefault(source, {})
+        key = (target, tuple(action_signature(action) for action in actions))
+        known = edges.get(key)
+        if known is None:
+            edges[key] = Transition(
+                source, target, [action.model_copy(deep=True) for action in actions]
+            )
+        else:
+            known.seen += 1
+
+    @property
+    def start(self) -> str | None:
+        """Return the screen traces most often start on."""
+
+        common = self._starts.most_common(1)
+        return common[0][0] if common else None
+
+    def node(self, screen: str) -> str:
+        """Return the node of ``screen``, a screen name in any case or a fingerprint."""
+
+        key = screen_key(screen)
+        return key if key is not None and key in self.screens else screen
+
+    def transitions(self, source: str) -> list[Transition]:
+        return list(self._edges.get(source, {}).values())
+
+    def path(self, source: str, target: str) -> list[Transition] | None:
+        """Return the transitions of the path with fewest actions, if any."""
+
+        if source == target:
+            return []
+        queue: list[tuple[int, int, str, list[Transition]]] = [(0, 0, source, [])]
+        done: set[str] = set()
+        counter = 0
+        while queue:
+            cost, _, node, path = heapq.heappop(queue)
+            if node == target:
+                return path
+            if node in done:
+                continue
+            done.add(node)
+            for transition in self.transitions(node):
+                if transition.target not in done:
+                    counter += 1
+                    heapq.heappush(
+                        queue,
+                        (
+                            cost + len(transition.actions),
+                            counter,
+                            transition.target,
+                            path + [transition],
+                        ),
+                    )
+        return None
+
+    def match_prefix(
+        self, actions: list[ActionInfo], source: str | None = None
+    ) -> list[Transition]:
+        """Return known transitions replaying the longest prefix of ``actions``.
+
+        Starting at ``source``, by default :attr:`start`, a transition matches
+        when the signatures of its actions equal the next scenario actions.
+        """
+
+        node = source or self.start
+        matched: list[Transition] = []
+        position = 0
+        while node is not None:
+            best = None
+            for transition in self.transitions(node):
+                size = len(transition.actions)
+                wanted = actions[position : position + size]
+                if len(wanted) == size and [
+                    action_signature(action) for action in transition.actions
+                ] == [action_signature(action) for action in wanted]:
+                    if best is None or size > len(best.actions):
+                        best = transition
+            if best is None:
+                break
+            matched.append(best)
+            position += len(best.actions)
+            node = best.target
+        return matched
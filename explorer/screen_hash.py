@@ -0,0 +1,87 @@
+"""Screen change detection with perceptual hashes of downscaled screenshots."""
+
+from __future__ import annotations
+
+import time
+from typing import Any, Callable
+
+
+def dhash(image: Any, size: int = 16) -> str:
+    """Return the difference hash of a PIL ``image`` as a hex string.
+
+    The image is reduced to ``size + 1`` by ``size`` grey pixels and every bit
+    tells whether a pixel is brighter than its right neighbour, so the hash
+    survives compression noise but not a changed layout.
+    """
+
+    from PIL import Image
+
+    small = image.convert("L").resize((size + 1, size), Image.Resampling.BILINEAR)
+    pixels = list(small.getdata())
+    value = 0
+    for row in range(size):
+        offset = row * (size + 1)
+        for column in range(size):
+            left, right = pixels[offset + column], pixels[offset + column + 1]
+            value = value << 1 | (left > right)
+    return f"{value:0{size * size // 4}x}"
+
+
+def hash_distance(first: str, second: str) -> int:
+    """Return the number of differing bits of two hashes of the same size."""
+
+    return (int(first, 16) ^ int(second, 16)).bit_count()
+
+
+class ScreenChangeDetector:
+    """Tell whether the screen changed by comparing screenshot hashes.
+
+    A screenshot is far cheaper than a hierarchy dump of a busy screen. Two
+    hashes at most ``threshold`` bits apart count as the same screen; changes
+    smaller than one of the ``size`` by ``size`` hash cells, such as a toggled
+    checkbox, may go unnoticed, so raise ``size`` for such screens.
+    :attr:`last_image` is the last screenshot taken, e.g. to be stored by a
+    :class:`~explorer.screenshots.ScreenshotPipeline` instead of taking another.
+    """
+
+    def __init__(
+        self,
+        size: int = 16,
+        threshold: int = 0,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+    ) -> None:
+        self.size = size
+        self.threshold = threshold
+        self._clock = clock
+        self._sleep = sleep
+        self.last_image: Any = None
+
+    def capture(self, device: Any) -> str:
+        """Return the hash of the current screen of ``device``."""
+
+        self.last_image = device.screenshot()
+        return dhash(self.last_image, self.size)
+
+    def same(self, first: str | None, second: str | None) -> bool:
+        """Return whether two hashes show the same screen."""
+
+        if first is None or second is None:
+            return False
+        return hash_distance(first, second) <= self.threshold
+
+    def wait_settled(self, device: Any, timeout: float, interval: float = 0.25) -> str:
+        """Wait until two screenshots ``interval`` apart match or ``timeout``.
+
+        Returns the hash of the last screenshot.
+        """
+
+        deadline = self._clock() + timeout
+        previous = self.capture(device)
+        while self._clock() < deadline:
+            self._sleep(interval)
+            current = self.capture(device)
+            if self.same(previous, current):
+                return current
+            previous = current
+        return previous
@@ -0,0 +1,176 @@
+"""Background capture of downscaled, deduplicated screenshots for traces."""
+
+from __future__ import annotations
+
+import hashlib
+import io
+import logging
+import queue
+import threading
+from concurrent.futures import Future
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+_SUFFIXES = {"webp": ".webp", "jpeg": ".jpg"}
+
+
+@dataclass
+class CaptureStats:
+    """Counters of a :class:`ScreenshotPipeline`."""
+
+    captured: int = 0
+    stored: int = 0
+    deduplicated: int = 0
+    dropped: int = 0
+    failed: int = 0
+
+
+@dataclass
+class _Capture:
+    device: Any
+    image: Any
+    future: Future[str | None]
+    taken: threading.Event
+
+
+class ScreenshotPipeline:
+    """Capture and store screenshots by content on background threads.
+
+    :meth:`submit` only schedules a screenshot: one thread takes it while the
+    caller goes on, e.g. resolving the next element, and :meth:`wait_captured`
+    blocks until it was taken, so that the screen is not changed before. A
+    second thread stores the screenshots: when ``max_queue`` of them are
+    already pending the new one is dropped. Screenshots are downscaled to at
+    most ``max_width`` pixels, encoded as ``format`` (``"webp"`` or
+    ``"jpeg"``) at ``quality`` and written to ``directory`` under a name
+    derived from the encoded bytes. Screenshots with the same pixels as an
+    earlier one reuse its file without being encoded again.
+    """
+
+    logger = logging.getLogger(__name__)
+
+    def __init__(
+        self,
+        directory: str | Path,
+        format: str = "webp",
+        quality: int = 60,
+        max_width: int = 540,
+        max_queue: int = 16,
+    ) -> None:
+        if format not in _SUFFIXES:
+            raise ValueError(f"unsupported screenshot format {format!r}")
+        self.directory = Path(directory)
+        self.format = format
+        self.quality = quality
+        self.max_width = max_width
+        self.stats = CaptureStats()
+        self._captures: queue.Queue[_Capture | None] = queue.Queue()
+        self._queue: queue.Queue[tuple[Any, Future[str | None]] | None] = queue.Queue(
+            max_queue
+        )
+        self._refs: dict[str, str] = {}
+        self._lock = threading.Lock()
+        self._workers: list[threading.Thread] = []
+        self._taken: threading.Event | None = None
+
+    def submit(self, device: Any, image: Any = None) -> Future[str | None]:
+        """Schedule a screenshot of ``device``, or storing ``image`` if given.
+
+        The returned future resolves to the file name relative to
+        :attr:`directory`, or to ``None`` when the screenshot was dropped or
+        failed.
+        """
+
+        capture = _Capture(device, image, Future(), threading.Event())
+        with self._lock:
+            if not self._workers:
+                self._workers = [
+                    threading.Thread(target=target, daemon=True)
+                    for target in (self._capture, self._run)
+                ]
+                for worker in self._workers:
+                    worker.start()
+            self._taken = capture.taken
+        self._captures.put(capture)
+        return capture.future
+
+    def wait_captured(self) -> None:
+        """Block until the screenshots submitted so far have been taken."""
+
+        with self._lock:
+            taken = self._taken
+        if taken is not None:
+            taken.wait()
+
+    def close(self) -> None:
+        """Finish pending captures and stop the worker threads."""
+
+        with self._lock:
+            workers, self._workers = self._workers, []
+        if workers:
+            self._captures.put(None)
+            workers[0].join()
+            self._queue.put(None)
+            workers[1].join()
+
+    def _capture(self) -> None:
+        while True:
+            capture = self._captures.get()
+            if capture is None:
+                return
+            image = capture.image
+            try:
+                if image is None:
+                    image = capture.device.screenshot()
+            except Exception:  # noqa: BLE001 - screenshots never fail a run
+                self.logger.warning("Screenshot capture failed", exc_info=True)
+                self.stats.failed += 1
+                capture.future.set_result(None)
+                continue
+            finally:
+                capture.taken.set()
+            self.stats.captured += 1
+            try:
+                self._queue.put_nowait((image, capture.future))
+            except queue.Full:
+                self.stats.dropped += 1
+                capture.future.set_result(None)
+
+    def _run(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            image, future = item
+            try:
+                future.set_result(self._store(image))
+            except Exception:  # noqa: BLE001 - screenshots never fail a run
+                self.logger.warning("Screenshot storage failed", exc_info=True)
+                self.stats.failed += 1
+                future.set_result(None)
+
+    def _store(self, image: Any) -> str:
+        content = hashlib.sha256(f"{image.mode}{image.size}".encode())
+        content.update(image.tobytes())
+        image_hash = content.hexdigest()
+        ref = self._refs.get(image_hash)
+        if ref is not None:
+            self.stats.deduplicated += 1
+            return ref
+
+        if image.width > self.max_width:
+            height = round(image.height * self.max_width / image.width)
+            image = image.resize((self.max_width, height))
+        buffer = io.BytesIO()
+        image.convert("RGB").save(buffer, self.format.upper(), quality=self.quality)
+        data = buffer.getvalue()
+
+        ref = hashlib.sha256(data).hexdigest()[:32] + _SUFFIXES[self.format]
+        path = self.directory / ref
+        if not path.exists():
+            self.directory.mkdir(parents=True, exist_ok=True)
+            path.write_bytes(data)
+            self.stats.stored += 1
+        self._refs[image_hash] = ref
+        return ref
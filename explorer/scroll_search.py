@@ -0,0 +1,183 @@
+"""Local search for elements below the fold of scrollable containers."""
+
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass
+from typing import Callable
+from xml.etree import ElementTree
+
+_BOUNDS = re.compile(r"\[(-?\d+),(-?\d+)\]\[(-?\d+),(-?\d+)\]")
+_WORDS = re.compile(r"[A-Z]?[a-z]+|[A-Z]+(?![a-z])|\d+")
+
+# Words describing the kind of widget rather than its content.
+_GENERIC = {
+    "a",
+    "an",
+    "the",
+    "on",
+    "in",
+    "of",
+    "to",
+    "for",
+    "with",
+    "button",
+    "field",
+    "icon",
+    "item",
+    "element",
+    "screen",
+    "tab",
+    "menu",
+    "option",
+    "link",
+    "label",
+}
+
+
+def words(text: str) -> list[str]:
+    """Split ``text``, identifiers included, into lowercase words."""
+
+    return [word.lower() for word in _WORDS.findall(text)]
+
+
+def relevance(request: str, attributes: dict[str, str]) -> float:
+    """Return the share of request words found in a node's labels and id.
+
+    Generic widget words are ignored unless the request consists of nothing
+    else. Words of four or more letters also match by prefix, so that
+    ``notification`` matches ``Notifications``.
+    """
+
+    wanted = [word for word in words(request) if word not in _GENERIC] or words(request)
+    if not wanted:
+        return 0.0
+    resource_id = attributes.get("resource-id", "").rpartition("/")[2]
+    present = set(
+        words(
+            " ".join((attributes.get("text", ""), attributes.get("content-desc", "")))
+            + " "
+            + resource_id
+        )
+    )
+
+    def found(word: str) -> bool:
+        if word in present:
+            return True
+        return len(word) >= 4 and any(
+            len(other) >= 4 and (other.startswith(word) or word.startswith(other))
+            for other in present
+        )
+
+    return sum(found(word) for word in wanted) / len(wanted)
+
+
+def _visible_nodes(xml: str) -> list[dict[str, str]]:
+    try:
+        root = ElementTree.fromstring(xml)
+    except ElementTree.ParseError:
+        return []
+    nodes = []
+    stack = list(root.findall("node"))
+    while stack:
+        node = stack.pop()
+        if node.attrib.get("visible-to-user", "true") != "true":
+            continue
+        nodes.append(node.attrib)
+        stack.extend(node.findall("node"))
+    return nodes
+
+
+def best_match(
+    xml: str, request: str, seen: set[tuple[str, str, str]] | None = None
+) -> float:
+    """Return the highest :func:`relevance` of a visible node in ``xml``.
+
+    Nodes whose labels are in ``seen`` are skipped.
+    """
+
+    seen = seen or set()
+    return max(
+        (
+            relevance(request, attributes)
+            for attributes in _visible_nodes(xml)
+            if _labels(attributes) not in seen
+        ),
+        default=0.0,
+    )
+
+
+def scrollable_containers(xml: str) -> list[tuple[int, int, int, int]]:
+    """Return bounds of visible scrollable nodes, largest first."""
+
+    containers = []
+    for attributes in _visible_nodes(xml):
+        if attributes.get("scrollable") != "true":
+            continue
+        match = _BOUNDS.fullmatch(attributes.get("bounds", ""))
+        if match is None:
+            continue
+        left, top, right, bottom = map(int, match.groups())
+        if right > left and bottom > top:
+            containers.append((left, top, right, bottom))
+    return sorted(set(containers), key=lambda b: -((b[2] - b[0]) * (b[3] - b[1])))
+
+
+def _labels(attributes: dict[str, str]) -> tuple[str, str, str]:
+    return (
+        attributes.get("resource-id", ""),
+        attributes.get("text", ""),
+        attributes.get("content-desc", ""),
+    )
+
+
+def _content(xml: str) -> list[tuple[str, str, str]]:
+    """Return labels of visible nodes, which stay equal once a list ends."""
+
+    return [_labels(attributes) for attributes in _visible_nodes(xml)]
+
+
+@dataclass
+class ScrollSearch:
+    """Scroll containers step by step until the requested element shows up.
+
+    Every dump after a swipe is scored locally with :func:`relevance`; the
+    language model is only asked again once a node that was not on the
+    initial screen scores ``min_score`` or more. A container is left when its
+    content stops changing or after ``max_swipes`` swipes. ``direction`` is
+    the swipe direction, ``"up"`` reveals content below the fold.
+    """
+
+    max_swipes: int = 8
+    min_score: float = 0.5
+    direction: str = "up"
+    max_containers: int = 2
+
+    def search(
+        self,
+        request: str,
+        hierarchy: str,
+        swipe: Callable[[tuple[int, int, int, int], str], None],
+        dump: Callable[[], str],
+    ) -> tuple[str | None, str]:
+        """Return ``(match, last)`` hierarchies.
+
+        ``match`` is the first dump with a likely match, or ``None``; ``last``
+        is the hierarchy of the screen left after searching.
+        """
+
+        last = hierarchy
+        # The model has already rejected everything on the initial screen.
+        seen = set(_content(hierarchy))
+        for bounds in scrollable_containers(hierarchy)[: self.max_containers]:
+            content = _content(last)
+            for _ in range(self.max_swipes):
+                swipe(bounds, self.direction)
+                last = dump()
+                if best_match(last, request, seen) >= self.min_score:
+                    return last, last
+                new_content = _content(last)
+                if new_content == content:
+                    break
+                content = new_content
+        return None, last
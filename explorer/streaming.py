@@ -0,0 +1,50 @@
+"""Incremental parsing of JSON objects streamed by a chat model."""
+
+from __future__ import annotations
+
+import json
+import re
+from typing import Any
+
+# One top level ``"key": value`` pair with a string or number value, anchored
+# after the separators that may precede it.
+_PAIR = re.compile(
+    r'[\s,]*"(?P<key>[^"\\]+)"\s*:\s*'
+    r'(?P<value>"(?:[^"\\]|\\.)*"|-?\d+(?:\.\d+)?(?:[eE][-+]?\d+)?(?=\s*[,}]))',
+    re.DOTALL,
+)
+
+
+class IncrementalJsonFields:
+    """Collect fields of a flat JSON object while its text is still arriving.
+
+    Text before the opening brace, such as a markdown code fence, is skipped.
+    Every :meth:`feed` returns the fields completed by the new text; values
+    are decoded as soon as their closing quote or the following separator is
+    seen.
+    """
+
+    def __init__(self) -> None:
+        self.text = ""
+        self.fields: dict[str, Any] = {}
+        self._position: int | None = None
+
+    def feed(self, chunk: str) -> dict[str, Any]:
+        """Add ``chunk`` and return the fields it completed."""
+
+        self.text += chunk
+        if self._position is None:
+            brace = self.text.find("{")
+            if brace < 0:
+                return {}
+            self._position = brace + 1
+
+        completed: dict[str, Any] = {}
+        while True:
+            match = _PAIR.match(self.text, self._position)
+            if match is None:
+                break
+            completed[match["key"]] = json.loads(match["value"])
+            self._position = match.end()
+        self.fields.update(completed)
+        return completed
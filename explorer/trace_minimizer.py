@@ -0,0 +1,155 @@
+"""Remove steps without lasting effect from recorded traces before replay.
+
+Run ``python -m explorer.trace_minimizer --help`` for the command line
+interface.
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+from dataclasses import dataclass, field, replace
+from pathlib import Path
+from typing import TYPE_CHECKING
+from xml.etree import ElementTree
+
+from explorer.models import ActionFrame, ExecutionStatus, ScreenInfo
+
+if TYPE_CHECKING:
+    from explorer.scenario_explorer import ScenarioExplorer
+
+# Nodes drawn by the system, e.g. the status bar clock, change on their own.
+IGNORED_PACKAGES = frozenset({"com.android.systemui"})
+_STATE_ATTRIBUTES = (
+    "class",
+    "resource-id",
+    "text",
+    "content-desc",
+    "bounds",
+    "checked",
+    "selected",
+)
+
+
+def screen_state(screen: ScreenInfo | None) -> str | None:
+    """Return a digest identifying what ``screen`` shows, if it is known.
+
+    The hierarchy is reduced to the attributes describing content and layout
+    of non-system nodes; the screenshot hash is used when there is none.
+    """
+
+    if screen is None:
+        return None
+    if screen.hierarchy:
+        try:
+            root = ElementTree.fromstring(screen.hierarchy)
+        except ElementTree.ParseError:
+            return None
+        digest = hashlib.sha1()
+        for node in root.iter("node"):
+            if node.attrib.get("package") in IGNORED_PACKAGES:
+                continue
+            values = (node.attrib.get(name, "") for name in _STATE_ATTRIBUTES)
+            digest.update("\x1f".join(values).encode("utf-8") + b"\x1e")
+        return digest.hexdigest()
+    return screen.image_hash
+
+
+@dataclass
+class MinimizedTrace:
+    """A shortened trace and the indices of the original frames it dropped."""
+
+    frames: list[ActionFrame]
+    removed: list[int] = field(default_factory=list)
+
+
+def minimize_trace(trace: list[ActionFrame]) -> MinimizedTrace:
+    """Drop executed steps that lead back to a screen seen before them.
+
+    Only frames whose element was resolved on a fresh dump carry a reliable
+    screen; key presses and swipes record the last dump. When such a screen
+    recurs later, every step from its first occurrence up to the recurrence
+    had no visible effect and is removed. That covers steps that do not change
+    the screen as well as back-and-forth navigation and repeated swipes.
+    Frames from the first step that was not executed on are kept as they are.
+    """
+
+    executed = 0
+    while (
+        executed < len(trace)
+        and trace[executed].action.status is ExecutionStatus.EXECUTED
+    ):
+        executed += 1
+
+    states = [
+        screen_state(frame.screen) if frame.action.element is not None else None
+        for frame in trace[:executed]
+    ]
+    # A step before the first unexecuted one still leads to that one's screen.
+    if executed < len(trace) and trace[executed].action.element is not None:
+        states.append(screen_state(trace[executed].screen))
+    last_seen = {state: index for index, state in enumerate(states) if state}
+
+    kept: list[ActionFrame] = []
+    removed: list[int] = []
+    index = 0
+    while index < executed:
+        state = states[index]
+        if state is not None and last_seen[state] > index:
+            removed.extend(range(index, last_seen[state]))
+            index = last_seen[state]
+            continue
+        kept.append(_copy(trace[index]))
+        index += 1
+    kept.extend(_copy(frame) for frame in trace[executed:])
+    return MinimizedTrace(kept, removed)
+
+
+def verify_minimized(explorer: ScenarioExplorer, minimized: MinimizedTrace) -> bool:
+    """Replay ``minimized`` once and return whether every step was executed."""
+
+    replayed = explorer.run_trace([_copy(frame) for frame in minimized.frames])
+    return all(
+        frame.action.status is ExecutionStatus.EXECUTED
+        for frame, original in zip(replayed, minimized.frames)
+        if original.action.status is ExecutionStatus.EXECUTED
+    )
+
+
+def _copy(frame: ActionFrame) -> ActionFrame:
+    return ActionFrame(
+        screen=replace(frame.screen) if frame.screen else None,
+        action=frame.action.model_copy(deep=True),
+        error=replace(frame.error) if frame.error else None,
+        metrics=frame.metrics,
+    )
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(
+        prog="python -m explorer.trace_minimizer",
+        description="Remove steps without lasting effect from a recorded trace",
+    )
+    parser.add_argument("trace", type=Path, help="Trace JSON written by explore()")
+    parser.add_argument("output", type=Path, help="Where to write the minimized trace")
+    args = parser.parse_args(argv)
+
+    frames = json.loads(args.trace.read_text(encoding="utf-8"))
+    minimized = minimize_trace([ActionFrame.from_dict(frame) for frame in frames])
+    args.output.write_text(
+        json.dumps(
+            [frame.to_dict() for frame in minimized.frames],
+            ensure_ascii=False,
+            indent=2,
+        ),
+        encoding="utf-8",
+    )
+    print(
+        f"{len(frames)} steps, {len(minimized.removed)} removed: "
+        f"{', '.join(map(str, minimized.removed)) or '-'}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,352 @@
+"""SQLite repository of executed traces with an indexed query API.
+
+Frames are ingested in the :meth:`ActionFrame.to_dict` format and indexed by
+screen name, element name, xpath, status and error type. Hierarchies are kept
+zlib-compressed in a content-addressed side table, so that the many frames
+recorded on one screen share a single copy.
+
+Run ``python -m explorer.trace_store --help`` for the command line interface.
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import sqlite3
+import sys
+import threading
+import time
+import zlib
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Iterable
+
+from explorer.models import ActionFrame
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS hierarchies (
+    digest TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    data BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS traces (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    created REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS frames (
+    trace_id INTEGER NOT NULL REFERENCES traces(id),
+    position INTEGER NOT NULL,
+    created REAL NOT NULL,
+    action_type TEXT NOT NULL,
+    status TEXT NOT NULL,
+    description TEXT,
+    element_name TEXT,
+    xpath TEXT,
+    screen_name TEXT,
+    screen_description TEXT,
+    error_type TEXT,
+    hierarchy TEXT REFERENCES hierarchies(digest),
+    frame TEXT NOT NULL,
+    PRIMARY KEY (trace_id, position)
+);
+CREATE INDEX IF NOT EXISTS frames_screen ON frames(screen_name);
+CREATE INDEX IF NOT EXISTS frames_element ON frames(element_name);
+CREATE INDEX IF NOT EXISTS frames_description ON frames(description);
+CREATE INDEX IF NOT EXISTS frames_xpath ON frames(xpath);
+CREATE INDEX IF NOT EXISTS frames_status ON frames(status, created);
+CREATE INDEX IF NOT EXISTS frames_error ON frames(error_type, created);
+"""
+
+_COLUMNS = (
+    "trace_id, traces.name, position, frames.created, action_type, status, "
+    "description, element_name, xpath, screen_name, screen_description, "
+    "error_type, hierarchy"
+)
+
+
+@dataclass
+class FrameRecord:
+    """Indexed fields of one stored frame."""
+
+    trace_id: int
+    trace: str
+    position: int
+    created: float
+    action: str
+    status: str
+    description: str | None
+    element: str | None
+    xpath: str | None
+    screen: str | None
+    screen_description: str | None
+    error_type: str | None
+    hierarchy: str | None
+
+
+class TraceRepository:
+    """Local SQLite store of ``ActionFrame`` traces.
+
+    The repository may be shared between threads; statements are serialised
+    by an internal lock.
+    """
+
+    def __init__(self, path: str | Path = ":memory:") -> None:
+        self._connection = sqlite3.connect(str(path), check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._connection:
+            self._connection.executescript(_SCHEMA)
+
+    def close(self) -> None:
+        self._connection.close()
+
+    def __enter__(self) -> TraceRepository:
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+    def add_trace(
+        self,
+        frames: Iterable[ActionFrame | dict[str, Any]],
+        name: str = "",
+        created: float | None = None,
+    ) -> int:
+        """Store ``frames`` as one trace and return its id."""
+
+        created = time.time() if created is None else created
+        with self._lock, self._connection:
+            trace_id = self._connection.execute(
+                "INSERT INTO traces (name, created) VALUES (?, ?)", (name, created)
+            ).lastrowid
+            if trace_id is None:
+                raise sqlite3.DatabaseError("trace insert returned no row id")
+            for position, frame in enumerate(frames):
+                if isinstance(frame, ActionFrame):
+                    frame = frame.to_dict()
+                self._insert_frame(trace_id, position, created, frame)
+        return trace_id
+
+    def ingest_file(self, path: Path) -> list[int]:
+        """Store traces from a JSON trace file or a batch JSON lines file.
+
+        The file modification time is used as the creation time of its traces.
+        """
+
+        created = path.stat().st_mtime
+        text = path.read_text(encoding="utf-8")
+        if path.suffix == ".jsonl":
+            records = [json.loads(line) for line in text.splitlines() if line.strip()]
+            return [
+                self.add_trace(record["trace"], record.get("scenario", ""), created)
+                for record in records
+                if record.get("trace")
+            ]
+        return [self.add_trace(json.loads(text), str(path), created)]
+
+    def query(
+        self,
+        screen: str | None = None,
+        element: str | None = None,
+        description: str | None = None,
+        xpath: str | None = None,
+        status: str | None = None,
+        error_type: str | None = None,
+        since: float | None = None,
+        limit: int | None = None,
+    ) -> list[FrameRecord]:
+        """Return frames matching all given fields, newest first."""
+
+        filters = {
+            "screen_name": screen,
+            "element_name": element,
+            "description": description,
+            "xpath": xpath,
+            "status": status,
+            "error_type": error_type,
+        }
+        clauses = [f"{column} = ?" for column, value in filters.items() if value]
+        params: list[Any] = [value for value in filters.values() if value]
+        if since is not None:
+            clauses.append("frames.created >= ?")
+            params.append(since)
+        sql = f"SELECT {_COLUMNS} FROM frames JOIN traces ON traces.id = trace_id"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY frames.created DESC, trace_id DESC, position"
+        if limit is not None:
+            sql += f" LIMIT {int(limit)}"
+        with self._lock:
+            rows = self._connection.execute(sql, params).fetchall()
+        return [FrameRecord(*row) for row in rows]
+
+    def traces(self, **filters: Any) -> list[str]:
+        """Return names of traces with a frame matching :meth:`query` filters."""
+
+        names: dict[str, None] = {}
+        for record in self.query(**filters):
+            names.setdefault(record.trace)
+        return list(names)
+
+    def frames(self, trace_id: int) -> list[dict[str, Any]]:
+        """Return the stored frames of a trace with their hierarchies restored."""
+
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT frame, hierarchy FROM frames WHERE trace_id = ? "
+                "ORDER BY position",
+                (trace_id,),
+            ).fetchall()
+        frames = []
+        for data, digest in rows:
+            frame = json.loads(data)
+            if frame["screen"] is not None:
+                frame["screen"]["hierarchy"] = self.hierarchy(digest) if digest else ""
+            frames.append(frame)
+        return frames
+
+    def hierarchy(self, digest: str) -> str:
+        """Return the hierarchy stored under ``digest``."""
+
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT data FROM hierarchies WHERE digest = ?", (digest,)
+            ).fetchone()
+        if row is None:
+            raise KeyError(digest)
+        return zlib.decompress(row[0]).decode("utf-8")
+
+    def known_elements(self, description: str, limit: int = 3) -> list[FrameRecord]:
+        """Return recently executed resolutions of ``description``.
+
+        Each xpath is returned once, most recent first, so that element
+        resolution can try them before asking the model.
+        """
+
+        known: dict[str, FrameRecord] = {}
+        for record in self.query(description=description, status="executed"):
+            if record.xpath and record.error_type is None:
+                known.setdefault(record.xpath, record)
+            if len(known) == limit:
+                break
+        return list(known.values())
+
+    def _insert_frame(
+        self, trace_id: int, position: int, created: float, frame: dict[str, Any]
+    ) -> None:
+        action = frame["action"]
+        element = action.get("element") or {}
+        screen = frame.get("screen")
+        error = frame.get("error")
+        digest = None
+        stored = dict(frame)
+        if screen is not None:
+            digest = self._store_hierarchy(screen.get("hierarchy") or "")
+            stored["screen"] = {**screen, "hierarchy": None}
+        self._connection.execute(
+            "INSERT INTO frames VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                trace_id,
+                position,
+                created,
+                _value(action["type"]),
+                _value(action["status"]),
+                element.get("description"),
+                element.get("name"),
+                element.get("xpath"),
+                screen.get("name") if screen else None,
+                screen.get("description") if screen else None,
+                error.get("type") if error else None,
+                digest,
+                json.dumps(stored, default=_value, ensure_ascii=False),
+            ),
+        )
+
+    def _store_hierarchy(self, hierarchy: str) -> str:
+        data = hierarchy.encode("utf-8")
+        digest = hashlib.sha256(data).hexdigest()
+        self._connection.execute(
+            "INSERT OR IGNORE INTO hierarchies VALUES (?, ?, ?)",
+            (digest, len(data), zlib.compress(data)),
+        )
+        return digest
+
+
+def _value(value: Any) -> Any:
+    """Return the value of enum members serialised by ``model_dump``."""
+
+    return getattr(value, "value", value)
+
+
+def main(argv: list[str] | None = None) -> None:
+    """Ingest and query traces from the command line."""
+
+    parser = argparse.ArgumentParser(description="Indexed Explorer trace store")
+    parser.add_argument("database", type=Path, help="SQLite database file")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    ingest = commands.add_parser("ingest", help="Store JSON or JSON lines traces")
+    ingest.add_argument("files", type=Path, nargs="+")
+
+    query = commands.add_parser("query", help="List frames matching all filters")
+    query.add_argument("--screen")
+    query.add_argument("--element")
+    query.add_argument("--description")
+    query.add_argument("--xpath")
+    query.add_argument("--status", choices=["pending", "executed", "broken"])
+    query.add_argument("--error-type", dest="error_type")
+    query.add_argument(
+        "--since", help="Only frames stored at or after this ISO date or datetime"
+    )
+    query.add_argument("--limit", type=int, default=None)
+    query.add_argument(
+        "--traces", action="store_true", help="Print matching trace names only"
+    )
+    query.add_argument("--json", action="store_true", help="Print JSON lines")
+
+    show = commands.add_parser("show", help="Print the frames of a trace as JSON")
+    show.add_argument("trace_id", type=int)
+
+    args = parser.parse_args(argv)
+    with TraceRepository(args.database) as repository:
+        if args.command == "ingest":
+            for path in args.files:
+                ids = repository.ingest_file(path)
+                print(f"{path}: {len(ids)} traces")
+            return
+
+        if args.command == "show":
+            json.dump(repository.frames(args.trace_id), sys.stdout, indent=2)
+            print()
+            return
+
+        filters = {
+            "screen": args.screen,
+            "element": args.element,
+            "description": args.description,
+            "xpath": args.xpath,
+            "status": args.status,
+            "error_type": args.error_type,
+            "since": (
+                datetime.fromisoformat(args.since).timestamp() if args.since else None
+            ),
+            "limit": args.limit,
+        }
+        if args.traces:
+            print("\n".join(repository.traces(**filters)))
+            return
+        for record in repository.query(**filters):
+            if args.json:
+                print(json.dumps(asdict(record), ensure_ascii=False))
+                continue
+            print(
+                f"{record.trace_id}:{record.position}\t{record.trace}\t"
+                f"{record.status}\t{record.error_type or '-'}\t"
+                f"{record.screen or '-'}\t{record.element or '-'}\t{record.xpath or '-'}"
+            )
+
+
+if __name__ == "__main__":
+    main()
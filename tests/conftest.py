@@ -1,5 +1,118 @@
 import sys
+from dataclasses import dataclass, field
 from pathlib import Path
+from typing import Any, Iterable
+
+import pytest
 
 # Add repository root to ``sys.path`` for local package imports during tests.
 sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+# mypy: ignore-errors
+
+
+class FakeSelector:
+    def __init__(self, device: "FakeDevice", xpath: str) -> None:
+        self._device = device
+        self._xpath = xpath
+
+    def click(self) -> None:
+        self._device.tap(self._xpath)
+
+
+class FakeDevice:
+    """Device whose xpath clicks succeed and are recorded in ``clicked``.
+
+    ``missing`` xpaths are not found and a click on ``crash_on`` raises
+    ``ConnectionError`` once. A click on an xpath of ``targets`` shows the
+    hierarchy it maps to; ``actions`` counts clicks and key presses.
+    """
+
+    def __init__(
+        self,
+        missing: Iterable[str] = (),
+        crash_on: str | None = None,
+        targets: dict[str, str] | None = None,
+        hierarchy: str = "<hierarchy/>",
+    ) -> None:
+        self.clicked: list[str] = []
+        self.pressed: list[str] = []
+        self.missing = set(missing)
+        self.crash_on = crash_on
+        self.targets = targets or {}
+        self.hierarchy = hierarchy
+        self.actions = 0
+        self.stopped = False
+
+    def tap(self, xpath: str) -> None:
+        if self.crash_on == xpath:
+            self.crash_on = None
+            raise ConnectionError("device went away")
+        self.clicked.append(xpath)
+        self.hierarchy = self.targets.get(xpath, self.hierarchy)
+        self.actions += 1
+
+    def xpath(self, xpath: str) -> FakeSelector:
+        from uiautomator2 import XPathElementNotFoundError  # isort: skip
+
+        if xpath in self.missing:
+            raise XPathElementNotFoundError(xpath)
+        return FakeSelector(self, xpath)
+
+    def press(self, key: str) -> None:
+        self.pressed.append(key)
+        self.actions += 1
+
+    def dump_hierarchy(self, **kwargs: object) -> str:
+        return self.hierarchy
+
+    def stop_uiautomator(self) -> None:
+        self.stopped = True
+
+
+@dataclass
+class Resolver:
+    """Answers of the fake element navigator and the requests it received.
+
+    A request ``r`` resolves to ``{xpath_prefix}r`` on a screen named
+    ``screen``.
+    """
+
+    xpath_prefix: str = "//"
+    screen: str = ""
+    resolved: list[str] = field(default_factory=list)
+
+
+class FakeNavigator:
+    def __init__(
+        self, resolver: Resolver, device: FakeDevice, dump_strategy: Any, **kwargs: Any
+    ) -> None:
+        self.full_hierarchy = "<hierarchy/>"
+        self._resolver = resolver
+        self._device = device
+        self._dump_strategy = dump_strategy
+
+    def find_element_info(self, request: str) -> dict[str, object]:
+        self._resolver.resolved.append(request)
+        self.full_hierarchy = self._dump_strategy.dump(self._device)
+        xpath = f"{self._resolver.xpath_prefix}{request}"
+        return {"element": {"xpath": xpath, "screen": self._resolver.screen}}
+
+
+@pytest.fixture()
+def resolver(monkeypatch: pytest.MonkeyPatch) -> Resolver:
+    """Replace the element navigator of the explorer by a :class:`FakeNavigator`."""
+
+    resolver = Resolver()
+    monkeypatch.setattr(
+        "explorer.scenario_explorer.ElementNavigator",
+        lambda model, device, **kwargs: FakeNavigator(resolver, device, **kwargs),
+    )
+    return resolver
+
+
+@pytest.fixture()
+def make_device() -> type[FakeDevice]:
+    """Return the :class:`FakeDevice` class to create devices with options."""
+
+    return FakeDevice
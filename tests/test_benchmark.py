@@ -0,0 +1,175 @@
+import time
+from pathlib import Path
+from typing import Any
+
+import pytest
+from langchain_core.messages import HumanMessage
+
+from explorer.benchmark import (
+    LIGHT_MODULES,
+    BenchmarkCase,
+    ElementScript,
+    ImportProfile,
+    RecordingDevice,
+    ReplayDevice,
+    ScriptedChatModel,
+    compare_to_baseline,
+    import_regressions,
+    measure_import,
+    percentile,
+    run_case,
+)
+
+# mypy: ignore-errors
+
+CASES = Path(__file__).resolve().parents[1] / "benchmarks" / "cases"
+
+SCREEN = """<?xml version='1.0' encoding='UTF-8'?>
+<hierarchy>
+    <node index='0' class='android.widget.Button' text='Go' resource-id='btn' bounds='[0,0][10,10]' visible-to-user='true'/>
+</hierarchy>"""
+
+
+class FakeDevice:
+    def __init__(self) -> None:
+        self.hierarchy = "<hierarchy>0</hierarchy>"
+
+    def dump_hierarchy(self, max_depth: int) -> str:
+        return self.hierarchy
+
+    def press(self, key: str) -> None:
+        self.hierarchy = f"<hierarchy>{key}</hierarchy>"
+
+    def window_size(self) -> tuple[int, int]:
+        return (100, 200)
+
+
+def test_replay_device_advances_on_actions() -> None:
+    device = ReplayDevice([SCREEN, "<hierarchy/>"])
+    assert len(device.xpath("//*[@resource-id='btn']").all()) == 1
+
+    device.xpath("//android.widget.Button").click()
+
+    assert device.dump_hierarchy() == "<hierarchy/>"
+    device.press("back")
+    assert device.dump_hierarchy() == "<hierarchy/>"
+    assert device.calls["dump_hierarchy"] == 2
+
+
+def test_recording_device_aligns_screens_with_actions() -> None:
+    device = RecordingDevice(FakeDevice())
+    device.dump_hierarchy(max_depth=100)
+    device.press("a")
+    device.press("b")
+    device.dump_hierarchy(max_depth=100)
+
+    assert device.window_size() == (100, 200)
+    assert device.screens == [
+        "<hierarchy>0</hierarchy>",
+        "<hierarchy>0</hierarchy>",
+        "<hierarchy>b</hierarchy>",
+    ]
+
+
+def test_scripted_model_reports_usage() -> None:
+    script = ElementScript({"Go button": {"xpath": "//btn", "name": "go"}})
+    model = ScriptedChatModel(responder=script)
+
+    yes = model.invoke([HumanMessage('Is "Go button" here? answer YES or NO')])
+    no = model.invoke([HumanMessage('Is "Stop button" here? answer YES or NO')])
+    info = model.invoke([HumanMessage('Describe "Go button"')])
+
+    assert yes.text() == "YES"
+    assert no.text() == "NO"
+    assert '"xpath": "//btn"' in info.text()
+    assert yes.usage_metadata["input_tokens"] > 0
+
+
+def test_percentile_and_baseline_comparison() -> None:
+    assert percentile([4.0, 1.0, 3.0, 2.0], 0.5) == 2.0
+    assert percentile([], 0.95) == 0.0
+
+    baseline = {
+        "case": {
+            "explore": {
+                "broken": 0,
+                "device_calls": 10,
+                "model_calls": 4,
+                "tokens": 100,
+                "p50_ms": 10.0,
+                "p95_ms": 20.0,
+            }
+        }
+    }
+    results = {
+        "case": {
+            "explore": {
+                "broken": 0,
+                "device_calls": 11,
+                "model_calls": 4,
+                "tokens": 90,
+                "p50_ms": 12.0,
+                "p95_ms": 40.0,
+            }
+        }
+    }
+
+    regressions = compare_to_baseline(results, baseline)
+
+    assert len(regressions) == 2
+    assert regressions[0].startswith("case/explore: device_calls")
+    assert regressions[1].startswith("case/explore: p95_ms")
+
+
+def test_bundled_case_runs_end_to_end() -> None:
+    case = BenchmarkCase.load(CASES / "settings_navigation.json")
+
+    summaries = run_case(case)
+
+    explore, replay = summaries["explore"], summaries["replay"]
+    assert explore.steps == len(case.actions)
+    assert explore.broken == 0
+    assert explore.model_calls > 0 and explore.tokens > 0
+    assert replay.broken == 0
+    assert replay.model_calls == 0
+    assert replay.device_calls < explore.device_calls
+
+
+def test_bundled_case_replays_on_bounds(monkeypatch: pytest.MonkeyPatch) -> None:
+    case = BenchmarkCase.load(CASES / "settings_navigation.json")
+    devices: list[ReplayDevice] = []
+
+    class CountingDevice(ReplayDevice):
+        def __init__(self, *args: Any, **kwargs: Any) -> None:
+            super().__init__(*args, **kwargs)
+            devices.append(self)
+
+    monkeypatch.setattr("explorer.benchmark.ReplayDevice", CountingDevice)
+    replay = run_case(case, act_on_bounds=True)["replay"]
+
+    assert replay.broken == 0
+    assert replay.model_calls == 0
+    # The on-track check after an action also serves the next step's check.
+    elements = sum(action.element is not None for action in case.actions)
+    assert devices[1].calls["app_current"] <= elements
+
+
+def test_replay_device_charges_app_current_latency() -> None:
+    device = ReplayDevice([SCREEN], query_latency=0.05)
+
+    started = time.perf_counter()
+    device.app_current()
+
+    assert time.perf_counter() - started >= 0.05
+
+
+def test_light_modules_import_without_heavy_dependencies() -> None:
+    profiles = [measure_import(module) for module in LIGHT_MODULES]
+
+    assert import_regressions(profiles) == []
+    assert import_regressions(
+        [ImportProfile("explorer", 1.0, ["langgraph"])], max_ms=0.5
+    ) == [
+        "import explorer: loads langgraph",
+        "import explorer: 1.0ms > 0.5ms",
+    ]
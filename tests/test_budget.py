@@ -0,0 +1,35 @@
+import pytest
+
+from explorer.budget import BudgetExceeded, BudgetTracker, ResolutionBudget
+
+# mypy: ignore-errors
+
+
+def test_tracker_reports_model_call_and_token_limits() -> None:
+    tracker = BudgetTracker(ResolutionBudget(max_model_calls=2, max_tokens=100))
+    tracker.charge(30)
+    assert tracker.exhausted() is None
+
+    tracker.charge(30)
+
+    with pytest.raises(BudgetExceeded) as error:
+        tracker.check()
+    assert error.value.reason == "step budget: 2 model calls of 2"
+
+
+def test_tracker_reports_wall_time() -> None:
+    tracker = BudgetTracker(ResolutionBudget(max_wall_time=0.0), scope="scenario")
+    assert tracker.exhausted().startswith("scenario budget: ")
+
+
+def test_charges_propagate_to_parent() -> None:
+    scenario = BudgetTracker(ResolutionBudget(max_tokens=50), scope="scenario")
+    first = BudgetTracker(ResolutionBudget(), parent=scenario)
+    first.charge(40)
+    second = BudgetTracker(ResolutionBudget(), parent=scenario)
+    second.charge(20)
+
+    assert second.tokens == 20
+    assert scenario.model_calls == 2
+    assert second.exhausted() == "scenario budget: 60 tokens of 50"
+    assert isinstance(BudgetExceeded("x"), LookupError)
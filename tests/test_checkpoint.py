@@ -0,0 +1,65 @@
+from pathlib import Path
+from typing import TYPE_CHECKING, cast
+
+import pytest
+from langchain_core.language_models import BaseChatModel
+
+from explorer.checkpoint import FrameCheckpointer
+from explorer.models import ActionInfo, ActionType, ElementInfo, ExecutionStatus
+from explorer.scenario_explorer import ScenarioExplorer
+
+if TYPE_CHECKING:
+    from conftest import FakeDevice, Resolver
+
+# mypy: ignore-errors
+
+
+def actions() -> list[ActionInfo]:
+    return [
+        ActionInfo(element=ElementInfo(description=name), type=ActionType.CLICK)
+        for name in ("one", "two", "three")
+    ]
+
+
+def test_crashed_run_resumes_at_first_pending_action(
+    resolver: "Resolver", make_device: "type[FakeDevice]", tmp_path: Path
+) -> None:
+    resolver.screen = "main"
+    device = make_device(crash_on="//two")
+    path = tmp_path / "runs.sqlite"
+
+    explorer = ScenarioExplorer(
+        model=cast(BaseChatModel, object()),
+        device_factory=lambda: device,
+        checkpointer=FrameCheckpointer(path),
+    )
+    with pytest.raises(ConnectionError):
+        explorer.explore(actions(), run_id="login")
+
+    # A new process opens the same checkpoint file.
+    checkpointer = FrameCheckpointer(path)
+    assert checkpointer.runs(unfinished=True) == ["login"]
+    stored = checkpointer.load("login")
+    assert stored[0].action.status is ExecutionStatus.EXECUTED
+    assert stored[0].action.element.xpath == "//one"
+    assert stored[0].screen.name == "main"
+    assert stored[1].action.status is ExecutionStatus.PENDING
+
+    explorer = ScenarioExplorer(
+        model=cast(BaseChatModel, object()),
+        device_factory=lambda: device,
+        checkpointer=checkpointer,
+    )
+    trace = explorer.explore(actions(), run_id="login")
+
+    assert resolver.resolved == ["one", "two", "two", "three"]
+    assert device.clicked == ["//one", "//two", "//three"]
+    assert all(frame.action.status is ExecutionStatus.EXECUTED for frame in trace)
+    assert trace[0].metrics is not None
+    assert checkpointer.runs(unfinished=True) == []
+
+
+def test_run_id_requires_checkpointer() -> None:
+    explorer = ScenarioExplorer(model=cast(BaseChatModel, object()))
+    with pytest.raises(ValueError):
+        explorer.explore(actions(), run_id="login")
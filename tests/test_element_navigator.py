@@ -1,53 +1,212 @@
 from typing import cast
 
+import pytest
+from langchain_core.messages import AIMessage
 from langgraph.constants import END
-from uiautomator2.xpath import XPathError  # type: ignore[import-untyped]
 
+from explorer.benchmark import ReplayDevice, ScriptedChatModel
+from explorer.budget import BudgetExceeded, BudgetTracker, ResolutionBudget
 from explorer.element_navigator import AgentState, ElementNavigator
+from explorer.metrics import MetricsRecorder
+from explorer.models import (
+    ActionFrame,
+    ActionInfo,
+    ElementInfo,
+    ExecutionStatus,
+    ScreenInfo,
+)
+from explorer.prompt_cache import PromptCache
+from explorer.trace_store import TraceRepository
 
 # mypy: ignore-errors
 
 
-class FakeXPath:
-    def __init__(self, elements: int, raise_error: bool = False) -> None:
-        self._elements = elements
-        self._raise_error = raise_error
-
-    def all(self) -> list[object]:
-        if self._raise_error:
-            raise XPathError("fail")
-        return [object()] * self._elements
-
-
-class FakeDevice:
-    def __init__(self, elements: int, raise_error: bool = False) -> None:
-        self._elements = elements
-        self._raise_error = raise_error
-
-    def xpath(self, xpath: str) -> FakeXPath:
-        return FakeXPath(self._elements, self._raise_error)
-
-
-def make_nav(elements: int, raise_error: bool = False) -> ElementNavigator:
+def make_nav(elements: int) -> ElementNavigator:
     nav = ElementNavigator.__new__(ElementNavigator)
-    nav._device = FakeDevice(elements, raise_error)
+    nodes = "".join(
+        f"<node index='{index}' class='android.widget.Button' resource-id='foo' "
+        f"bounds='[0,{index}][10,{index + 1}]' visible-to-user='true'/>"
+        for index in range(elements)
+    )
+    nav.full_hierarchy = f"<hierarchy>{nodes}</hierarchy>"
+    nav._cascade = None
+    nav._validated_xpath = None
     nav.logger = ElementNavigator.logger
     return nav
 
 
 def test_only_one_element_returns_end() -> None:
     nav = make_nav(1)
-    state = cast(AgentState, {"element": {"xpath": "//foo"}})
+    state = cast(AgentState, {"element": {"xpath": "//*[@resource-id='foo']"}})
     assert nav._only_one_element_with_this_xpath(state) == END
 
 
 def test_multiple_elements_requests_retry() -> None:
     nav = make_nav(2)
-    state = cast(AgentState, {"element": {"xpath": "//foo"}})
+    state = cast(AgentState, {"element": {"xpath": "//*[@resource-id='foo']"}})
     assert nav._only_one_element_with_this_xpath(state) == "find_another_xpath"
 
 
 def test_xpath_error_treated_as_retry() -> None:
-    nav = make_nav(1, True)
-    state = cast(AgentState, {"element": {"xpath": "//foo"}})
+    nav = make_nav(1)
+    state = cast(AgentState, {"element": {"xpath": "//*[@resource-id="}})
     assert nav._only_one_element_with_this_xpath(state) == "find_another_xpath"
+
+
+SCREEN = """<?xml version='1.0' encoding='UTF-8'?>
+<hierarchy>
+    <node index='0' class='android.widget.Button' text='Go' resource-id='btn' bounds='[0,0][10,10]' visible-to-user='true'/>
+    <node index='1' class='android.widget.Button' text='Stop' resource-id='btn' bounds='[10,0][20,10]' visible-to-user='true'/>
+</hierarchy>"""
+
+NO_RETRY_WAIT = dict(backoff_initial=0.0, backoff_max=0.0)
+
+
+def make_budget_nav(
+    answers: dict[str, str], budget: ResolutionBudget
+) -> ElementNavigator:
+    def responder(prompt: str) -> str:
+        if "another xpath" in prompt:
+            return answers["another"]
+        if "YES or NO" in prompt:
+            return answers["presence"]
+        return answers["info"]
+
+    model = ScriptedChatModel(responder=responder)
+    return ElementNavigator(model, ReplayDevice([SCREEN]), budget=budget)
+
+
+def test_unchanged_screen_is_not_asked_twice() -> None:
+    metrics = MetricsRecorder()
+    nav = make_budget_nav({"presence": "NO"}, ResolutionBudget(**NO_RETRY_WAIT))
+    nav._metrics = metrics
+    metrics.start_step()
+
+    with pytest.raises(LookupError):
+        nav.find_element_info("Go button")
+
+    step = metrics.finish_step()
+    assert step.model_calls == 1
+    assert step.presence_retries == 2
+
+
+def test_xpath_retries_are_bounded() -> None:
+    info = '```json\n{"screen": "", "screen_description": "", "name": "go", "xpath": "//*[@resource-id=\'btn\']"}\n```'
+    nav = make_budget_nav(
+        {"presence": "YES", "info": info, "another": "//*[@resource-id='btn']"},
+        ResolutionBudget(max_xpath_retries=2, **NO_RETRY_WAIT),
+    )
+
+    with pytest.raises(BudgetExceeded) as error:
+        nav.find_element_info("Go button")
+    assert error.value.reason == "step budget: 2 xpath retries"
+
+
+def test_model_call_budget_stops_resolution() -> None:
+    scenario = BudgetTracker(ResolutionBudget(max_model_calls=1), scope="scenario")
+    nav = make_budget_nav({"presence": "YES", "info": ""}, ResolutionBudget())
+    nav._scenario_budget = scenario
+
+    with pytest.raises(BudgetExceeded) as error:
+        nav.find_element_info("Go button")
+    assert error.value.reason == "scenario budget: 1 model calls of 1"
+
+
+def test_retry_prompt_stays_flat() -> None:
+    prompts: list[str] = []
+    another = iter(["//*[@text='Nope']", "`//*[@text='Go']`"])
+    info = '```json\n{"screen": "", "screen_description": "", "name": "go", "xpath": "//*[@resource-id=\'btn\']"}\n```'
+
+    def responder(prompt: str) -> str:
+        prompts.append(prompt)
+        if "another xpath" in prompt:
+            return next(another)
+        return "YES" if "YES or NO" in prompt else info
+
+    nav = ElementNavigator(
+        ScriptedChatModel(responder=responder), ReplayDevice([SCREEN])
+    )
+    result = nav.find_element_info("Go button")
+
+    first_retry, second_retry = prompts[2], prompts[3]
+    assert result["element"]["xpath"] == "//*[@text='Go']"
+    assert result["rejected_xpaths"] == [
+        ("//*[@resource-id='btn']", 2),
+        ("//*[@text='Nope']", 0),
+    ]
+    assert "The last xpath matched these candidates" in first_retry
+    assert "text='Stop'" in first_retry
+    assert "- //*[@text='Nope'] (matches: 0)" in second_retry
+    assert second_retry.count("Elements hierarchy") == 1
+    assert len(second_retry) < len(first_retry)
+
+
+def test_prompt_cache_shares_prefix_between_elements() -> None:
+    class RecordingModel:
+        def __init__(self) -> None:
+            self.calls: list[tuple[list[object], dict[str, object]]] = []
+
+        def invoke(self, messages: list[object], **kwargs: object) -> object:
+            self.calls.append((messages, kwargs))
+            if len(self.calls) % 2:
+                return AIMessage("YES")
+            return AIMessage(
+                '```json\n{"screen": "", "screen_description": "", "name": "go", '
+                '"xpath": "//*[@text=\'Go\']"}\n```'
+            )
+
+    model = RecordingModel()
+    nav = ElementNavigator(
+        model, ReplayDevice([SCREEN]), prompt_cache=PromptCache.ANTHROPIC
+    )
+    nav.find_element_info("Go button")
+    nav.find_element_info("Stop button")
+
+    presence = [messages[0].content for messages, _ in model.calls[::2]]
+    info = [messages[0].content for messages, _ in model.calls[1::2]]
+    assert presence[0][0] == presence[1][0]
+    assert info[0][0] == info[1][0]
+    assert info[0][0]["cache_control"] == {"type": "ephemeral"}
+    assert info[0][0]["text"].endswith('Target element: "')
+    assert info[0][1]["text"] == 'Go button"\n'
+
+
+def test_known_element_skips_the_model() -> None:
+    known = TraceRepository()
+    known.add_trace(
+        [
+            ActionFrame(
+                screen=ScreenInfo(name="Main", description="", hierarchy=SCREEN),
+                action=ActionInfo(
+                    element=ElementInfo(
+                        description="Go button",
+                        name="go",
+                        xpath="//*[@text='Go']",
+                    ),
+                    status=ExecutionStatus.EXECUTED,
+                ),
+                error=None,
+            )
+        ]
+    )
+    prompts: list[str] = []
+
+    def responder(prompt: str) -> str:
+        prompts.append(prompt)
+        return "NO"
+
+    nav = ElementNavigator(
+        ScriptedChatModel(responder=responder),
+        ReplayDevice([SCREEN]),
+        budget=ResolutionBudget(**NO_RETRY_WAIT),
+        known_elements=known,
+    )
+
+    info = nav.find_element_info("Go button")
+
+    assert info["element"]["xpath"] == "//*[@text='Go']"
+    assert info["element"]["screen"] == "Main"
+    assert prompts == []
+    with pytest.raises(LookupError):
+        nav.find_element_info("Stop button")
+    assert len(prompts) == 1
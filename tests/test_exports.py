@@ -0,0 +1,9 @@
+import explorer
+
+# mypy: ignore-errors
+
+
+def test_every_public_name_is_importable() -> None:
+    assert set(explorer._EXPORTS) == set(explorer.__all__)
+    for name in explorer.__all__:
+        assert getattr(explorer, name) is not None
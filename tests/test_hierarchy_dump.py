@@ -0,0 +1,92 @@
+from explorer.hierarchy_dump import DumpStrategy, relevant_depth
+
+# mypy: ignore-errors
+
+
+def nested(depth: int, package: str = "com.app") -> str:
+    """Return a hierarchy with a single clickable node at ``depth``."""
+
+    xml = f"<node package='{package}' clickable='true' text='leaf'/>"
+    for _ in range(depth - 1):
+        xml = f"<node package='{package}'>{xml}</node>"
+    return f"<hierarchy>{xml}</hierarchy>"
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class FakeDevice:
+    def __init__(self, hierarchy: str) -> None:
+        self.hierarchy = hierarchy
+        self.dumps: list[dict[str, object]] = []
+
+    def dump_hierarchy(self, **kwargs: object) -> str:
+        self.dumps.append(kwargs)
+        return self.hierarchy
+
+    def app_current(self) -> dict[str, str]:
+        return {"package": "com.app", "activity": ".Main"}
+
+
+def test_relevant_depth_skips_invisible_and_layout_nodes() -> None:
+    xml = (
+        "<hierarchy><node><node><node clickable='true'/>"
+        "<node><node visible-to-user='false' text='hidden'/></node></node></node>"
+        "</hierarchy>"
+    )
+
+    assert relevant_depth(xml) == 3
+    assert relevant_depth(nested(5)) == 5
+    assert relevant_depth("not xml") == 0
+
+
+def test_default_strategy_dumps_every_time() -> None:
+    device = FakeDevice(nested(2))
+    strategy = DumpStrategy()
+
+    strategy.dump(device)
+    strategy.dump(device)
+
+    assert device.dumps == [{"max_depth": 100}, {"max_depth": 100}]
+    profile = strategy.profiles["com.app"]
+    assert profile.dumps == 2
+    assert profile.total_bytes == 2 * len(nested(2))
+
+
+def test_adaptive_depth_follows_relevant_nodes() -> None:
+    device = FakeDevice(nested(4))
+    strategy = DumpStrategy(compressed=True, adaptive_depth=True, depth_margin=2)
+
+    strategy.dump(device)
+    strategy.dump(device)
+    device.hierarchy = nested(6)
+    strategy.dump(device)
+    strategy.dump(device)
+
+    assert [dump["max_depth"] for dump in device.dumps] == [100, 6, 6, 100]
+    assert all(dump["compressed"] for dump in device.dumps)
+    assert strategy.profiles["com.app/.Main"].dumps == 4
+
+
+def test_recent_dump_is_reused_until_invalidated() -> None:
+    clock = FakeClock()
+    device = FakeDevice(nested(1))
+    strategy = DumpStrategy(reuse_ttl=1.0, clock=clock)
+
+    strategy.dump(device)
+    clock.now = 0.5
+    strategy.dump(device)
+    strategy.invalidate()
+    strategy.dump(device)
+    clock.now = 2.0
+    strategy.dump(device)
+
+    assert len(device.dumps) == 3
+    profile = strategy.profiles["com.app"]
+    assert (profile.dumps, profile.reused) == (3, 1)
+    assert strategy.most_expensive(1) == [profile]
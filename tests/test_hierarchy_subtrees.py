@@ -0,0 +1,64 @@
+import gc
+import tracemalloc
+
+import pytest
+
+from explorer.hierarchy_subtrees import SubtreeInterner
+from explorer.models import ScreenInfo
+
+# mypy: ignore-errors
+
+
+def screen(clock: str, rows: int = 200) -> str:
+    items = "".join(
+        f'<node index="{i}" class="android.widget.TextView" text="Item {i}" '
+        f'bounds="[0,{i * 10}][100,{i * 10 + 10}]"/>\n'
+        for i in range(rows)
+    )
+    return (
+        "<?xml version='1.0' encoding='UTF-8' standalone='yes' ?>\n<hierarchy>\n"
+        f'<node class="android.widget.FrameLayout"><node text="{clock}"/></node>\n'
+        f'<node class="android.widget.ListView">\n{items}</node>\n</hierarchy>'
+    )
+
+
+@pytest.mark.parametrize(
+    "xml",
+    [screen("12:00", rows=3), "", "plain text", "<a><b></a>", "</a><b>", "<a x='1"],
+)
+def test_split_round_trips(xml: str) -> None:
+    assert str(SubtreeInterner().split(xml)) == xml
+
+
+def test_dumps_differing_in_one_leaf_share_other_subtrees() -> None:
+    interner = SubtreeInterner()
+    first = interner.split(screen("12:00"))
+    second = interner.split(screen("12:01"))
+
+    hierarchy = [child for child in first.children if child.children][0]
+    changed = [child for child in second.children if child.children][0]
+    status, items = hierarchy.children[1], hierarchy.children[3]
+    assert changed is not hierarchy
+    assert changed.children[1] is not status
+    assert changed.children[3] is items
+    assert interner.split(screen("12:00")) is first
+
+    del first, second, hierarchy, changed, status, items
+    gc.collect()
+    assert len(interner) == 0
+
+
+def test_screens_of_a_long_trace_hold_unchanged_subtrees_once() -> None:
+    dumps = [screen(f"12:{minute:02}") for minute in range(50)]
+    screens = [ScreenInfo(name="", description="", hierarchy=dumps[0])]
+    gc.collect()
+    tracemalloc.start()
+    screens.extend(
+        ScreenInfo(name="", description="", hierarchy=xml) for xml in dumps[1:]
+    )
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    assert screens[7].hierarchy == dumps[7]
+    # Plain strings would hold 49 more copies of the XML.
+    assert size < 49 * len(dumps[0]) / 5
@@ -0,0 +1,96 @@
+import json
+from pathlib import Path
+
+from explorer.metrics import (
+    JsonLinesExporter,
+    MetricsRecorder,
+    OpenTelemetryCallbackExporter,
+    StepMetrics,
+)
+
+# mypy: ignore-errors
+
+
+class FakeResponse:
+    usage_metadata = {"input_tokens": 120, "output_tokens": 7, "total_tokens": 127}
+
+
+class FakeSelector:
+    def click(self) -> None:
+        pass
+
+
+class FakeDevice:
+    serial = "emulator-5554"
+
+    def dump_hierarchy(self, max_depth: int) -> str:
+        return "<hierarchy/>"
+
+    def xpath(self, xpath: str) -> FakeSelector:
+        return FakeSelector()
+
+
+def test_step_aggregates_spans_and_usage() -> None:
+    recorder = MetricsRecorder()
+    recorder.start_step(index=0)
+    with recorder.span("device.dump_hierarchy"):
+        pass
+    with recorder.span("model.invoke", purpose="find_view") as span:
+        recorder.record_usage(FakeResponse(), span)
+    recorder.count_retry("presence")
+    recorder.count_retry("xpath")
+    step = recorder.finish_step()
+
+    assert isinstance(step, StepMetrics)
+    assert step.attributes == {"index": 0}
+    assert step.device_calls == 1
+    assert step.model_calls == 1
+    assert step.total_tokens == 127
+    assert step.presence_retries == 1
+    assert step.xpath_retries == 1
+    assert step.spans[1].attributes["input_tokens"] == 120
+    assert step.time_in("model") == step.spans[1].duration
+    assert recorder.current_step is None
+
+
+def test_spans_outside_step_are_only_exported() -> None:
+    exported: list[dict[str, object]] = []
+    recorder = MetricsRecorder([OpenTelemetryCallbackExporter(exported.append)])
+    with recorder.span("device.connect"):
+        pass
+
+    assert recorder.finish_step() is None
+    assert exported[0]["name"] == "device.connect"
+    assert exported[0]["end_time_unix_nano"] >= exported[0]["start_time_unix_nano"]
+
+
+def test_instrumented_device_times_rpcs() -> None:
+    recorder = MetricsRecorder()
+    device = recorder.instrument(FakeDevice())
+    assert recorder.instrument(device) is device
+
+    recorder.start_step()
+    device.dump_hierarchy(max_depth=100)
+    device.xpath("//btn").click()
+    step = recorder.finish_step()
+
+    assert device.serial == "emulator-5554"
+    assert [span.name for span in step.spans] == [
+        "device.dump_hierarchy",
+        "device.xpath.click",
+    ]
+    assert step.device_calls == 2
+
+
+def test_json_lines_exporter(tmp_path: Path) -> None:
+    path = tmp_path / "metrics.jsonl"
+    recorder = MetricsRecorder([JsonLinesExporter(path)])
+    for index in range(2):
+        recorder.start_step(index=index)
+        with recorder.span("sleep"):
+            pass
+        recorder.finish_step()
+
+    lines = [json.loads(line) for line in path.read_text().splitlines()]
+    assert [line["attributes"]["index"] for line in lines] == [0, 1]
+    assert lines[0]["spans"][0]["name"] == "sleep"
@@ -0,0 +1,155 @@
+import json
+
+import pytest
+
+from explorer.benchmark import ReplayDevice, ScriptedChatModel
+from explorer.budget import ResolutionBudget
+from explorer.element_navigator import ElementNavigator
+from explorer.metrics import MetricsRecorder
+from explorer.model_cascade import ModelCascade
+
+# mypy: ignore-errors
+
+SCREEN = """<?xml version='1.0' encoding='UTF-8'?>
+<hierarchy>
+    <node index='0' class='android.widget.Button' text='Go' resource-id='btn' bounds='[0,0][10,10]' visible-to-user='true'/>
+    <node index='1' class='android.widget.Button' text='Stop' resource-id='btn' bounds='[10,0][20,10]' visible-to-user='true'/>
+</hierarchy>"""
+
+
+def info(xpath: str, confidence: float = 1.0) -> str:
+    element = {
+        "screen": "Main",
+        "screen_description": "",
+        "name": "go",
+        "xpath": xpath,
+        "confidence": confidence,
+    }
+    return f"```json\n{json.dumps(element)}\n```"
+
+
+def tier(answer: str, calls: list[str], name: str) -> ScriptedChatModel:
+    def responder(prompt: str) -> str:
+        calls.append(name)
+        if "YES or NO" in prompt:
+            return "YES"
+        return answer
+
+    return ScriptedChatModel(responder=responder)
+
+
+def resolve(cheap_answer: str) -> tuple[dict, list[str], ModelCascade, MetricsRecorder]:
+    calls: list[str] = []
+    cascade = ModelCascade(
+        [
+            tier(cheap_answer, calls, "cheap"),
+            tier(info("//*[@text='Go']"), calls, "big"),
+        ],
+        names=["cheap", "big"],
+    )
+    metrics = MetricsRecorder()
+    nav = ElementNavigator(
+        cascade,
+        ReplayDevice([SCREEN]),
+        metrics=metrics,
+        budget=ResolutionBudget(backoff_initial=0.0, backoff_max=0.0),
+    )
+    metrics.start_step()
+    result = nav.find_element_info("Go button")
+    return result, calls, cascade, metrics
+
+
+@pytest.mark.parametrize(
+    "cheap_answer",
+    [
+        info("//*[@resource-id='btn']"),  # ambiguous xpath
+        "not json at all",  # unparsable output
+        info("//*[@text='Go']", confidence=0.2),  # low confidence
+    ],
+)
+def test_cheap_tier_escalates(cheap_answer: str) -> None:
+    result, calls, cascade, metrics = resolve(cheap_answer)
+
+    assert result["element"]["xpath"] == "//*[@text='Go']"
+    assert calls == ["cheap", "cheap", "big"]
+    assert cascade.stats()["cheap"]["successes"] == 0
+    assert cascade.stats()["big"]["successes"] == 1
+    tiers = [span.attributes.get("tier") for span in metrics.finish_step().spans]
+    assert "big" in tiers
+
+
+def test_easy_step_stays_on_cheap_tier() -> None:
+    result, calls, cascade, _ = resolve(info("//*[@text='Go']"))
+
+    assert result["element"]["name"] == "go"
+    assert calls == ["cheap", "cheap"]
+    assert cascade.stats()["cheap"] == {
+        "attempts": 1,
+        "successes": 1,
+        "success_rate": 1.0,
+    }
+
+
+def test_cheap_no_is_confirmed_by_next_tier() -> None:
+    calls: list[str] = []
+
+    def absent(prompt: str) -> str:
+        calls.append("cheap")
+        return "NO"
+
+    cascade = ModelCascade(
+        [
+            ScriptedChatModel(responder=absent),
+            tier(info("//*[@text='Go']"), calls, "big"),
+        ],
+        names=["cheap", "big"],
+    )
+    nav = ElementNavigator(
+        cascade,
+        ReplayDevice([SCREEN]),
+        budget=ResolutionBudget(backoff_initial=0.0, backoff_max=0.0),
+    )
+
+    result = nav.find_element_info("Go button")
+
+    assert result["element"]["xpath"] == "//*[@text='Go']"
+    assert calls == ["cheap", "big", "big"]
+    assert cascade.stats()["cheap"] == {
+        "attempts": 1,
+        "successes": 0,
+        "success_rate": 0.0,
+    }
+
+
+def test_no_confirmed_by_every_tier_records_no_failure() -> None:
+    def absent(prompt: str) -> str:
+        return "NO"
+
+    cascade = ModelCascade(
+        [ScriptedChatModel(responder=absent), ScriptedChatModel(responder=absent)],
+        names=["cheap", "big"],
+    )
+    nav = ElementNavigator(
+        cascade,
+        ReplayDevice([SCREEN]),
+        budget=ResolutionBudget(backoff_initial=0.0, backoff_max=0.0),
+    )
+
+    with pytest.raises(LookupError):
+        nav.find_element_info("Go button")
+
+    assert cascade.stats()["cheap"]["attempts"] == 0
+    assert cascade.stats()["big"]["attempts"] == 0
+
+
+def test_unreliable_tier_is_moved_back() -> None:
+    cascade = ModelCascade([object(), object()], names=["cheap", "big"], min_attempts=2)
+    cheap, big = cascade.tiers()
+
+    cascade.record(cheap, False)
+    assert [t.name for t in cascade.tiers()] == ["cheap", "big"]
+    cascade.record(cheap, False)
+    assert [t.name for t in cascade.tiers()] == ["big", "cheap"]
+
+    with pytest.raises(ValueError):
+        ModelCascade([])
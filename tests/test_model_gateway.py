@@ -0,0 +1,83 @@
+import threading
+import time
+
+from explorer.benchmark import ScriptedChatModel
+from explorer.metrics import MetricsRecorder
+from explorer.model_gateway import ModelGateway, TokenBucket
+
+# mypy: ignore-errors
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_token_bucket_refills_over_time() -> None:
+    clock = FakeClock()
+    bucket = TokenBucket(rate=2.0, capacity=4.0, clock=clock)
+
+    bucket.take(4)
+    assert bucket.wait_time(1) == 0.5
+    clock.now = 1.0
+    assert bucket.wait_time(2) == 0.0
+    assert bucket.wait_time(100) == 1.0  # capped at capacity
+
+
+def test_identical_prompts_in_flight_are_sent_once() -> None:
+    release = threading.Event()
+    prompts: list[str] = []
+
+    def responder(prompt: str) -> str:
+        prompts.append(prompt)
+        release.wait(timeout=5)
+        return "YES"
+
+    gateway = ModelGateway(model=ScriptedChatModel(responder=responder))
+    answers = []
+    threads = [
+        threading.Thread(target=lambda: answers.append(gateway.invoke("same")))
+        for _ in range(3)
+    ]
+    for thread in threads:
+        thread.start()
+    deadline = time.monotonic() + 5
+    while gateway.stats.coalesced < 2 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert prompts == ["same"]
+    assert [answer.text() for answer in answers] == ["YES"] * 3
+    assert sum(1 for answer in answers if answer.usage_metadata) == 1
+    assert gateway.stats.requests == 1
+
+    gateway.invoke("same")
+    assert len(prompts) == 2
+
+
+def test_requests_per_minute_are_enforced() -> None:
+    metrics = MetricsRecorder()
+    gateway = ModelGateway(
+        model=ScriptedChatModel(responder=lambda prompt: "ok"),
+        requests_per_minute=600,
+        burst_seconds=0.1,
+        metrics=metrics,
+    )
+    metrics.start_step()
+
+    started = time.monotonic()
+    for index in range(3):
+        gateway.invoke(f"question {index}")
+    elapsed = time.monotonic() - started
+
+    step = metrics.finish_step()
+    assert elapsed >= 0.18
+    assert gateway.stats.requests == 3
+    assert gateway.stats.max_wait >= 0.09
+    assert step.time_in("queue") >= 0.18
+    assert step.model_calls == 0
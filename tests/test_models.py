@@ -1,6 +1,7 @@
 import json
 from typing import cast
 
+from explorer.metrics import Span, StepMetrics
 from explorer.models import (
     ActionFrame,
     ActionInfo,
@@ -41,3 +42,17 @@ def test_action_frame_without_element() -> None:
     action = cast(dict[str, str], data["action"])
     assert action["data"] == "home"
     assert data["screen"] is None
+
+
+def test_action_frame_from_dict_round_trip() -> None:
+    frame = ActionFrame(
+        screen=ScreenInfo(name="main", description="", hierarchy="<hierarchy/>"),
+        action=ActionInfo(
+            element=ElementInfo(description="btn", xpath="//btn"),
+            type=ActionType.CLICK,
+        ),
+        error=Error(type="SomeError", message="oops"),
+        metrics=StepMetrics(model_calls=1, spans=[Span(name="model.invoke", start=1)]),
+    )
+    restored = ActionFrame.from_dict(json.loads(json.dumps(frame.to_dict())))
+    assert restored == frame
@@ -0,0 +1,118 @@
+import pytest
+
+from explorer.budget import BudgetExceeded, ResolutionBudget
+from explorer.metrics import StepMetrics
+from explorer.models import (
+    ActionFrame,
+    ActionInfo,
+    ActionType,
+    ElementInfo,
+    ExecutionStatus,
+)
+from explorer.preflight import (
+    InvalidScenario,
+    Preflight,
+    StepEstimate,
+    StepHistory,
+    validate_scenario,
+)
+
+# mypy: ignore-errors
+
+
+def click(description: str) -> ActionInfo:
+    return ActionInfo(
+        element=ElementInfo(description=description), type=ActionType.CLICK
+    )
+
+
+def frame(
+    action: ActionInfo,
+    model_calls: int,
+    tokens: int,
+    duration: float,
+    status: ExecutionStatus = ExecutionStatus.EXECUTED,
+) -> ActionFrame:
+    action = action.model_copy(update={"status": status})
+    return ActionFrame(
+        screen=None,
+        action=action,
+        error=None,
+        metrics=StepMetrics(
+            duration=duration, model_calls=model_calls, input_tokens=tokens
+        ),
+    )
+
+
+def test_validate_scenario_reports_unexecutable_steps() -> None:
+    actions = [
+        ActionInfo(data="escape", type=ActionType.PRESS_KEY),
+        ActionInfo(data=None, type=ActionType.SWIPE_SCREEN),
+        ActionInfo(type=ActionType.CLICK),
+        ActionInfo(element=ElementInfo(description="name"), type=ActionType.TEXT_INPUT),
+        ActionInfo(data="back", type=ActionType.PRESS_KEY),
+        ActionInfo(
+            element=ElementInfo(description="list"),
+            data="up",
+            type=ActionType.SWIPE_ELEMENT,
+        ),
+    ]
+
+    issues = validate_scenario(actions)
+
+    assert [(issue.index, issue.message) for issue in issues] == [
+        (0, "unknown key 'escape'"),
+        (1, "invalid swipe direction None"),
+        (2, "click needs an element"),
+    ]
+
+
+def test_estimate_uses_hit_rate_per_description() -> None:
+    history = StepHistory.from_traces(
+        [
+            [frame(click("login"), 1, 1000, 4.0), frame(click("menu"), 2, 3000, 6.0)],
+            [frame(click("login"), 0, 0, 1.0), frame(click("menu"), 0, 0, 0.5)],
+            [
+                frame(click("login"), 0, 0, 1.0),
+                frame(click("other"), 9, 9999, 99.0, ExecutionStatus.BROKEN),
+            ],
+        ]
+    )
+
+    login = history.estimate(click("login"))
+    unknown = history.estimate(click("settings"))
+    key = history.estimate(ActionInfo(data="back", type=ActionType.PRESS_KEY))
+
+    assert login.hit_rate == pytest.approx(2 / 3)
+    assert login.model_calls == pytest.approx(1 / 3)
+    assert login.tokens == pytest.approx(1000 / 3)
+    assert login.duration == pytest.approx(2 / 3 * 1.0 + 1 / 3 * 4.0)
+    # Unknown descriptions use all recorded clicks.
+    assert unknown.hit_rate == pytest.approx(3 / 5)
+    assert key == StepEstimate()
+
+
+def test_history_reads_batch_records() -> None:
+    record = {"trace": [frame(click("login"), 1, 500, 2.0).to_dict()]}
+
+    estimate = StepHistory.from_records([record]).estimate(click("login"))
+
+    assert (estimate.model_calls, estimate.tokens, estimate.duration) == (1, 500, 2.0)
+
+
+def test_preflight_checks_validity_and_budget() -> None:
+    preflight = Preflight(
+        StepHistory(default=StepEstimate(model_calls=1, tokens=100, duration=2)),
+        ResolutionBudget(max_tokens=250),
+    )
+
+    estimate = preflight.check([click("a"), click("b")])
+    assert (estimate.model_calls, estimate.tokens, estimate.duration) == (2, 200, 4)
+
+    with pytest.raises(BudgetExceeded) as error:
+        preflight.check([click("a"), click("b"), click("c")])
+    assert error.value.reason == "preflight: estimated 300 tokens of 250"
+
+    with pytest.raises(InvalidScenario) as invalid:
+        preflight.check([ActionInfo(data="sideways", type=ActionType.SWIPE_SCREEN)])
+    assert str(invalid.value) == "step 0: invalid swipe direction 'sideways'"
@@ -0,0 +1,46 @@
+from langchain_core.prompts import PromptTemplate
+
+from explorer.prompt_cache import PromptCache, cached_messages, split_prompt
+
+# mypy: ignore-errors
+
+TEMPLATE = PromptTemplate.from_template(
+    'Instructions\n{hierarchy}\nTarget: "{screen_element}"?\n'
+)
+
+
+def test_split_prompt_keeps_request_out_of_prefix() -> None:
+    first = split_prompt(
+        TEMPLATE, {"hierarchy": "<h/>", "screen_element": "Login"}, "screen_element"
+    )
+    second = split_prompt(
+        TEMPLATE, {"hierarchy": "<h/>", "screen_element": "Logout"}, "screen_element"
+    )
+
+    assert first == ('Instructions\n<h/>\nTarget: "', 'Login"?\n')
+    assert first[0] == second[0]
+
+
+def test_anthropic_marks_prefix_block() -> None:
+    values = {"hierarchy": "<h/>", "screen_element": "Login"}
+    messages, kwargs = cached_messages(
+        TEMPLATE, values, "screen_element", PromptCache.ANTHROPIC
+    )
+
+    prefix, request = messages[0].content
+    assert prefix["cache_control"] == {"type": "ephemeral"}
+    assert request == {"type": "text", "text": 'Login"?\n'}
+    assert kwargs == {}
+
+
+def test_openai_uses_prefix_cache_key() -> None:
+    keys = set()
+    for element in ("Login", "Logout"):
+        values = {"hierarchy": "<h/>", "screen_element": element}
+        messages, kwargs = cached_messages(
+            TEMPLATE, values, "screen_element", PromptCache.OPENAI
+        )
+        keys.add(kwargs["extra_body"]["prompt_cache_key"])
+        assert "cache_control" not in messages[0].content[0]
+
+    assert len(keys) == 1
@@ -3,6 +3,7 @@ from typing import cast
 import pytest
 from langchain_core.language_models import BaseChatModel
 
+from explorer.budget import BudgetExceeded, ResolutionBudget
 from explorer.models import (
     ActionFrame,
     ActionInfo,
@@ -11,6 +12,7 @@ from explorer.models import (
     ExecutionStatus,
     Scenario,
 )
+from explorer.preflight import InvalidScenario, Preflight
 from explorer.scenario_explorer import ExplorerState, ScenarioExplorer
 
 # mypy: ignore-errors
@@ -37,6 +39,9 @@ class FakeDevice:
         self.swiped_elements: list[tuple[str, str]] = []
         self.swiped_screen: list[tuple[int, int, int, int]] = []
         self._size = (1080, 1920)
+        self.clicked_points: list[tuple[int, int]] = []
+        self.activity = ".Main"
+        self.exists = True
 
     def xpath(self, xpath: str) -> "FakeSelector":
         from uiautomator2 import XPathElementNotFoundError  # type: ignore[import-untyped]  # isort: skip
@@ -60,16 +65,27 @@ class FakeDevice:
     def stop_uiautomator(self) -> None:
         self.stopped = True
 
+    def click(self, x: int, y: int) -> None:
+        self.clicked_points.append((x, y))
+
+    def app_current(self) -> dict[str, str]:
+        return {"package": "com.app", "activity": self.activity}
+
+    def __call__(self, focused: bool) -> "FakeDevice":
+        return self
+
 
 class FakeNavigator:
     def __init__(
-        self, model: object, device: FakeDevice
+        self, model: object, device: FakeDevice, **kwargs: object
     ) -> None:  # noqa: D401 - unused
         self.full_hierarchy = "<hierarchy/>"
 
     def find_element_info(self, request: str) -> dict[str, object]:
         if request == "missing":
             raise LookupError()
+        if request == "expensive":
+            raise BudgetExceeded("step budget: 5 xpath retries")
         return {"element": {"xpath": f"//{request}"}}
 
 
@@ -119,11 +135,14 @@ def test_explore(monkeypatch: pytest.MonkeyPatch) -> None:
     assert trace[3].action.status == ExecutionStatus.PENDING
     assert trace[4].action.status == ExecutionStatus.PENDING
     assert trace[5].action.status == ExecutionStatus.PENDING
+    assert trace[0].metrics and trace[0].metrics.device_calls == 1
+    assert trace[1].metrics and trace[1].metrics.spans[0].name == "device.press"
+    assert trace[3].metrics is None
 
 
 class NoCallNavigator:
     def __init__(
-        self, model: object, device: FakeDevice
+        self, model: object, device: FakeDevice, **kwargs: object
     ) -> None:  # noqa: D401 - unused
         pass
 
@@ -163,6 +182,22 @@ def test_swipe_actions(monkeypatch: pytest.MonkeyPatch) -> None:
     assert trace[1].screen and trace[1].screen.hierarchy == "<hierarchy/>"
 
 
+def test_shared_device_is_kept_running(monkeypatch: pytest.MonkeyPatch) -> None:
+    device = FakeDevice()
+    monkeypatch.setattr("explorer.scenario_explorer.ElementNavigator", FakeNavigator)
+
+    explorer = ScenarioExplorer(
+        model=cast(BaseChatModel, object()),
+        device_factory=lambda: device,
+        stop_device=False,
+    )
+    for _ in range(2):
+        explorer.explore([ActionInfo(data="back", type=ActionType.PRESS_KEY)])
+
+    assert device.pressed == ["back", "back"]
+    assert not device.stopped
+
+
 def test_run_trace(monkeypatch: pytest.MonkeyPatch) -> None:
     device = FakeDevice()
     monkeypatch.setattr(
@@ -221,3 +256,142 @@ def test_run_trace(monkeypatch: pytest.MonkeyPatch) -> None:
     margin = 100
     assert device.swiped_screen == [(width // 2, margin, width // 2, height - margin)]
     assert result[0].action.status == ExecutionStatus.EXECUTED
+
+
+def test_budget_exhaustion_is_reported(monkeypatch: pytest.MonkeyPatch) -> None:
+    device = FakeDevice()
+    monkeypatch.setattr(
+        "explorer.scenario_explorer.uiautomator2.connect", lambda: device
+    )
+    monkeypatch.setattr("explorer.scenario_explorer.ElementNavigator", FakeNavigator)
+
+    explorer = ScenarioExplorer(model=cast(BaseChatModel, object()))
+    trace = explorer.explore(
+        [
+            ActionInfo(
+                element=ElementInfo(description="expensive"), type=ActionType.CLICK
+            ),
+            ActionInfo(data="home", type=ActionType.PRESS_KEY),
+        ]
+    )
+
+    assert trace[0].error and trace[0].error.type == "BudgetExceededError"
+    assert trace[0].error.message == "step budget: 5 xpath retries"
+    assert trace[0].action.status == ExecutionStatus.BROKEN
+    assert trace[1].action.status == ExecutionStatus.PENDING
+
+
+BOUNDS_HIERARCHY = """<?xml version='1.0' encoding='UTF-8'?>
+<hierarchy>
+    <node index='0' class='android.widget.Button' resource-id='btn' bounds='[0,0][100,50]' visible-to-user='true'/>
+    <node index='1' class='android.widget.EditText' resource-id='input' bounds='[0,100][200,150]' visible-to-user='true'/>
+</hierarchy>"""
+
+
+class BoundsNavigator(FakeNavigator):
+    def __init__(self, model: object, device: FakeDevice, **kwargs: object) -> None:
+        self.full_hierarchy = BOUNDS_HIERARCHY
+
+    def find_element_info(self, request: str) -> dict[str, object]:
+        return {"element": {"xpath": f"//*[@resource-id='{request}']"}}
+
+
+def test_act_on_bounds(monkeypatch: pytest.MonkeyPatch) -> None:
+    device = FakeDevice()
+    device.exists = False
+    monkeypatch.setattr("explorer.scenario_explorer.ElementNavigator", BoundsNavigator)
+
+    explorer = ScenarioExplorer(
+        model=cast(BaseChatModel, object()),
+        device_factory=lambda: device,
+        input_delay=0,
+        act_on_bounds=True,
+    )
+    trace = explorer.explore(
+        [
+            ActionInfo(element=ElementInfo(description="btn"), type=ActionType.CLICK),
+            ActionInfo(
+                element=ElementInfo(description="input"),
+                data="hello",
+                type=ActionType.TEXT_INPUT,
+            ),
+        ]
+    )
+
+    assert trace[0].screen and trace[0].screen.fingerprint == "com.app/.Main"
+    # The unfocused text field falls back to the xpath selector
+    assert device.clicked_points == [(50, 25), (100, 125)]
+    assert device.clicked == ["//*[@resource-id='input']"]
+    assert device.sent_keys == ["hello"]
+
+    device.clicked_points.clear()
+    device.clicked.clear()
+    explorer.run_trace(trace[:1])
+    assert device.clicked_points == [(50, 25)]
+
+    device.activity = ".Other"
+    explorer.run_trace(trace[:1])
+    assert device.clicked_points == [(50, 25)]
+    assert device.clicked == ["//*[@resource-id='btn']"]
+
+
+def test_drifted_coordinate_replay_falls_back_to_navigator(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    resolved: list[str] = []
+
+    class CountingNavigator(BoundsNavigator):
+        def find_element_info(self, request: str) -> dict[str, object]:
+            resolved.append(request)
+            return super().find_element_info(request)
+
+    device = FakeDevice()
+    monkeypatch.setattr(
+        "explorer.scenario_explorer.ElementNavigator", CountingNavigator
+    )
+    explorer = ScenarioExplorer(
+        model=cast(BaseChatModel, object()),
+        device_factory=lambda: device,
+        input_delay=0,
+        act_on_bounds=True,
+    )
+    trace = explorer.explore(
+        [
+            ActionInfo(element=ElementInfo(description=name), type=ActionType.CLICK)
+            for name in ("btn", "input")
+        ]
+    )
+    assert resolved == ["btn", "input"]
+
+    explorer.run_trace(trace)
+    assert resolved == ["btn", "input"]
+
+    # The first replayed click opens another activity than recorded.
+    click = device.click
+    device.click = lambda x, y: (click(x, y), setattr(device, "activity", ".Other"))
+    replayed = explorer.run_trace(trace)
+
+    assert resolved == ["btn", "input", "input"]
+    assert replayed[1].action.status is ExecutionStatus.EXECUTED
+    assert replayed[1].screen.fingerprint == "com.app/.Other"
+
+
+def test_preflight_rejects_scenario_before_connecting() -> None:
+    def connect():
+        raise AssertionError("device connected")
+
+    explorer = ScenarioExplorer(
+        model=cast(BaseChatModel, object()),
+        device_factory=connect,
+        preflight=Preflight(budget=ResolutionBudget(max_model_calls=1)),
+    )
+
+    with pytest.raises(InvalidScenario):
+        explorer.explore([ActionInfo(data="escape", type=ActionType.PRESS_KEY)])
+    with pytest.raises(BudgetExceeded):
+        explorer.explore(
+            [
+                ActionInfo(element=ElementInfo(description=name), type=ActionType.CLICK)
+                for name in ("a", "b")
+            ]
+        )
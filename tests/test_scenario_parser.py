@@ -2,7 +2,9 @@ from typing import Any
 
 import pytest
 
+from explorer.model_cascade import ModelCascade
 from explorer.models import ActionInfo, ActionType, ElementInfo, Scenario
+from explorer.prompt_cache import PromptCache
 from explorer.scenario_parser import ScenarioParser
 
 # mypy: ignore-errors
@@ -19,9 +21,11 @@ class FakeResponse:
 class FakeModel:
     def __init__(self) -> None:
         self.last_request: Any | None = None
+        self.last_kwargs: dict[str, Any] = {}
 
-    def invoke(self, request: Any) -> FakeResponse:
+    def invoke(self, request: Any, **kwargs: Any) -> FakeResponse:
         self.last_request = request
+        self.last_kwargs = kwargs
         return FakeResponse("response")
 
 
@@ -72,3 +76,123 @@ def test_parse(monkeypatch: pytest.MonkeyPatch) -> None:
 
     assert model.last_request == "prompt"
     assert result == scenario
+
+
+def test_parse_with_prompt_cache(monkeypatch: pytest.MonkeyPatch) -> None:
+    scenario = Scenario(actions=[ActionInfo(data="back", type=ActionType.PRESS_KEY)])
+    monkeypatch.setattr(
+        "explorer.scenario_parser.PydanticOutputParser",
+        lambda pydantic_object: FakeParser(scenario),
+    )
+
+    model = FakeModel()
+    parser = ScenarioParser(model, prompt_cache=PromptCache.OPENAI)
+    result = parser.parse("return to the previous screen")
+
+    prefix, request = model.last_request[0].content
+    assert prefix["text"].rstrip().endswith("Scenario:")
+    assert "instructions" in prefix["text"]
+    assert request["text"].startswith("return to the previous screen")
+    assert "prompt_cache_key" in model.last_kwargs["extra_body"]
+    assert result == scenario
+
+
+def test_rules_can_be_disabled(monkeypatch: pytest.MonkeyPatch) -> None:
+    scenario = Scenario(actions=[ActionInfo(data="back", type=ActionType.PRESS_KEY)])
+    monkeypatch.setattr(
+        "explorer.scenario_parser.PydanticOutputParser",
+        lambda pydantic_object: FakeParser(scenario),
+    )
+
+    model = FakeModel()
+    result = ScenarioParser(model, rules=False).parse("press back")
+
+    assert model.last_request is not None
+    assert result == scenario
+
+
+def test_parse_with_cascade_escalates_on_bad_output() -> None:
+    class AnswerModel(FakeModel):
+        def __init__(self, answer: str) -> None:
+            super().__init__()
+            self.answer = answer
+
+        def invoke(self, request: Any, **kwargs: Any) -> FakeResponse:
+            super().invoke(request, **kwargs)
+            return FakeResponse(self.answer)
+
+    cheap = AnswerModel("no json here")
+    big = AnswerModel('{"actions": [{"data": "back", "type": "press_key"}]}')
+    cascade = ModelCascade([cheap, big], names=["cheap", "big"])
+
+    result = ScenarioParser(cascade).parse("return to the previous screen")
+
+    assert result.actions[0].data == "back"
+    assert cascade.stats()["cheap"]["successes"] == 0
+    assert cascade.stats()["big"]["successes"] == 1
+
+
+def test_parse_simple_lines_without_model() -> None:
+    model = FakeModel()
+
+    result = ScenarioParser(model).parse(
+        "1. Tap Settings\n2. type 'bob' into the name field\n3. press back"
+    )
+
+    assert model.last_request is None
+    assert [action.type for action in result.actions] == [
+        ActionType.CLICK,
+        ActionType.TEXT_INPUT,
+        ActionType.PRESS_KEY,
+    ]
+    assert result.actions[1].data == "bob"
+
+
+def test_parse_sends_unmatched_segments_in_one_request() -> None:
+    class SegmentsModel(FakeModel):
+        def invoke(self, request: Any, **kwargs: Any) -> FakeResponse:
+            super().invoke(request, **kwargs)
+            return FakeResponse(
+                '{"segments": ['
+                '{"actions": [{"element": {"description": "login"}, "type": "click"}]},'
+                '{"actions": [{"data": "down", "type": "swipe_screen"}]}'
+                "]}"
+            )
+
+    model = SegmentsModel()
+    result = ScenarioParser(model).parse(
+        "Tap Settings\nlog in as the admin\npress back\n"
+        "scroll until the footer is visible"
+    )
+
+    prompt = model.last_request.to_string()
+    assert "Segment 1:\nlog in as the admin" in prompt
+    assert "Segment 2:\nscroll until the footer is visible" in prompt
+    assert "Tap Settings" not in prompt
+    assert [action.type for action in result.actions] == [
+        ActionType.CLICK,
+        ActionType.CLICK,
+        ActionType.PRESS_KEY,
+        ActionType.SWIPE_SCREEN,
+    ]
+    assert result.actions[1].element.description == "login"
+
+
+def test_parse_falls_back_when_segment_count_differs() -> None:
+    class CountingModel(FakeModel):
+        def __init__(self) -> None:
+            super().__init__()
+            self.calls = 0
+
+        def invoke(self, request: Any, **kwargs: Any) -> FakeResponse:
+            super().invoke(request, **kwargs)
+            self.calls += 1
+            if self.calls == 1:
+                return FakeResponse('{"segments": []}')
+            return FakeResponse('{"actions": [{"data": "back", "type": "press_key"}]}')
+
+    model = CountingModel()
+    result = ScenarioParser(model).parse("press back\ngo to the start")
+
+    assert model.calls == 2
+    assert result.actions[0].data == "back"
@@ -0,0 +1,93 @@
+import pytest
+
+from explorer.models import ActionType
+from explorer.scenario_rules import parse_line, scenario_lines
+
+# mypy: ignore-errors
+
+
+def test_scenario_lines_strip_markers() -> None:
+    text = "1. Tap Login\n\n- press back\n  2) swipe up\n"
+
+    assert scenario_lines(text) == ["Tap Login", "press back", "swipe up"]
+
+
+@pytest.mark.parametrize(
+    "line, key",
+    [
+        ("press back", "back"),
+        ("Press the Home button.", "home"),
+        ("go back", "back"),
+        ("hit volume up", "volume_up"),
+        ("press the menu key", "menu"),
+    ],
+)
+def test_parse_key_presses(line: str, key: str) -> None:
+    (action,) = parse_line(line)
+
+    assert action.type is ActionType.PRESS_KEY
+    assert action.data == key
+
+
+def test_parse_key_like_button_is_a_click() -> None:
+    (action,) = parse_line("press menu")
+
+    assert action.type is ActionType.CLICK
+    assert action.element.description == "menu"
+
+
+def test_parse_swipes() -> None:
+    (screen,) = parse_line("swipe up")
+    (element,) = parse_line("swipe the banner left")
+    (inside,) = parse_line("swipe down on the news feed")
+
+    assert (screen.type, screen.data) == (ActionType.SWIPE_SCREEN, "up")
+    assert (element.type, element.data) == (ActionType.SWIPE_ELEMENT, "left")
+    assert element.element.description == "banner"
+    assert inside.element.description == "news feed"
+
+
+def test_parse_text_input() -> None:
+    (typed,) = parse_line('Type "hello world" into the search field')
+    (filled,) = parse_line("fill password with 'secret'")
+
+    assert (typed.type, typed.data) == (ActionType.TEXT_INPUT, "hello world")
+    assert typed.element.description == "search field"
+    assert (filled.element.description, filled.data) == ("password", "secret")
+
+
+def test_parse_click() -> None:
+    (action,) = parse_line("Tap on the Sign in button")
+
+    assert action.type is ActionType.CLICK
+    assert action.element.description == "Sign in button"
+
+
+@pytest.mark.parametrize(
+    "line",
+    [
+        "log in as the admin",
+        "tap Save and then close the dialog",
+        "click 'OK', wait",
+        "type hello into search",
+        "scroll down until the footer",
+        "press back twice if the dialog is open",
+        "Press back. Swipe up.",
+        "Click OK to save. Go back",
+        "Click OK to save",
+        "Tap Next 3 times",
+        "press back twice",
+        "Click Settings > Network",
+        "tap Settings, Network",
+        "Type 'bob' into the name field. Press enter",
+    ],
+)
+def test_parse_leaves_complex_lines_to_the_model(line: str) -> None:
+    assert parse_line(line) is None
+
+
+def test_parse_keeps_sentence_punctuation_inside_quotes() -> None:
+    (action,) = parse_line("type 'Hi. Bye!' into the message field.")
+
+    assert (action.type, action.data) == (ActionType.TEXT_INPUT, "Hi. Bye!")
+    assert action.element.description == "message field"
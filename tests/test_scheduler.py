@@ -0,0 +1,188 @@
+from typing import TYPE_CHECKING, cast
+
+import pytest
+from langchain_core.language_models import BaseChatModel
+
+from explorer.models import ActionInfo, ActionType, ElementInfo, ExecutionStatus
+from explorer.scenario_explorer import ScenarioExplorer
+from explorer.scheduler import (
+    EmulatorSnapshots,
+    PrefixScheduler,
+    historical_durations,
+    lpt_order,
+    shard,
+)
+
+if TYPE_CHECKING:
+    from conftest import FakeDevice, Resolver
+
+# mypy: ignore-errors
+
+
+def clicks(*descriptions: str) -> list[ActionInfo]:
+    return [
+        ActionInfo(element=ElementInfo(description=description), type=ActionType.CLICK)
+        for description in descriptions
+    ]
+
+
+SCENARIOS = {
+    "wifi": clicks("menu", "settings", "wifi"),
+    "search": clicks("search"),
+    "bluetooth": clicks("menu", "settings", "bluetooth"),
+}
+
+
+class FakeSnapshots:
+    def __init__(self) -> None:
+        self.saved: list[str] = []
+        self.restored: list[str] = []
+
+    def save(self, key: str) -> None:
+        self.saved.append(key)
+
+    def restore(self, key: str) -> bool:
+        self.restored.append(key)
+        return key in self.saved
+
+
+def make_explorer(device: object) -> ScenarioExplorer:
+    return ScenarioExplorer(
+        model=cast(BaseChatModel, object()),
+        device_factory=lambda: device,
+        stop_device=False,
+    )
+
+
+def test_scenarios_sharing_a_prefix_run_back_to_back() -> None:
+    assert PrefixScheduler.order(SCENARIOS) == ["wifi", "bluetooth", "search"]
+
+
+def test_shared_prefix_is_resolved_once(
+    resolver: "Resolver", make_device: "type[FakeDevice]"
+) -> None:
+    device = make_device()
+    resets = []
+    scheduler = PrefixScheduler(make_explorer(device), reset=lambda: resets.append(1))
+
+    traces = scheduler.run(SCENARIOS)
+
+    assert resolver.resolved == ["menu", "settings", "wifi", "bluetooth", "search"]
+    assert device.clicked == [
+        "//menu",
+        "//settings",
+        "//wifi",
+        "//menu",
+        "//settings",
+        "//bluetooth",
+        "//search",
+    ]
+    assert len(resets) == 3
+    assert [frame.action.element.xpath for frame in traces["bluetooth"]] == [
+        "//menu",
+        "//settings",
+        "//bluetooth",
+    ]
+    assert all(
+        frame.action.status is ExecutionStatus.EXECUTED
+        for trace in traces.values()
+        for frame in trace
+    )
+
+
+def test_branch_point_is_restored_instead_of_replayed(
+    resolver: "Resolver", make_device: "type[FakeDevice]"
+) -> None:
+    device = make_device()
+    resets = []
+    snapshots = FakeSnapshots()
+    scheduler = PrefixScheduler(
+        make_explorer(device), reset=lambda: resets.append(1), snapshots=snapshots
+    )
+
+    scheduler.run(SCENARIOS)
+
+    assert device.clicked == [
+        "//menu",
+        "//settings",
+        "//wifi",
+        "//bluetooth",
+        "//search",
+    ]
+    assert len(snapshots.saved) == 1
+    assert len(resets) == 2
+
+
+def test_empty_scenario_runs_nothing(
+    resolver: "Resolver", make_device: "type[FakeDevice]"
+) -> None:
+    device = make_device()
+    resets = []
+    scheduler = PrefixScheduler(make_explorer(device), reset=lambda: resets.append(1))
+
+    traces = scheduler.run({"empty": [], "search": clicks("search")})
+
+    assert traces["empty"] == []
+    assert device.clicked == ["//search"]
+    assert len(resets) == 1
+
+
+def test_emulator_snapshots_use_adb() -> None:
+    commands = []
+
+    class Result:
+        returncode = 0
+        stdout = "OK"
+
+    def run(command, **kwargs):
+        commands.append(command)
+        return Result()
+
+    snapshots = EmulatorSnapshots("emulator-5554", run=run)
+    assert not snapshots.restore("abc")
+    snapshots.save("abc")
+    assert snapshots.restore("abc")
+    assert commands[-1] == [
+        "adb",
+        "-s",
+        "emulator-5554",
+        "emu",
+        "avd",
+        "snapshot",
+        "load",
+        "explorer-abc",
+    ]
+
+
+def test_historical_durations_use_median_of_runs() -> None:
+    records = [
+        {"scenario": "a", "duration": 10.0},
+        {"scenario": "a", "duration": 30.0},
+        {"scenario": "a", "duration": 12.0},
+        {"scenario": "b", "trace": [{"metrics": {"duration": 2.5}}, {"metrics": None}]},
+        {"scenario": "c", "error": "ConnectionError", "trace": []},
+    ]
+    assert historical_durations(records) == {"a": 12.0, "b": 2.5}
+
+
+def test_longest_scenarios_start_first() -> None:
+    durations = {"short": 1.0, "long": 60.0, "medium": 5.0}
+    assert lpt_order(["short", "new", "long", "medium"], durations) == [
+        "long",
+        "medium",
+        "new",
+        "short",
+    ]
+
+
+def test_shards_are_balanced_and_deterministic() -> None:
+    durations = {"a": 50.0, "b": 40.0, "c": 30.0, "d": 20.0, "e": 10.0, "f": 10.0}
+    names = list(durations)
+    shards = [shard(names, durations, 2, index) for index in range(2)]
+
+    assert sorted(shards[0] + shards[1]) == sorted(names)
+    loads = [sum(durations[name] for name in part) for part in shards]
+    assert loads == [80.0, 80.0]
+    assert shards == [shard(reversed(names), durations, 2, index) for index in range(2)]
+    with pytest.raises(ValueError):
+        shard(names, durations, 2, 2)
@@ -0,0 +1,193 @@
+from typing import TYPE_CHECKING, Any, Callable, cast
+
+import pytest
+from langchain_core.language_models import BaseChatModel
+
+from explorer.models import (
+    ActionFrame,
+    ActionInfo,
+    ActionType,
+    ElementInfo,
+    ExecutionStatus,
+    ScreenInfo,
+)
+from explorer.scenario_explorer import ScenarioExplorer
+from explorer.screen_graph import ScreenGraph
+
+if TYPE_CHECKING:
+    from conftest import FakeDevice, Resolver
+
+# mypy: ignore-errors
+
+
+def click(description: str, xpath: str | None = None) -> ActionInfo:
+    return ActionInfo(
+        element=ElementInfo(description=description, xpath=xpath),
+        type=ActionType.CLICK,
+    )
+
+
+def layout(screen: str) -> str:
+    return (
+        f'<hierarchy><node class="android.widget.FrameLayout" resource-id="{screen}"'
+        ' package="app"><node class="android.widget.TextView" resource-id=""'
+        ' package="com.android.systemui" text="12:00"/></node></hierarchy>'
+    )
+
+
+def recorded(*steps: tuple[str, str]) -> list[ActionFrame]:
+    trace = []
+    for screen, description in steps:
+        action = click(description, f"//{description}")
+        action.status = ExecutionStatus.EXECUTED
+        trace.append(
+            ActionFrame(
+                screen=ScreenInfo(
+                    name=screen, description="", hierarchy=layout(screen)
+                ),
+                action=action,
+                error=None,
+            )
+        )
+    return trace
+
+
+GRAPH = ScreenGraph.from_traces(
+    [
+        recorded(("Main", "menu"), ("Menu", "settings"), ("Settings", "wifi")),
+        recorded(("Main", "menu"), ("Menu", "about")),
+        recorded(("Main", "search"), ("Search", "back"), ("Main", "menu")),
+    ]
+)
+
+
+def test_shortest_path_and_prefix_match() -> None:
+    assert GRAPH.start == "main"
+    path = GRAPH.path("main", "settings")
+    assert [transition.target for transition in path] == ["menu", "settings"]
+    assert GRAPH.path("settings", "main") is None
+
+    scenario = [click("menu"), click("settings"), click("bluetooth")]
+    matched = GRAPH.match_prefix(scenario)
+    assert [transition.target for transition in matched] == ["menu", "settings"]
+
+
+def make_explorer(device: "FakeDevice") -> ScenarioExplorer:
+    return ScenarioExplorer(
+        model=cast(BaseChatModel, object()),
+        device_factory=lambda: device,
+        screen_graph=GRAPH,
+    )
+
+
+@pytest.fixture()
+def app(
+    resolver: "Resolver", make_device: "type[FakeDevice]"
+) -> "Callable[..., FakeDevice]":
+    """Return a factory of devices moving between the screens of :data:`GRAPH`."""
+
+    resolver.xpath_prefix = "//new-"
+
+    def device(
+        screen: str = "Main", targets: dict[str, str] | None = None, **kwargs: Any
+    ) -> "FakeDevice":
+        targets = targets or {"//menu": "Menu", "//settings": "Settings"}
+        return make_device(
+            hierarchy=layout(screen),
+            targets={xpath: layout(target) for xpath, target in targets.items()},
+            **kwargs,
+        )
+
+    return device
+
+
+def test_known_prefix_is_replayed_without_resolution(
+    resolver: "Resolver", app: "Callable[..., FakeDevice]"
+) -> None:
+    device = app()
+    trace = make_explorer(device).explore(
+        [click("menu"), click("settings"), click("bluetooth")]
+    )
+
+    assert resolver.resolved == ["bluetooth"]
+    assert device.clicked == ["//menu", "//settings", "//new-bluetooth"]
+    assert trace[1].screen.name == "Menu"
+    assert all(frame.action.status is ExecutionStatus.EXECUTED for frame in trace)
+
+
+def test_stale_prefix_falls_back_to_resolution(
+    resolver: "Resolver", app: "Callable[..., FakeDevice]"
+) -> None:
+    device = app(missing={"//settings"})
+    make_explorer(device).explore(
+        [click("menu"), click("settings"), click("bluetooth")]
+    )
+
+    assert resolver.resolved == ["settings", "bluetooth"]
+    assert device.clicked == ["//menu", "//new-settings", "//new-bluetooth"]
+
+
+def test_prefix_stops_when_a_hop_leaves_the_recorded_path(
+    resolver: "Resolver", app: "Callable[..., FakeDevice]"
+) -> None:
+    device = app(targets={"//menu": "Search"})
+    trace = make_explorer(device).explore(
+        [click("menu"), click("settings"), click("bluetooth")]
+    )
+
+    assert resolver.resolved == ["settings", "bluetooth"]
+    assert device.clicked == ["//menu", "//new-settings", "//new-bluetooth"]
+    assert trace[0].screen.name == "Main"
+    assert 'resource-id="Main"' in trace[0].screen.hierarchy
+
+
+def test_prefix_is_not_replayed_from_another_screen(
+    resolver: "Resolver", app: "Callable[..., FakeDevice]"
+) -> None:
+    device = app("Search")
+    make_explorer(device).explore([click("menu"), click("settings")])
+
+    assert resolver.resolved == ["menu", "settings"]
+
+
+def test_navigate_to_replays_the_shortest_path(
+    resolver: "Resolver", app: "Callable[..., FakeDevice]"
+) -> None:
+    device = app()
+    trace = make_explorer(device).navigate_to("settings")
+
+    assert resolver.resolved == []
+    assert device.clicked == ["//menu", "//settings"]
+    assert len(trace) == 2
+    with pytest.raises(LookupError):
+        make_explorer(device).navigate_to("nowhere")
+
+
+def test_navigate_to_normalizes_screen_names(app: "Callable[..., FakeDevice]") -> None:
+    device = app()
+    trace = make_explorer(device).navigate_to("Settings", source="  MAIN ")
+
+    assert device.clicked == ["//menu", "//settings"]
+    assert len(trace) == 2
+
+
+def test_navigate_to_the_current_screen_does_nothing(
+    app: "Callable[..., FakeDevice]",
+) -> None:
+    device = app()
+
+    assert make_explorer(device).navigate_to("Main") == []
+    assert device.clicked == []
+    assert make_explorer(device).run_trace([]) == []
+
+
+def test_graph_from_trace_repository() -> None:
+    from explorer.trace_store import TraceRepository
+
+    with TraceRepository() as repository:
+        repository.add_trace(
+            recorded(("Main", "menu"), ("Menu", "settings"), ("Settings", "wifi"))
+        )
+        graph = ScreenGraph.from_repository(repository)
+
+    assert len(graph.path("main", "settings")) == 2
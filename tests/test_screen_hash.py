@@ -0,0 +1,141 @@
+from typing import TYPE_CHECKING, cast
+
+from langchain_core.language_models import BaseChatModel
+from PIL import Image, ImageDraw
+
+from explorer.benchmark import ScriptedChatModel
+from explorer.budget import ResolutionBudget
+from explorer.element_navigator import ElementNavigator
+from explorer.hierarchy_dump import DumpStrategy
+from explorer.models import ActionInfo, ActionType, ElementInfo
+from explorer.scenario_explorer import ScenarioExplorer
+from explorer.screen_hash import ScreenChangeDetector, dhash, hash_distance
+
+if TYPE_CHECKING:
+    from conftest import FakeDevice, Resolver
+
+# mypy: ignore-errors
+
+
+def screen(button: bool = False) -> Image.Image:
+    image = Image.new("RGB", (1080, 1920), "white")
+    draw = ImageDraw.Draw(image)
+    draw.rectangle((0, 0, 1080, 200), fill="navy")
+    if button:
+        draw.rectangle((200, 800, 880, 1100), fill="black")
+    return image
+
+
+class FakeDevice:
+    def __init__(self) -> None:
+        self.image = screen()
+        self.hierarchy = "<hierarchy package='com.app'/>"
+        self.dumps = 0
+        self.screenshots = 0
+
+    def screenshot(self) -> Image.Image:
+        self.screenshots += 1
+        return self.image
+
+    def dump_hierarchy(self, **kwargs: object) -> str:
+        self.dumps += 1
+        return self.hierarchy
+
+
+def test_dhash_ignores_noise_but_not_layout_changes() -> None:
+    plain = dhash(screen())
+    assert len(plain) == 64
+    assert dhash(screen().resize((540, 960))) == plain
+    assert hash_distance(plain, dhash(screen(button=True))) > 0
+
+
+def test_unchanged_screen_reuses_the_last_dump() -> None:
+    device = FakeDevice()
+    strategy = DumpStrategy(change_detector=ScreenChangeDetector())
+
+    first = strategy.dump(device)
+    strategy.invalidate()
+    assert strategy.dump(device) == first
+    assert device.dumps == 1
+
+    device.image = screen(button=True)
+    device.hierarchy = "<hierarchy package='com.app'><node/></hierarchy>"
+    strategy.invalidate()
+    assert strategy.dump(device) == device.hierarchy
+    assert device.dumps == 2
+    assert strategy.last_hash == dhash(device.image)
+    assert strategy.profiles["com.app"].reused == 1
+
+
+def test_wait_settled_returns_once_two_screenshots_match() -> None:
+    device = FakeDevice()
+    frames = iter([screen(), screen(button=True), screen(button=True)])
+    device.screenshot = lambda: next(frames)
+    now = [0.0]
+
+    def sleep(seconds: float) -> None:
+        now[0] += seconds
+
+    detector = ScreenChangeDetector(clock=lambda: now[0], sleep=sleep)
+    assert detector.wait_settled(device, timeout=3, interval=0.5) == dhash(
+        screen(button=True)
+    )
+    assert now[0] == 1.0
+
+
+def test_presence_retry_dumps_despite_unchanged_hash() -> None:
+    device = FakeDevice()
+    button = (
+        "<hierarchy><node index='0' class='android.widget.Button' text='Go' "
+        "resource-id='go' bounds='[0,0][10,10]' visible-to-user='true'/></hierarchy>"
+    )
+    info = '{"screen": "", "screen_description": "", "name": "go", "xpath": "//*[@text=\'Go\']"}'
+
+    def responder(prompt: str) -> str:
+        if "YES or NO" in prompt:
+            if "resource_id='go'" in prompt:
+                return "YES"
+            # The button appears without a change visible in the hash.
+            device.hierarchy = button
+            return "NO"
+        return f"```json\n{info}\n```"
+
+    nav = ElementNavigator(
+        ScriptedChatModel(responder=responder),
+        device,
+        budget=ResolutionBudget(backoff_initial=0.0, backoff_max=0.0),
+        dump_strategy=DumpStrategy(change_detector=ScreenChangeDetector()),
+    )
+
+    result = nav.find_element_info("Go button")
+
+    assert result["element"]["xpath"] == "//*[@text='Go']"
+    assert device.dumps == 2
+
+
+def test_typed_text_is_dumped_despite_unchanged_hash(
+    resolver: "Resolver", make_device: "type[FakeDevice]"
+) -> None:
+    device = make_device(hierarchy="<hierarchy><node text=''/></hierarchy>")
+    device.screenshot = screen
+    device.send_keys = lambda text: setattr(
+        device, "hierarchy", f"<hierarchy><node text='{text}'/></hierarchy>"
+    )
+    explorer = ScenarioExplorer(
+        model=cast(BaseChatModel, object()),
+        device_factory=lambda: device,
+        dump_strategy=DumpStrategy(change_detector=ScreenChangeDetector()),
+        input_delay=0,
+    )
+    actions = [
+        ActionInfo(
+            element=ElementInfo(description="search"),
+            type=ActionType.TEXT_INPUT,
+            data="cats",
+        ),
+        ActionInfo(element=ElementInfo(description="submit"), type=ActionType.CLICK),
+    ]
+
+    trace = explorer.explore(actions)
+
+    assert "text='cats'" in trace[1].screen.hierarchy
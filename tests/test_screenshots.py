@@ -0,0 +1,177 @@
+import threading
+from pathlib import Path
+from typing import TYPE_CHECKING, cast
+
+import pytest
+from langchain_core.language_models import BaseChatModel
+from PIL import Image, ImageDraw
+
+from explorer.hierarchy_dump import DumpStrategy
+from explorer.models import ActionInfo, ActionType, ElementInfo
+from explorer.scenario_explorer import ScenarioExplorer
+from explorer.screen_hash import ScreenChangeDetector
+from explorer.screenshots import ScreenshotPipeline
+
+if TYPE_CHECKING:
+    from conftest import FakeDevice, Resolver
+
+# mypy: ignore-errors
+
+
+def screen(step: int) -> Image.Image:
+    image = Image.new("RGB", (1080, 1920), "white")
+    ImageDraw.Draw(image).rectangle(
+        (100 + 400 * step, 200, 500 + 400 * step, 900), "navy"
+    )
+    return image
+
+
+@pytest.fixture()
+def device(make_device: "type[FakeDevice]") -> "FakeDevice":
+    """Return a device showing :func:`screen` of its first or later steps."""
+
+    device = make_device()
+    device.screenshots = 0
+
+    def screenshot() -> Image.Image:
+        device.screenshots += 1
+        return screen(min(device.actions, 1))
+
+    device.screenshot = screenshot
+    return device
+
+
+def test_identical_frames_are_stored_once(tmp_path: Path, device: "FakeDevice") -> None:
+    pipeline = ScreenshotPipeline(tmp_path, format="jpeg", quality=50)
+
+    refs = [pipeline.submit(device).result() for _ in range(2)]
+    device.actions = 1
+    refs.append(pipeline.submit(device).result())
+    pipeline.close()
+
+    assert refs[0] == refs[1] != refs[2]
+    assert refs[0].endswith(".jpg")
+    assert sorted(path.name for path in tmp_path.iterdir()) == sorted(set(refs))
+    assert Image.open(tmp_path / refs[0]).width == 540
+    assert pipeline.stats.deduplicated == 1
+
+
+def test_small_changes_are_stored_separately(
+    tmp_path: Path, device: "FakeDevice"
+) -> None:
+    pipeline = ScreenshotPipeline(tmp_path)
+    first = pipeline.submit(device).result()
+
+    # A typed character: too small for a perceptual hash, a different image.
+    typed = screen(0)
+    ImageDraw.Draw(typed).rectangle((1000, 1800, 1003, 1803), "black")
+    device.screenshot = lambda: typed
+
+    assert pipeline.submit(device).result() != first
+    pipeline.close()
+
+
+def test_full_queue_drops_captures_instead_of_blocking(
+    tmp_path: Path, device: "FakeDevice"
+) -> None:
+    pipeline = ScreenshotPipeline(tmp_path, max_queue=1)
+    gate = threading.Event()
+    store = pipeline._store
+    pipeline._store = lambda image: gate.wait(5) and store(image)
+
+    futures = [pipeline.submit(device) for _ in range(4)]
+    assert futures[-1].result(timeout=1) is None
+    gate.set()
+    pipeline.close()
+
+    assert futures[0].result() is not None
+    assert pipeline.stats.dropped >= 2
+
+
+def test_frames_reference_the_screen_they_were_resolved_on(
+    resolver: "Resolver", device: "FakeDevice", tmp_path: Path
+) -> None:
+    pipeline = ScreenshotPipeline(tmp_path)
+    explorer = ScenarioExplorer(
+        model=cast(BaseChatModel, object()),
+        device_factory=lambda: device,
+        screenshots=pipeline,
+    )
+    actions = [
+        ActionInfo(element=ElementInfo(description=name), type=ActionType.CLICK)
+        for name in ("one", "two", "three")
+    ]
+
+    trace = explorer.explore(actions)
+    pipeline.close()
+
+    first, second, third = (frame.screen.image for frame in trace)
+    assert first != second == third
+    assert (tmp_path / first).exists()
+
+
+def test_screenshot_is_taken_before_the_next_action(
+    tmp_path: Path, device: "FakeDevice"
+) -> None:
+    pipeline = ScreenshotPipeline(tmp_path, max_queue=1)
+    gate = threading.Event()
+    store = pipeline._store
+    # A slow disk: storage lags behind the fast key presses.
+    pipeline._store = lambda image: gate.wait(5) and store(image)
+    explorer = ScenarioExplorer(
+        model=cast(BaseChatModel, object()),
+        device_factory=lambda: device,
+        screenshots=pipeline,
+    )
+    actions = [ActionInfo(data="back", type=ActionType.PRESS_KEY) for _ in range(2)]
+
+    threading.Timer(0.2, gate.set).start()
+    trace = explorer.explore(actions)
+    pipeline.close()
+
+    first, second = (frame.screen.image for frame in trace)
+    assert None not in (first, second) and first != second
+
+
+def test_screenshot_is_taken_in_the_background(
+    tmp_path: Path, device: "FakeDevice"
+) -> None:
+    release = threading.Event()
+    take = device.screenshot
+    device.screenshot = lambda: release.wait(5) and take()
+    pipeline = ScreenshotPipeline(tmp_path)
+
+    future = pipeline.submit(device)
+    waiter = threading.Thread(target=pipeline.wait_captured)
+    waiter.start()
+    waiter.join(0.1)
+    assert waiter.is_alive() and not future.done()
+
+    release.set()
+    waiter.join()
+    assert future.result() is not None
+    pipeline.close()
+
+
+def test_change_detector_screenshot_is_stored(
+    resolver: "Resolver", device: "FakeDevice", tmp_path: Path
+) -> None:
+    pipeline = ScreenshotPipeline(tmp_path)
+    explorer = ScenarioExplorer(
+        model=cast(BaseChatModel, object()),
+        device_factory=lambda: device,
+        screenshots=pipeline,
+        dump_strategy=DumpStrategy(change_detector=ScreenChangeDetector()),
+    )
+    actions = [
+        ActionInfo(element=ElementInfo(description=name), type=ActionType.CLICK)
+        for name in ("one", "two")
+    ]
+
+    trace = explorer.explore(actions)
+    pipeline.close()
+
+    # One screenshot per step, taken by the change detector before its dump.
+    assert device.screenshots == 2
+    first, second = (frame.screen.image for frame in trace)
+    assert None not in (first, second) and first != second
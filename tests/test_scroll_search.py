@@ -0,0 +1,83 @@
+from explorer.benchmark import ReplayDevice, ScriptedChatModel
+from explorer.budget import ResolutionBudget
+from explorer.element_navigator import ElementNavigator
+from explorer.scroll_search import (
+    ScrollSearch,
+    best_match,
+    relevance,
+    scrollable_containers,
+)
+
+# mypy: ignore-errors
+
+
+def screen(*labels: str) -> str:
+    items = "".join(
+        f"<node index='{i}' class='android.widget.TextView' text='{label}' "
+        f"resource-id='item' bounds='[0,{i * 100}][100,{i * 100 + 100}]' "
+        "visible-to-user='true'/>"
+        for i, label in enumerate(labels)
+    )
+    return (
+        "<hierarchy><node index='0' class='android.widget.ListView' "
+        "scrollable='true' bounds='[0,0][100,400]' visible-to-user='true'>"
+        f"{items}</node></hierarchy>"
+    )
+
+
+TOP = screen("Wi-Fi", "Bluetooth")
+MIDDLE = screen("Display", "Sound")
+BOTTOM = screen("About phone", "Notifications")
+
+
+def test_relevance_ignores_generic_words() -> None:
+    assert relevance("Notification settings button", {"text": "Notifications"}) == 0.5
+    assert relevance("About phone item", {"text": "About phone"}) == 1.0
+    assert relevance("Wi-Fi", {"resource-id": "com.app:id/wifiToggle"}) == 0.0
+    assert relevance("toggle", {"resource-id": "com.app:id/wifiToggle"}) == 1.0
+    assert best_match(BOTTOM, "About phone") == 1.0
+    assert scrollable_containers(TOP) == [(0, 0, 100, 400)]
+
+
+def test_search_stops_when_content_stops_changing() -> None:
+    screens = iter([MIDDLE, BOTTOM, BOTTOM])
+    swipes = []
+
+    match, last = ScrollSearch().search(
+        "Battery",
+        TOP,
+        lambda bounds, direction: swipes.append(direction),
+        lambda: next(screens),
+    )
+
+    assert match is None
+    assert last == BOTTOM
+    assert swipes == ["up", "up", "up"]
+
+
+def test_navigator_scrolls_to_element_below_the_fold() -> None:
+    prompts: list[str] = []
+
+    def responder(prompt: str) -> str:
+        prompts.append(prompt)
+        if "YES or NO" in prompt:
+            hierarchy = prompt.split("There is something")[0]
+            return "YES" if "About phone" in hierarchy else "NO"
+        return (
+            '```json\n{"screen": "Settings", "screen_description": "", '
+            '"name": "about", "xpath": "//*[@text=\'About phone\']"}\n```'
+        )
+
+    device = ReplayDevice([TOP, MIDDLE, BOTTOM])
+    nav = ElementNavigator(
+        ScriptedChatModel(responder=responder),
+        device,
+        budget=ResolutionBudget(backoff_initial=0.0, backoff_max=0.0),
+        scroll_search=ScrollSearch(),
+    )
+
+    info = nav.find_element_info("About phone")
+
+    assert info["element"]["name"] == "about"
+    assert device.calls["swipe"] == 2
+    assert len(prompts) == 3  # NO on the first screen, YES, element info
@@ -0,0 +1,88 @@
+import threading
+from typing import Any, Iterator
+
+from langchain_core.messages import AIMessageChunk
+from langchain_core.outputs import ChatGenerationChunk
+
+from explorer.benchmark import ReplayDevice, ScriptedChatModel
+from explorer.element_navigator import ElementNavigator
+from explorer.metrics import MetricsRecorder
+from explorer.streaming import IncrementalJsonFields
+
+# mypy: ignore-errors
+
+
+SCREEN = """<?xml version='1.0' encoding='UTF-8'?>
+<hierarchy>
+    <node index='0' class='android.widget.Button' text='Go' resource-id='go' bounds='[0,0][10,10]' visible-to-user='true'/>
+    <node index='1' class='android.widget.Button' text='Stop' resource-id='stop' bounds='[10,0][20,10]' visible-to-user='true'/>
+</hierarchy>"""
+
+EARLY = '```json\n{"xpath": "//*[@resource-id=\'go\']", "name": "go",'
+REST = ' "screen": "main", "screen_description": "Start screen"}\n```'
+
+
+def test_fields_complete_across_chunks() -> None:
+    parser = IncrementalJsonFields()
+    assert parser.feed('```json\n{"xpath": "//a[@text=\\"x') == {}
+    assert parser.feed('\\"]", "conf') == {"xpath": '//a[@text="x"]'}
+    assert parser.feed('idence": 0.8') == {}
+    assert parser.feed(', "name": "A"}') == {"confidence": 0.8, "name": "A"}
+    assert parser.fields == {"xpath": '//a[@text="x"]', "confidence": 0.8, "name": "A"}
+
+
+release = threading.Event()
+
+
+class StreamingModel(ScriptedChatModel):
+    """Streams the element info in small chunks, holding back the rest."""
+
+    def _stream(
+        self, messages: Any, stop: Any = None, run_manager: Any = None, **kwargs: Any
+    ) -> Iterator[ChatGenerationChunk]:
+        for start in range(0, len(EARLY), 7):
+            yield ChatGenerationChunk(message=AIMessageChunk(EARLY[start : start + 7]))
+        release.wait(5)
+        usage = {"input_tokens": 100, "output_tokens": 30, "total_tokens": 130}
+        yield ChatGenerationChunk(message=AIMessageChunk(REST, usage_metadata=usage))
+
+
+def test_element_is_returned_before_the_stream_ends() -> None:
+    release.clear()
+    model = StreamingModel(responder=lambda prompt: "YES")
+    metrics = MetricsRecorder()
+    nav = ElementNavigator(
+        model, ReplayDevice([SCREEN]), metrics=metrics, stream_output=True
+    )
+    metrics.start_step()
+
+    info = nav.find_element_info("Go button")
+
+    assert info["element"] == {"xpath": "//*[@resource-id='go']", "name": "go"}
+    # The xpath matched one node of the dumped hierarchy, no device query needed.
+    assert not any(
+        span.name.startswith("device.xpath") for span in metrics.current_step.spans
+    )
+
+    release.set()
+    rest = nav.complete_element_info()
+    assert rest["screen"] == "main"
+    assert rest["screen_description"] == "Start screen"
+    assert metrics.finish_step().output_tokens >= 30
+    assert nav.complete_element_info() == {}
+
+
+def test_leftover_stream_is_charged_to_its_own_step() -> None:
+    release.clear()
+    model = StreamingModel(responder=lambda prompt: "YES")
+    nav = ElementNavigator(model, ReplayDevice([SCREEN]), stream_output=True)
+    nav.find_element_info("Go button")
+    first = nav._tracker
+    tokens = first.tokens
+
+    release.set()
+    nav.find_element_info("Go button")
+
+    assert first.tokens == tokens + 130
+    assert nav._tracker is not first
+    nav.complete_element_info()
@@ -0,0 +1,115 @@
+import json
+from pathlib import Path
+from typing import TYPE_CHECKING, cast
+
+import pytest
+from langchain_core.language_models import BaseChatModel
+
+from explorer.models import (
+    ActionFrame,
+    ActionInfo,
+    ActionType,
+    ElementInfo,
+    ExecutionStatus,
+    ScreenInfo,
+)
+from explorer.scenario_explorer import ScenarioExplorer
+from explorer.trace_minimizer import (
+    main,
+    minimize_trace,
+    screen_state,
+    verify_minimized,
+)
+
+if TYPE_CHECKING:
+    from conftest import FakeDevice
+
+# mypy: ignore-errors
+
+
+def hierarchy(title: str, clock: str = "12:00") -> str:
+    return (
+        "<hierarchy>"
+        f"<node package='com.android.systemui' text='{clock}'/>"
+        f"<node package='com.app' class='TextView' text='{title}' bounds='[0,0][10,10]'/>"
+        "</hierarchy>"
+    )
+
+
+def frame(
+    screen: str | None,
+    description: str | None = None,
+    status: ExecutionStatus = ExecutionStatus.EXECUTED,
+    clock: str = "12:00",
+) -> ActionFrame:
+    if description is None:
+        action = ActionInfo(type=ActionType.PRESS_KEY, data="back")
+    else:
+        action = ActionInfo(
+            element=ElementInfo(description=description, xpath=f"//{description}"),
+            type=ActionType.CLICK,
+        )
+    action.status = status
+    return ActionFrame(
+        screen=ScreenInfo(
+            name=screen or "", description="", hierarchy=hierarchy(screen or "", clock)
+        ),
+        action=action,
+        error=None,
+    )
+
+
+def test_screen_state_ignores_system_nodes() -> None:
+    first = ScreenInfo(name="", description="", hierarchy=hierarchy("Main", "12:00"))
+    later = ScreenInfo(name="", description="", hierarchy=hierarchy("Main", "12:01"))
+    other = ScreenInfo(name="", description="", hierarchy=hierarchy("Menu"))
+    assert screen_state(first) == screen_state(later) != screen_state(other)
+    assert screen_state(None) is None
+
+
+def test_detours_and_no_op_steps_are_removed() -> None:
+    trace = [
+        frame("Main", "about"),  # opens About
+        frame("About", None),  # back to Main
+        frame("Main", "refresh", clock="12:01"),  # nothing changes
+        frame("Main", "settings"),
+        frame("Settings", "wifi"),
+        frame("Wifi", "missing", status=ExecutionStatus.BROKEN),
+    ]
+
+    minimized = minimize_trace(trace)
+
+    assert minimized.removed == [0, 1, 2]
+    assert [f.action.element.description for f in minimized.frames] == [
+        "settings",
+        "wifi",
+        "missing",
+    ]
+    assert trace[0].action.element.description == "about"
+
+
+def test_minimized_trace_is_verified_by_replay(
+    make_device: "type[FakeDevice]",
+) -> None:
+    device = make_device(missing={"//gone"})
+    explorer = ScenarioExplorer(
+        model=cast(BaseChatModel, object()), device_factory=lambda: device
+    )
+    good = minimize_trace([frame("Main", "menu"), frame("Main", "settings")])
+    bad = minimize_trace([frame("Main", "gone")])
+
+    assert verify_minimized(explorer, good)
+    assert device.clicked == ["//settings"]
+    assert not verify_minimized(explorer, bad)
+    assert bad.frames[0].action.status is ExecutionStatus.EXECUTED
+
+
+def test_command_line(tmp_path: Path, capsys: pytest.CaptureFixture[str]) -> None:
+    source = tmp_path / "trace.json"
+    source.write_text(
+        json.dumps([f.to_dict() for f in (frame("Main", "a"), frame("Main", "b"))])
+    )
+    main([str(source), str(tmp_path / "out.json")])
+
+    assert len(json.loads((tmp_path / "out.json").read_text())) == 1
+    assert "1 removed: 0" in capsys.readouterr().out
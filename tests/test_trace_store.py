@@ -0,0 +1,117 @@
+import json
+from pathlib import Path
+
+import pytest
+
+from explorer.models import (
+    ActionFrame,
+    ActionInfo,
+    ActionType,
+    ElementInfo,
+    Error,
+    ExecutionStatus,
+    ScreenInfo,
+)
+from explorer.trace_store import TraceRepository, main
+
+# mypy: ignore-errors
+
+HIERARCHY = "<hierarchy><node text='OK'/></hierarchy>"
+
+
+def frame(
+    description: str,
+    xpath: str | None,
+    status: ExecutionStatus = ExecutionStatus.EXECUTED,
+    error: str | None = None,
+    screen: str = "Settings",
+) -> ActionFrame:
+    return ActionFrame(
+        screen=ScreenInfo(name=screen, description="", hierarchy=HIERARCHY),
+        action=ActionInfo(
+            element=ElementInfo(description=description, name=description, xpath=xpath),
+            type=ActionType.CLICK,
+            status=status,
+        ),
+        error=Error(type=error, message=None) if error else None,
+    )
+
+
+def test_query_by_indexed_fields() -> None:
+    repository = TraceRepository()
+    repository.add_trace(
+        [frame("Wi-Fi", "//wifi"), frame("Bluetooth", "//bt")], "first", created=1.0
+    )
+    repository.add_trace(
+        [
+            frame("Wi-Fi", "//wifi"),
+            frame(
+                "Bluetooth",
+                "//bt",
+                ExecutionStatus.BROKEN,
+                "XPathElementNotFoundError",
+                screen="Connections",
+            ),
+        ],
+        "second",
+        created=2.0,
+    )
+
+    broken = repository.query(status="broken")
+    assert [(r.trace, r.xpath, r.error_type) for r in broken] == [
+        ("second", "//bt", "XPathElementNotFoundError")
+    ]
+    assert repository.traces(screen="Settings") == ["second", "first"]
+    assert repository.traces(xpath="//bt", since=1.5) == ["second"]
+    assert len(repository.query(element="Wi-Fi", limit=1)) == 1
+
+
+def test_hierarchies_are_stored_once_and_restored() -> None:
+    repository = TraceRepository()
+    trace_id = repository.add_trace([frame("a", "//a"), frame("b", "//b")])
+
+    (count,) = repository._connection.execute(
+        "SELECT COUNT(*) FROM hierarchies"
+    ).fetchone()
+    frames = repository.frames(trace_id)
+
+    assert count == 1
+    assert frames[1]["screen"]["hierarchy"] == HIERARCHY
+    assert frames[1]["action"]["element"]["xpath"] == "//b"
+    with pytest.raises(KeyError):
+        repository.hierarchy("missing")
+
+
+def test_known_elements_prefer_recent_working_xpaths() -> None:
+    repository = TraceRepository()
+    repository.add_trace([frame("Go", "//old")], created=1.0)
+    repository.add_trace([frame("Go", "//new")], created=2.0)
+    repository.add_trace([frame("Go", "//new")], created=3.0)
+    repository.add_trace(
+        [frame("Go", "//broken", ExecutionStatus.BROKEN, "ElementNotFoundError")],
+        created=4.0,
+    )
+
+    assert [r.xpath for r in repository.known_elements("Go")] == ["//new", "//old"]
+
+
+def test_cli_ingests_batch_results(
+    tmp_path: Path, capsys: pytest.CaptureFixture[str]
+) -> None:
+    results = tmp_path / "results.jsonl"
+    results.write_text(
+        json.dumps(
+            {"scenario": "wifi.txt", "trace": [frame("Wi-Fi", "//wifi").to_dict()]}
+        )
+        + "\n"
+        + json.dumps({"scenario": "failed.txt", "error": "ValueError: bad"})
+        + "\n",
+        encoding="utf-8",
+    )
+    database = str(tmp_path / "traces.db")
+
+    main([database, "ingest", str(results)])
+    main([database, "query", "--screen", "Settings", "--traces"])
+
+    output = capsys.readouterr().out.splitlines()
+    assert output == [f"{results}: 1 traces", "wifi.txt"]